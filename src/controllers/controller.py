@@ -1,105 +1,93 @@
 from tkinter import filedialog
-from models import Video, FaceDetectorCascade, FaceDetectorDNN, FaceDetectorMTCNN
-from models import WatermarkLsbFragile, WatermarkAvgHashQim, WatermarkBlockChecksumDwt
+from models import Video, FaceMap, Registry, DETECTORS, WATERMARKS
+from models import StreamPipeline, SegmentedPipeline, SelectiveEncoder, open_frame_store
+from models import FaceDetectorTracking, FaceDetectorPool, IouTracker, DetectionCache
 from views import VideoView
 import atexit
 import threading
-import json
-import subprocess
-import av
+import functools
 import os, shutil
 
 class VideoController:
     FRAMES_DIR = "frames"
+    # Backend for the step-by-step pipeline: "png", "memmap", "ffv1" or "memory"
+    FRAME_STORE = "png"
+    # Frames kept in RAM in front of the store (0 = none); "memory" needs room for every frame
+    FRAME_CACHE = 0
+    # zlib level for the "png" store: 0 = fastest/largest ... 9 = slowest/smallest
+    PNG_COMPRESSION = 1
+    OUTPUT_PATH = "video_output.mp4"
+    # True: "Run All" decodes, detects, embeds, verifies and encodes in one pass, in memory.
+    # False: the step-by-step frames/ folder pipeline (debug/export).
+    STREAMING = True
+    # Streaming only: split the video at keyframes and process segments on all cores (needs PyAV)
+    PARALLEL_SEGMENTS = False
+    SEGMENT_FRAMES = 300
+    # Streaming only: detect first, then re-encode just the GOPs with faces and copy the rest (needs PyAV)
+    SELECTIVE_REENCODE = False
+    # Verify without extracted frames: decode only keyframes instead of seeking to every face-map frame
+    VERIFY_KEYFRAMES_ONLY = False
+    # Frames per inference call for the DNN and MTCNN detectors
+    DETECT_BATCH_SIZE = 8
+    # CPU threads for torch (MTCNN); None keeps torch's default
+    TORCH_THREADS = None
+    # Detect-then-track: run the detector every N frames (and on scene changes) and
+    # track faces with optical flow in between; 1 = detect on every frame
+    TRACK_EVERY = 1
+    # Faces whose track lasts less than this many seconds are ignored (not watermarked)
+    MIN_FACE_DURATION = 0.5
+    # Frames that differ from the last detected one by less than this (mean abs. grey-level
+    # difference of a thumbnail, 0-255) reuse its boxes instead of running detection; 0 = off
+    STATIC_THRESHOLD = 1.0
+    # On-disk cache of detections keyed by frame content + detector settings; None = off
+    DETECTION_CACHE = os.path.join("cache", "detections.sqlite")
+    DETECTION_CACHE_MB = 256
+    # Detect in this many worker processes (one model each, frames via shared memory); 0/1 = in-process
+    DETECT_PROCESSES = 0
+    # Debug: also render a separate video with the face boxes drawn on; None = skip
+    PREVIEW_PATH = None
+    # Methods that support it also embed a video id + frame counter after the header (LSB)
+    EMBED_PAYLOAD = False
     
     def __init__(self):
         self.video = Video()
+        self.frames = None
         self.view = VideoView(self)
-        self.Cascade = FaceDetectorCascade()
-        self.DNN = FaceDetectorDNN()
-        self.MTCNN = FaceDetectorMTCNN()
-        self.detect_face_map = {}
-        self.wm_lsb = WatermarkLsbFragile()
-        self.wm_avgqim = WatermarkAvgHashQim()
-        self.wm_dwt = WatermarkBlockChecksumDwt()
+        self.detection_cache = None
+        if self.DETECTION_CACHE:
+            self.detection_cache = DetectionCache(self.DETECTION_CACHE, self.DETECTION_CACHE_MB * 1024 * 1024)
+        # detectors and watermarkers are built (and their models loaded) on first use
+        self.detectors = Registry(DETECTORS, {
+            "dnn": {"batch_size": self.DETECT_BATCH_SIZE},
+            "mtcnn": {"batch_size": self.DETECT_BATCH_SIZE, "num_threads": self.TORCH_THREADS},
+        }, setup=self._setup_detector)
+        self.watermarks = Registry(WATERMARKS)
+        self.detect_face_map = FaceMap()
         self._clear_frames_folder()
+        self._pools: dict[str, FaceDetectorPool] = {}
+        atexit.register(self._close_pools)
         atexit.register(self._clear_frames_folder) 
                
         
+    def _setup_detector(self, detector):
+        detector.static_threshold = self.STATIC_THRESHOLD
+        detector.cache = self.detection_cache
+
+    def _close_pools(self):
+        for pool in self._pools.values():
+            pool.close()
+        self._pools.clear()
+
     def _clear_frames_folder(self):
+        self.frames = None
         if os.path.isdir(self.FRAMES_DIR):
             shutil.rmtree(self.FRAMES_DIR)
         os.makedirs(self.FRAMES_DIR, exist_ok=True) 
-       
-
-    # def _load_face_map_from_video(self, video_path: str):
-    #     """
-    #     Load the embedded face_map JSON from the video’s metadata.
-    #     Returns:
-    #         dict[str, List[Face]] or None if no face_map tag is present.
-    #     """
-    #     from models.face import Face
-
-    #     # 1️⃣ Find ffprobe on PATH
-    #     ffprobe = shutil.which("ffprobe") or shutil.which("ffprobe.exe")
-    #     if not ffprobe:
-    #         self.view.log_message("[ERROR_03]", "ffprobe not found on PATH.")
-    #         return None
-
-    #     try:
-    #         # 2️⃣ Grab the full format block as JSON
-    #         proc = subprocess.run(
-    #             [
-    #                 ffprobe,
-    #                 "-v", "error",
-    #                 "-print_format", "json",
-    #                 "-show_format",
-    #                 video_path
-    #             ],
-    #             capture_output=True,
-    #             text=True,
-    #             check=True
-    #         )
-    #         info = json.loads(proc.stdout)
-    #         print(proc.stdout)  # Debugging line to see the output
-    #         tags = info.get("format", {}).get("tags", {})
-
-    #         # 3️⃣ Pull out the face_map field
-    #         face_map_raw = tags.get("face_map")
-    #         if not face_map_raw:
-    #             return None
-
-    #         # 4️⃣ Parse the JSON string stored in that tag
-    #         data = json.loads(face_map_raw)
 
-    #         # 5️⃣ Reconstruct your Face objects
-    #         face_map = {}
-    #         for frame_name, boxes in data.items():
-    #             face_map[frame_name] = [
-    #                 Face.from_bbox(idx, None, tuple(box), confidence=1.0)
-    #                 for idx, box in enumerate(boxes)
-    #             ]
-    #         return face_map
-
-    #     except subprocess.CalledProcessError as e:
-    #         self.view.log_message(
-    #             "[ERROR_03]", f"ffprobe execution failed: {e}"
-    #         )
-    #     except json.JSONDecodeError as e:
-    #         self.view.log_message(
-    #             "[ERROR_03]", f"face_map JSON malformed or not valid JSON: {e}"
-    #         )
-    #     except Exception as e:
-    #         self.view.log_message(
-    #             "[ERROR_03]", f"Unexpected error loading face_map: {e}"
-    #         )
-    #     return None
-   
-    
     def browse_video(self):
         if self.video.get_video_path() is not None:
             self._clear_frames_folder()
-            self.detect_face_map.clear()
+            self.detect_face_map = FaceMap()
             self.video = Video()
 
         path = filedialog.askopenfilename(
@@ -125,7 +113,8 @@ class VideoController:
             except Exception as e:
                 self.view.log_message("[ERROR_01]", str(e))
             
-            self.video_to_frames()
+            if not self.STREAMING:
+                self.video_to_frames()
         else:
             self.view.log_message("[ERROR_02]", "No video file selected.")
             
@@ -135,11 +124,26 @@ class VideoController:
         threading.Thread(target=self._video_to_frames_worker).start()
     
     
+    def _ensure_frames(self):
+        """Extracts frames on demand when a folder step is used in streaming mode."""
+        if self.frames is None or not len(self.frames):
+            self._video_to_frames_worker()
+
     def _video_to_frames_worker(self):
         try:
             total = int(self.video.get_video_info()["Frame Count"])
+            self.frames = open_frame_store(
+                self.FRAME_STORE, self.FRAMES_DIR,
+                frame_count=total,
+                width=self.video.width,
+                height=self.video.height,
+                fps=self.video.fps,
+                cache_size=self.FRAME_CACHE,
+                clear=True,
+                png_compression=self.PNG_COMPRESSION
+            )
             self.view.init_progress(total)
-            frame_count = self.video.video_to_frames(progress_fn=self.view.update_progress)
+            frame_count = self.video.video_to_frames(progress_fn=self.view.update_progress, store=self.frames)
             self.view.reset_progress()
             self.view.log_message("[INFO]", f"{frame_count} frames succesfully extracted from video!")
         except Exception as e:
@@ -155,54 +159,14 @@ class VideoController:
         try:
             total = self.video.get_frame_count()
             self.view.init_progress(total)
-            video_path = self.video.frames_to_video(progress_fn=self.view.update_progress)
+            video_path = self.video.frames_to_video(progress_fn=self.view.update_progress, store=self.frames,
+                                                    face_map=self.detect_face_map)
             self.view.reset_progress()
             self.view.log_message("[INFO]", f"Video created: {video_path}")
-            
-            try:
-                self.video.embed_face_map(video_path, self.detect_face_map)
-            except Exception as e:
-                self.view.log_message("[ERROR_041]", f"FFmpeg embed failed: {e}")
 
         except Exception as e:
             self.view.log_message("[ERROR_04]", str(e))
-            
-
-    # def _embed_face_map(self, video_path: str, face_map: dict) -> None:
-    #     """
-    #     Embed the given face_map dict into the MP4 at `video_path` as
-    #     a format-level metadata tag, using ffmpeg –codec copy.
-    #     """
-    #     # 1️⃣ Build a pure-Python serializable dict
-    #     serializable = {
-    #         fname: [
-    #             [int(f.bbox[0]), int(f.bbox[1]), int(f.bbox[2]), int(f.bbox[3])]
-    #             for f in faces
-    #         ]
-    #         for fname, faces in face_map.items()
-    #     }
-    #     face_map_json = json.dumps(serializable, separators=(",", ":"))
-
-    #     # 2️⃣ Locate ffmpeg
-    #     ffmpeg_cmd = shutil.which("ffmpeg") or shutil.which("ffmpeg.exe")
-    #     if not ffmpeg_cmd:
-    #         raise RuntimeError("ffmpeg not found on PATH – please install or adjust PATH")
 
-    #     # 3️⃣ Run ffmpeg to copy streams and write metadata
-    #     tmp_path = video_path.replace(".mp4", "_meta.mp4")
-    #     subprocess.run([
-    #         ffmpeg_cmd, "-y",
-    #         "-i", video_path,
-    #         "-metadata", f"face_map={face_map_json}",
-    #         "-codec", "copy",
-    #         tmp_path
-    #     ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-    #     # 4️⃣ Replace original with the metadata-stamped file
-    #     os.replace(tmp_path, video_path)
-    #     self.view.log_message("[INFO]", "face_map embedded via FFmpeg.")
-
-     
     def full_run(self, detector_method: str, watermark_method: str):
         #store the user's choice
         self._full_detector = detector_method
@@ -210,12 +174,140 @@ class VideoController:
         threading.Thread(target=self._full_run_worker).start()
 
     def _full_run_worker(self):
+        if self.STREAMING:
+            self._stream_run_worker(self._full_detector, self._full_watermark)
+            return
         self._detect_faces_worker(self._full_detector)
         self._embed_watermark_worker(self._full_watermark)
         self._verify_watermark_worker(self._full_watermark)
         self._frames_to_video_worker()   
      
-                   
+
+    def _stream_run_worker(self, detector_method: str, watermark_method: str):
+        try:
+            detector = self._get_detector(detector_method)
+            wm = self._get_watermark(watermark_method)
+            if detector is None or wm is None:
+                return
+
+            total = int(self.video.get_video_info()["Frame Count"])
+            if self.SELECTIVE_REENCODE and self.video.engine == "av":
+                self._selective_run(detector, wm, total)
+                return
+
+            print(f"Streaming {detector_method.upper()} + {watermark_method.upper()} pipeline...")
+            self.view.init_progress(total)
+            if self.PARALLEL_SEGMENTS and self.video.engine == "av":
+                if isinstance(detector, FaceDetectorTracking):
+                    detector_factory = functools.partial(FaceDetectorTracking.wrap, type(detector.detector),
+                                                         detect_every=detector.detect_every)
+                elif isinstance(detector, FaceDetectorPool):
+                    detector_factory = detector.detector_factory
+                else:
+                    detector_factory = type(detector)
+                pipeline = SegmentedPipeline(self.video, detector_factory,
+                                             functools.partial(type(wm).create, wm.video_id),
+                                             verify=True, segment_frames=self.SEGMENT_FRAMES,
+                                             min_face_duration=self.MIN_FACE_DURATION,
+                                             static_threshold=self.STATIC_THRESHOLD,
+                                             detection_cache=self.DETECTION_CACHE,
+                                             detection_cache_bytes=self.DETECTION_CACHE_MB * 1024 * 1024)
+            else:
+                pipeline = StreamPipeline(self.video, detector, wm, verify=True,
+                                          min_face_duration=self.MIN_FACE_DURATION)
+            face_map = pipeline.run(self.OUTPUT_PATH, progress_fn=self.view.update_progress)
+            self.view.reset_progress()
+            self.detect_face_map = face_map
+
+            self.view.log_message("[INFO]", f"{pipeline.frames_processed} frames processed in a single pass.")
+            self.view.log_message("[INFO]", f"{pipeline.frames_skipped} static frames skipped detection.")
+            if isinstance(pipeline, StreamPipeline):
+                self.view.log_message("[INFO]", f"Detection stages: {detector.stage_report()}")
+            self.view.log_message("[INFO]", f"Faces found in {len(face_map)} frames.")
+            self.view.log_message("[INFO]", f"{pipeline.faces_dropped} faces on screen < {self.MIN_FACE_DURATION}s ignored.")
+            self.view.log_message(
+                "[INFO]",
+                f"{watermark_method.upper()} watermark verified in {pipeline.frames_verified} frames, "
+                f"failed in {pipeline.frames_failed}."
+            )
+            self._log_payloads_skipped(wm)
+            self.view.log_message("[INFO]", f"Video created: {self.OUTPUT_PATH}")
+            self._write_preview(face_map, detector, total)
+
+        except Exception as e:
+            self.view.log_message("[ERROR_16]", str(e))
+
+    def _write_preview(self, face_map, detector, total: int, frames=None):
+        """Debug-only overlay video rendered from the in-memory face map (source video unless `frames`)."""
+        if not self.PREVIEW_PATH:
+            return
+        print("Rendering face box preview...")
+        self.view.init_progress(total)
+        self.video.write_preview(face_map, self.PREVIEW_PATH, frames=frames, progress_fn=self.view.update_progress,
+                                 text_color=detector.TEXT_COLOR)
+        self.view.reset_progress()
+        self.view.log_message("[INFO]", f"Preview created: {self.PREVIEW_PATH}")
+
+    def _selective_run(self, detector, wm, total: int):
+        print("Detecting faces for selective re-encoding...")
+        self.view.init_progress(total)
+        face_map = FaceMap(
+            (index, faces)
+            for index, _, faces in detector.detect_stream(self.video.iter_frames(), progress_fn=self.view.update_progress)
+        )
+        self.view.reset_progress()
+        tracker = IouTracker(self.video.fps, self.MIN_FACE_DURATION)
+        face_map = tracker.track_map(face_map)
+        self.detect_face_map = face_map
+        self.view.log_message("[INFO]", f"{detector.frames_skipped} static frames skipped detection.")
+        self.view.log_message("[INFO]", f"Detection stages: {detector.stage_report()}")
+        self.view.log_message("[INFO]", f"Faces found in {len(face_map)} frames.")
+        self.view.log_message("[INFO]", f"{tracker.faces_dropped} faces on screen < {self.MIN_FACE_DURATION}s ignored.")
+
+        print("Re-encoding GOPs with faces...")
+        self.view.init_progress(total)
+        encoder = SelectiveEncoder(self.video, wm, face_map)
+        encoder.run(self.OUTPUT_PATH, progress_fn=self.view.update_progress)
+        self.view.reset_progress()
+        self.view.log_message(
+            "[INFO]",
+            f"{encoder.gops_encoded} GOPs re-encoded, {encoder.gops_copied} GOPs stream-copied."
+        )
+        self.view.log_message("[INFO]", f"Video created: {self.OUTPUT_PATH}")
+        self._write_preview(face_map, detector, total)
+
+    def _get_detector(self, method: str):
+        if method not in self.detectors:
+            self.view.log_message("[ERROR_05]", f"Unknown detection method: {method}")
+            return None
+        if self.DETECT_PROCESSES > 1 and self.TRACK_EVERY <= 1:
+            # tracking is sequential, so the process pool only serves full detection;
+            # the workers load the model, this process never does
+            if method not in self._pools:
+                pool = FaceDetectorPool(self.detectors.cls(method), workers=self.DETECT_PROCESSES)
+                pool.static_threshold = self.STATIC_THRESHOLD
+                self._pools[method] = pool
+            return self._pools[method]
+        detector = self.detectors.get(method)
+        if self.TRACK_EVERY > 1:
+            detector = FaceDetectorTracking(detector, detect_every=self.TRACK_EVERY)
+            detector.static_threshold = self.STATIC_THRESHOLD
+        return detector
+
+    def _get_watermark(self, method: str):
+        if method in self.watermarks:
+            wm = self.watermarks.get(method)
+            wm.video_id = self.video.video_id() if self.EMBED_PAYLOAD else None
+            wm.payloads_skipped = 0
+            return wm
+        self.view.log_message("[ERROR_08]", f"Unknown watermark method: {method}")
+        return None
+
+    def _log_payloads_skipped(self, wm) -> None:
+        if wm.payloads_skipped:
+            self.view.log_message("[INFO]", f"{wm.payloads_skipped} faces too small for the payload; "
+                                            f"marked with the header only.")
+
     def detect_faces(self, method: str):
         print("-------------------------------------------------------------------------")
         threading.Thread(target=self._detect_faces_worker, args=(method,)).start()
@@ -224,33 +316,33 @@ class VideoController:
     def _detect_faces_worker(self, method: str):
         try:
             print(f"Detecting faces using {method.upper()}...")
-            if method == "dnn":
-                detector = self.DNN
-            elif method == "haarcascade":
-                detector = self.Cascade
-            elif method == "mtcnn":
-                detector = self.MTCNN
-            else:
-                self.view.log_message("[ERROR_05]", f"Unknown detection method: {method}")
+            detector = self._get_detector(method)
+            if detector is None:
                 return
-            
+
+            self._ensure_frames()
             total = self.video.get_frame_count()
             self.view.init_progress(total)
-            face_map = detector.detect_in_folder(self.FRAMES_DIR, progress_fn=self.view.update_progress)
+            face_map = detector.detect_in_store(self.frames, progress_fn=self.view.update_progress)
             self.view.reset_progress()
+            tracker = IouTracker(self.video.fps, self.MIN_FACE_DURATION)
+            face_map = tracker.track_map(face_map)
+            detector.results = face_map
             self.detect_face_map = face_map.copy()
-            print("Drawing face boundary...")
-            detector.draw_boundary(self.FRAMES_DIR)
+            self.view.log_message("[INFO]", f"{detector.frames_skipped} static frames skipped detection.")
+            self.view.log_message("[INFO]", f"Detection stages: {detector.stage_report()}")
+            self.view.log_message("[INFO]", f"{tracker.faces_dropped} faces on screen < {self.MIN_FACE_DURATION}s ignored.")
+            self._write_preview(face_map, detector, total, frames=self.frames)
             print("-------------------------------------------------------------------------")
 
             summary: dict[int, int] = {}
-            for fname, faces in face_map.items():
+            for index, faces in face_map.items():
                 for face in faces:
-                    idx = face.index
+                    idx = face.track_id
                     summary[idx] = summary.get(idx, 0) + 1
                     x, y, w, h = face.bbox
                     conf = face.confidence
-                    print(f"{fname}  • Face {idx}: x={x}, y={y}, w={w}, h={h}, confidence={conf:.2f}")
+                    print(f"frame {index}  • Face {idx}: x={x}, y={y}, w={w}, h={h}, confidence={conf:.2f}")
 
             self.view.log_message("[INFO]", f"Face detection summary: {method.upper()}")
             for idx in sorted(summary):
@@ -267,14 +359,8 @@ class VideoController:
     
     def _embed_watermark_worker(self, method: str):
         try:
-            if method == "lsb":
-                wm = self.wm_lsb
-            elif method == "avgqim":
-                wm = self.wm_avgqim 
-            elif method == "dwt":
-                wm = self.wm_dwt
-            else:
-                self.view.log_message("[ERROR_08]", f"Unknown watermark method: {method}")
+            wm = self._get_watermark(method)
+            if wm is None:
                 return
             
             # print(f"Verifying if watermark is already embedded...")
@@ -290,12 +376,14 @@ class VideoController:
             if not self.detect_face_map:
                 self.view.log_message("[ERROR_09]", "No faces detected; cannot embed watermark.")
                 return
+            self._ensure_frames()
             total = self.video.get_frame_count()
             self.view.init_progress(total)
-            wm.embed_in_folder(self.FRAMES_DIR, self.detect_face_map, progress_fn=self.view.update_progress)
+            wm.embed_in_store(self.frames, self.detect_face_map, progress_fn=self.view.update_progress)
             self.view.reset_progress()
             self.view.log_message("[INFO]", f"{method.upper()} watermark embedded."
             )
+            self._log_payloads_skipped(wm)
         except Exception as e:
             self.view.log_message("[ERROR_10]", str(e))    
     
@@ -306,47 +394,37 @@ class VideoController:
     
     def _verify_watermark_worker(self, method: str):
         try:
-            if method == "lsb":
-                wm = self.wm_lsb
-            elif method == "avgqim":
-                wm = self.wm_avgqim 
-            elif method == "dwt":
-                wm = self.wm_dwt
-            else:
+            if method not in self.watermarks:
                 self.view.log_message("[ERROR_12]", f"Unknown watermark method: {method}")
                 return
+            wm = self.watermarks.get(method)
 
-            if not self.detect_face_map:
+            face_map = self.detect_face_map
+            if not face_map:
                 print("No face map found; attempting to load from video metadata...")
                 try:
-                    res = subprocess.run([
-                        "ffprobe", "-v", "error",
-                        "-show_entries", "format_tags=face_map",
-                        "-of", "default=noprint_wrappers=1:nokey=1",
-                        self.video.get_video_path()
-                    ], capture_output=True, text=True, check=True)
-                    raw = res.stdout.strip()
-                    if not raw:
+                    # read-only: chunks are only decoded as far as verification gets
+                    face_map = self.video.read_face_map()
+                    if not face_map:
                         self.view.log_message("[ERROR_13]", "No face_map metadata found; cannot verify.")
                         return
-                    data = json.loads(raw)
-                    from models.face import Face
-                    lm = {}
-                    for fname, boxes in data.items():
-                        lm[fname] = [
-                            Face.from_bbox(i, None, tuple(box), confidence=1.0)
-                            for i, box in enumerate(boxes)
-                        ]
-                    self.detect_face_map = lm
-                    self.view.log_message("[INFO]", "face_map loaded via ffprobe.")
+                    self.view.log_message("[INFO]", "face_map loaded from the video metadata.")
                 except Exception as ex:
-                    self.view.log_message("[ERROR_13]", f"FFprobe load failed: {ex}")
+                    self.view.log_message("[ERROR_13]", f"Loading the face_map failed: {ex}")
                     return
                 
             print(f"Verifying {method.upper()} watermark...")
-            total = self.video.get_frame_count()
-            self.view.init_progress(total)
-            verified = wm.verify_in_folder(self.FRAMES_DIR, self.detect_face_map, progress_fn=self.view.update_progress)
+            if self.frames is not None and len(self.frames):
+                self.view.init_progress(len(face_map))
+                verified = wm.verify_in_store(self.frames, face_map,
+                                              progress_fn=self.view.update_progress)
+            else:
+                # nothing extracted: decode just what is needed straight from the video
+                total = len(self.video.probe().keyframes) if self.VERIFY_KEYFRAMES_ONLY else len(face_map)
+                self.view.init_progress(total)
+                verified = self.video.verify_watermark(wm, face_map,
+                                                       keyframes_only=self.VERIFY_KEYFRAMES_ONLY,
+                                                       progress_fn=self.view.update_progress)
             self.view.reset_progress()
             if verified:
                 self.view.log_message("[INFO]", f"{method.upper()} watermark verified successfully!")
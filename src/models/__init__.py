@@ -1,19 +1,94 @@
-from .video_model import Video
-from .face import Face
-from .face_detector_haarcascade import FaceDetectorCascade
-from .face_detector_dnn import FaceDetectorDNN
-from .face_detector_mtcnn import FaceDetectorMTCNN
-from .watermark_lsb_fragile import WatermarkLsbFragile
-from .watermark_avg_hash_qim import WatermarkAvgHashQim
-from .watermark_block_checksum_dwt import WatermarkBlockChecksumDwt
+"""
+Public API of the models package. Submodules are imported on first
+attribute access (PEP 562), so `from models import Video` does not pull in
+torch, facenet_pytorch or pywt unless an MTCNN / DWT class is asked for.
+"""
+import importlib
+
+_EXPORTS = {
+    "Face": "face",
+    "FaceMap": "face_map",
+    "FACE_DTYPE": "face_map",
+    "FrameStore": "frame_store",
+    "PngFrameStore": "frame_store",
+    "MemmapFrameStore": "frame_store",
+    "Ffv1FrameStore": "frame_store",
+    "LruFrameStore": "frame_store",
+    "FRAME_STORES": "frame_store",
+    "open_frame_store": "frame_store",
+    "DetectionCache": "detection_cache",
+    "frame_hash": "detection_cache",
+    "draw_faces": "face_overlay",
+    "overlay_frames": "face_overlay",
+    "FaceMapReader": "face_map_codec",
+    "encode_face_map": "face_map_codec",
+    "decode_face_map": "face_map_codec",
+    "Video": "video_model",
+    "FaceDetectorCascade": "face_detector_haarcascade",
+    "FaceDetectorDNN": "face_detector_dnn",
+    "FaceDetectorMTCNN": "face_detector_mtcnn",
+    "FaceDetectorTracking": "face_detector_tracking",
+    "FaceDetectorPool": "face_detector_pool",
+    "IouTracker": "face_tracker",
+    "iou_matrix": "face_tracker",
+    "WatermarkLsbFragile": "watermark_lsb_fragile",
+    "WatermarkAvgHashQim": "watermark_avg_hash_qim",
+    "WatermarkBlockChecksumDwt": "watermark_block_checksum_dwt",
+    "StreamPipeline": "stream_pipeline",
+    "SegmentedPipeline": "segmented_pipeline",
+    "SelectiveEncoder": "selective_encoder",
+    "Registry": "registry",
+    "DETECTORS": "registry",
+    "WATERMARKS": "registry",
+}
+
 
 __all__ = [
     "Video", 
     "Face", 
+    "FaceMap",
+    "FACE_DTYPE",
+    "FrameStore",
+    "PngFrameStore",
+    "MemmapFrameStore",
+    "Ffv1FrameStore",
+    "LruFrameStore",
+    "FRAME_STORES",
+    "open_frame_store",
+    "DetectionCache",
+    "frame_hash",
+    "FaceMapReader",
+    "encode_face_map",
+    "decode_face_map",
+    "draw_faces",
+    "overlay_frames",
     "FaceDetectorCascade",
     "FaceDetectorDNN",
     "FaceDetectorMTCNN",
+    "FaceDetectorTracking",
+    "FaceDetectorPool",
+    "IouTracker",
+    "iou_matrix",
     "WatermarkLsbFragile",
     "WatermarkAvgHashQim",
-    "WatermarkBlockChecksumDwt"
+    "WatermarkBlockChecksumDwt",
+    "StreamPipeline",
+    "SegmentedPipeline",
+    "SelectiveEncoder",
+    "Registry",
+    "DETECTORS",
+    "WATERMARKS"
 ]
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,470 @@
+import os
+import heapq
+import bisect
+import struct
+import tempfile
+import numpy as np
+from fractions import Fraction
+from typing import Iterator
+
+try:
+    import av
+except ImportError:  # PyAV is optional; Video falls back to OpenCV
+    av = None
+
+
+def require_av():
+    if av is None:
+        raise RuntimeError("PyAV is not installed (pip install av)")
+
+
+def _video_start(container) -> float:
+    """Start time (s) of the first video stream; copied audio is re-timed against it."""
+    video = container.streams.video[0] if container.streams.video else None
+    if video is None or video.start_time is None:
+        return 0.0
+    return float(video.start_time * video.time_base)
+
+
+MOV_EXTENSIONS = (".mp4", ".mov", ".m4v")
+
+
+def defers_tags(path: str) -> bool:
+    """True if AvWriter can fill metadata at close for this output (MP4/MOV, see AvWriter)."""
+    return os.path.splitext(path)[1].lower() in MOV_EXTENSIONS
+
+
+def _open_output(path: str):
+    """Opens `path` for writing; MP4/MOV get arbitrary (non-iTunes) metadata keys enabled."""
+    if os.path.splitext(path)[1].lower() in MOV_EXTENSIONS:
+        return av.open(path, "w", options={"movflags": "use_metadata_tags"})
+    return av.open(path, "w")
+
+
+def _box_chain(data: bytearray, pos: int, start: int, end: int, chain: tuple = ()) -> tuple:
+    """Offsets of the nested boxes enclosing byte `pos`, outermost first, down to the `data` atom."""
+    offset = start
+    while offset + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, offset)
+        if size < 8:
+            break
+        if offset <= pos < offset + size:
+            chain += (offset,)
+            if kind == b"data":
+                return chain
+            body = offset + 8 + (4 if kind == b"meta" else 0)    # meta is a full box
+            return _box_chain(data, pos, body, offset + size, chain)
+        offset += size
+    raise ValueError("Metadata placeholder is not inside a data atom")
+
+
+def _patch_mov_tags(path: str, values: dict[str, str]) -> None:
+    """
+    Replaces placeholder tag values in a finished MP4/MOV file. The moov
+    atom sits after mdat, so only moov is rewritten (sample offsets into
+    mdat are unchanged) and the media data is never touched.
+    """
+    with open(path, "r+b") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        offset, moov = 0, None
+        while offset < file_size:
+            f.seek(offset)
+            size, kind = struct.unpack(">I4s", f.read(8))
+            if size == 1:
+                size = struct.unpack(">Q", f.read(8))[0]
+            elif size == 0:
+                size = file_size - offset
+            if kind == b"moov":
+                moov = (offset, size)
+            offset += size
+        if moov is None or sum(moov) != file_size:
+            raise ValueError("moov atom is not at the end of the file")
+
+        f.seek(moov[0])
+        data = bytearray(f.read(moov[1]))
+        for placeholder, value in values.items():
+            old, new = placeholder.encode("utf-8"), value.encode("utf-8")
+            chain = _box_chain(data, data.find(old), 0, len(data))
+            payload = chain[-1] + 16                            # data atom: header, type, locale
+            if bytes(data[payload:chain[-1] + struct.unpack_from(">I", data, chain[-1])[0]]) != old:
+                raise ValueError("Metadata placeholder does not fill its data atom")
+            data[payload:payload + len(old)] = new
+            for box in chain:
+                struct.pack_into(">I", data, box, struct.unpack_from(">I", data, box)[0] + len(new) - len(old))
+
+        f.seek(moov[0])
+        f.write(data)
+        f.truncate()
+
+
+def _shift(packet, offset: float) -> None:
+    shift = round(offset / packet.time_base)
+    if shift:
+        if packet.pts is not None:
+            packet.pts -= shift
+        packet.dts -= shift
+
+
+class AvReader:
+    """
+    PyAV-backed decoder yielding (index, frame) as numpy arrays.
+
+    Frame and slice threading are enabled on the decoder ("AUTO"), which
+    OpenCV's VideoCapture does not do for most codecs.
+    """
+    def __init__(self, path: str, pixel_format: str = "bgr24", thread_type: str = "AUTO", thread_count: int = 0):
+        require_av()
+        self.path = path
+        self.pixel_format = pixel_format
+        self.container = av.open(path)
+        if not self.container.streams.video:
+            self.container.close()
+            raise ValueError("Cannot open video: no video stream.")
+
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = thread_type
+        self.stream.codec_context.thread_count = thread_count
+
+        self.width = self.stream.codec_context.width
+        self.height = self.stream.codec_context.height
+        self.rate = self.stream.average_rate or self.stream.guessed_rate or Fraction(25)
+        self.fps = float(self.rate)
+
+    def __iter__(self) -> Iterator[tuple[int, np.ndarray]]:
+        for index, frame in enumerate(self.container.decode(self.stream)):
+            yield index, frame.to_ndarray(format=self.pixel_format)
+
+    def iter_range(self, start_pts: int, end_pts: int = None) -> Iterator[np.ndarray]:
+        """
+        Seeks to the keyframe at `start_pts` and yields the frames whose
+        pts lie in [start_pts, end_pts), in presentation order.
+        """
+        self.container.seek(start_pts, stream=self.stream, backward=True, any_frame=False)
+        for frame in self.container.decode(self.stream):
+            if frame.pts is None or frame.pts < start_pts:
+                continue
+            if end_pts is not None and frame.pts >= end_pts:
+                break
+            yield frame.to_ndarray(format=self.pixel_format)
+
+    def iter_keyframes(self) -> Iterator[tuple[int, np.ndarray]]:
+        """
+        Yields (pts, frame) for keyframes only. The decoder is told to skip
+        every non-key frame (skip_frame="NONKEY"), so those are demuxed but
+        never decoded.
+        """
+        codec = self.stream.codec_context
+        codec.skip_frame = "NONKEY"
+        try:
+            for frame in self.container.decode(self.stream):
+                if frame.pts is not None:
+                    yield frame.pts, frame.to_ndarray(format=self.pixel_format)
+        finally:
+            codec.skip_frame = "DEFAULT"
+
+    def iter_at(self, indices: list[int], frame_pts: list[int], keyframes: list[int]) -> Iterator[tuple[int, np.ndarray]]:
+        """
+        Yields (index, frame) for the given sorted frame indices only.
+
+        `frame_pts` / `keyframes` come from the probe. Before each wanted frame
+        the reader seeks to its GOP's keyframe, unless it is already inside
+        that GOP and can get there by decoding forward.
+        """
+        decoder = None
+        position = -1       # index of the last decoded frame
+        for index in indices:
+            if not 0 <= index < len(frame_pts):
+                continue
+            k = bisect.bisect_right(keyframes, index) - 1
+            gop = keyframes[k] if k >= 0 else 0
+            if decoder is None or index <= position or position < gop:
+                self.container.seek(frame_pts[gop], stream=self.stream, backward=True, any_frame=False)
+                decoder = self.container.decode(self.stream)
+
+            target = frame_pts[index]
+            for frame in decoder:
+                if frame.pts is None or frame.pts < target:
+                    continue
+                position = bisect.bisect_left(frame_pts, frame.pts)
+                if frame.pts == target:
+                    yield index, frame.to_ndarray(format=self.pixel_format)
+                break
+            else:
+                decoder = None
+
+    def close(self) -> None:
+        self.container.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def copy_video_packets(path: str, output_path: str, start_pts: int, end_pts: int = None) -> int:
+    """
+    Stream-copies the video packets of the closed GOPs between the keyframes
+    at `start_pts` (inclusive) and `end_pts` (exclusive) into `output_path`.
+    Returns the number of packets copied.
+    """
+    require_av()
+    copied = 0
+    with av.open(path) as source, av.open(output_path, "w") as out:
+        in_stream = source.streams.video[0]
+        if hasattr(out, "add_stream_from_template"):
+            out_stream = out.add_stream_from_template(in_stream)
+        else:
+            out_stream = out.add_stream(template=in_stream)
+
+        source.seek(start_pts, stream=in_stream, backward=True, any_frame=False)
+        started = False
+        for packet in source.demux(in_stream):
+            if packet.pts is None:
+                continue
+            if packet.is_keyframe:
+                if packet.pts == start_pts:
+                    started = True
+                elif started and end_pts is not None and packet.pts >= end_pts:
+                    break
+            if not started:
+                continue
+            packet.stream = out_stream
+            out.mux(packet)
+            copied += 1
+    return copied
+
+
+class AvWriter:
+    """
+    PyAV-backed encoder (libx264 by default) with threaded encoding.
+
+    If `audio_source` is given, its audio packets are stream-copied into the
+    output while the video is written, interleaved by timestamp, so the audio
+    is never re-encoded and no second ffmpeg pass is needed.
+
+    `bframes`, `keyint`, `profile` and `time_base` override the encoder
+    defaults, e.g. to match a source whose GOPs the output is spliced with.
+
+    `metadata` becomes container tags. Keys whose value is None when the
+    writer is created are reserved and filled from the dict in close(), so
+    the caller can add values only known at the end (e.g. the face map)
+    without a second pass over the file; this needs an MP4/MOV output.
+    """
+    def __init__(self,
+                 output_path: str,
+                 width: int,
+                 height: int,
+                 fps: float,
+                 codec: str = "libx264",
+                 preset: str = "veryfast",
+                 crf: int = 18,
+                 threads: int = 0,
+                 pixel_format: str = "yuv420p",
+                 input_format: str = "bgr24",
+                 audio_source: str = None,
+                 repeat_headers: bool = False,
+                 metadata: dict[str, str] = None,
+                 bframes: int = None,
+                 keyint: int = None,
+                 profile: str = None,
+                 time_base: Fraction = None):
+        require_av()
+        self.input_format = input_format
+        self.output_path = output_path
+        self.metadata = metadata if metadata is not None else {}
+        self._reserved = {key: f"<pending {key}>" for key, value in self.metadata.items() if value is None}
+        if self._reserved and not defers_tags(output_path):
+            raise ValueError("Metadata filled at close needs an MP4/MOV output")
+        self.rate = Fraction(fps).limit_denominator(1001000) if fps else Fraction(25)
+        self.container = _open_output(output_path)
+        # copied into the header by the first mux
+        self.container.metadata.update({key: self._reserved.get(key, value)
+                                        for key, value in self.metadata.items()})
+
+        self.stream = self.container.add_stream(codec, rate=self.rate)
+        self.stream.width = width
+        self.stream.height = height
+        self.stream.pix_fmt = pixel_format
+        self.stream.codec_context.thread_count = threads
+        self.stream.thread_type = "AUTO"
+        if bframes is not None:
+            self.stream.codec_context.max_b_frames = bframes
+        if keyint is not None:
+            self.stream.codec_context.gop_size = keyint
+        if time_base is not None:
+            self.stream.time_base = time_base
+        if codec in ("libx264", "libx265"):
+            self.stream.options = {"preset": preset, "crf": str(crf)}
+            if profile:
+                self.stream.options["profile"] = profile
+            if repeat_headers and codec == "libx264":
+                # in-band SPS/PPS, so the segment can be spliced between copied GOPs
+                self.stream.options["x264-params"] = "repeat-headers=1"
+
+        self._index = 0
+        self._source = None
+        self._audio = {}
+        self._packets = None
+        self._pending = None
+        if audio_source:
+            self._open_audio(audio_source)
+
+    def _open_audio(self, path: str) -> None:
+        source = av.open(path)
+        audio_streams = list(source.streams.audio)
+        if not audio_streams:
+            source.close()
+            return
+
+        self._source = source
+        for in_stream in audio_streams:
+            if hasattr(self.container, "add_stream_from_template"):
+                out_stream = self.container.add_stream_from_template(in_stream)
+            else:
+                out_stream = self.container.add_stream(template=in_stream)
+            self._audio[in_stream.index] = out_stream
+
+        # keep audio aligned with the video, which is re-timed from zero
+        self._offset = _video_start(source)
+        self._packets = source.demux(audio_streams)
+
+    def _mux_audio(self, until: float = None) -> None:
+        """Muxes source audio packets up to `until` seconds (all remaining if None)."""
+        if self._packets is None:
+            return
+        while True:
+            packet = self._pending
+            self._pending = None
+            if packet is None:
+                packet = next(self._packets, None)
+                if packet is None:
+                    self._packets = None
+                    return
+            if packet.dts is None:      # demuxer flush packet
+                continue
+
+            if until is not None and float(packet.dts * packet.time_base) - self._offset > until:
+                self._pending = packet
+                return
+            _shift(packet, self._offset)
+            packet.stream = self._audio[packet.stream.index]
+            self.container.mux(packet)
+
+    def write(self, frame: np.ndarray) -> None:
+        video_frame = av.VideoFrame.from_ndarray(frame, format=self.input_format)
+        video_frame.pts = self._index
+        self._index += 1
+        for packet in self.stream.encode(video_frame):
+            self.container.mux(packet)
+        self._mux_audio(until=self._index / self.rate)
+
+    def close(self, patch_tags: bool = True) -> None:
+        for packet in self.stream.encode():
+            self.container.mux(packet)
+        self._mux_audio()
+        self.container.close()
+        if self._source is not None:
+            self._source.close()
+        if self._reserved and patch_tags:
+            _patch_mov_tags(self.output_path, {placeholder: self.metadata.get(key) or ""
+                                               for key, placeholder in self._reserved.items()})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        # an aborted write leaves the placeholders; patching could mask the original error
+        self.close(patch_tags=exc_type is None)
+
+
+def _concat_list(segment_paths: list[str]) -> str:
+    """Writes a concat demuxer list of `segment_paths` to a temporary file and returns its path."""
+    fd, list_path = tempfile.mkstemp(suffix=".txt", prefix="concat_")
+    with os.fdopen(fd, "w") as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    return list_path
+
+
+def _open_concat(list_path: str):
+    return av.open(list_path, format="concat", options={"safe": "0"})
+
+
+def segments_splice(segment_paths: list[str]) -> bool:
+    """
+    True if the video packets of the segments, read back to back through the
+    concat demuxer, have strictly increasing DTS, i.e. concat_segments() can
+    join them by stream copy.
+    """
+    require_av()
+    list_path = _concat_list(segment_paths)
+    try:
+        with _open_concat(list_path) as container:
+            last_dts = None
+            for packet in container.demux(container.streams.video[0]):
+                if packet.dts is None:
+                    continue
+                if last_dts is not None and packet.dts <= last_dts:
+                    return False
+                last_dts = packet.dts
+        return True
+    finally:
+        os.remove(list_path)
+
+
+def concat_segments(segment_paths: list[str], output_path: str, audio_source: str = None,
+                    metadata: dict[str, str] = None) -> None:
+    """
+    Joins already-encoded segments with libavformat's concat demuxer, copying
+    packets (no re-encode). Audio from `audio_source` is stream-copied in and
+    interleaved by timestamp; `metadata` is written as container tags.
+    Raises ValueError if the video DTS stop increasing at a join (see
+    segments_splice()).
+    """
+    require_av()
+    list_path = _concat_list(segment_paths)
+    inputs = []
+    try:
+        inputs.append(_open_concat(list_path))
+        if audio_source:
+            inputs.append(av.open(audio_source))
+
+        with _open_output(output_path) as out:
+            out.metadata.update(metadata or {})
+            sources = []
+            for container in inputs:
+                if container is inputs[0]:
+                    streams, offset = list(container.streams.video[:1]), 0.0
+                else:
+                    streams, offset = list(container.streams.audio), _video_start(container)
+                for in_stream in streams:
+                    if hasattr(out, "add_stream_from_template"):
+                        out_stream = out.add_stream_from_template(in_stream)
+                    else:
+                        out_stream = out.add_stream(template=in_stream)
+                    sources.append((container.demux(in_stream), out_stream, offset))
+
+            def keyed(packets, out_stream, offset, order):
+                for packet in packets:
+                    if packet.dts is None:
+                        continue
+                    _shift(packet, offset)
+                    yield float(packet.dts * packet.time_base), order, packet, out_stream
+
+            merged = heapq.merge(*(keyed(*source, i) for i, source in enumerate(sources)),
+                                 key=lambda item: item[:2])
+            last_dts = None
+            for _, order, packet, out_stream in merged:
+                if order == 0:
+                    if last_dts is not None and packet.dts <= last_dts:
+                        raise ValueError(f"Segments cannot be spliced: video DTS {packet.dts} "
+                                         f"does not increase past {last_dts}")
+                    last_dts = packet.dts
+                packet.stream = out_stream
+                out.mux(packet)
+    finally:
+        for container in inputs:
+            container.close()
+        os.remove(list_path)
@@ -0,0 +1,160 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from .face import Face
+
+# one record per face: x, y, w, h, confidence
+_RECORD = np.dtype([("x", "<i4"), ("y", "<i4"), ("w", "<i4"), ("h", "<i4"), ("confidence", "<f4")])
+
+
+def frame_hash(thumbnail: np.ndarray, shape: tuple) -> bytes:
+    """
+    128-bit key of a decoded frame from its shape and its small grey
+    thumbnail (FaceDetectorBase._thumbnail()), which the static-frame check
+    computes anyway; hashing every pixel of a 1080p frame would cost about
+    as much as a fast detector.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(tuple(shape)).encode("ascii"))
+    digest.update(np.ascontiguousarray(thumbnail).data)
+    return digest.digest()
+
+
+class DetectionCache:
+    """
+    On-disk (SQLite) cache of face detections keyed by
+    (frame thumbnail hash, detector key), where the detector key names the
+    detector and its parameters (FaceDetectorBase.cache_key()).
+
+    Because the key comes from the decoded pixels, hits survive re-uploads,
+    re-extraction to a different frame store and trying several watermark
+    methods on the same clip. Least recently used rows are evicted once
+    the stored results exceed `max_bytes`.
+
+    Several processes (segment workers) share one file, so new results and
+    use times are buffered and written in one short transaction every
+    `commit_every` operations (and on flush/close); the write lock is never
+    held while frames are being detected.
+    """
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, commit_every: int = 32):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.commit_every = commit_every
+        self.hits = 0
+        self.misses = 0
+        self._pending: dict[tuple[bytes, str], tuple[bytes, float]] = {}   # results not written yet
+        self._touched: dict[tuple[bytes, str], float] = {}                 # hits: new use times
+
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self._lock = threading.Lock()
+        # used from the detection prefetch thread as well
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS detections (
+                frame    BLOB NOT NULL,
+                detector TEXT NOT NULL,
+                faces    BLOB NOT NULL,
+                used     REAL NOT NULL,
+                PRIMARY KEY (frame, detector)
+            ) WITHOUT ROWID""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS detections_used ON detections (used)")
+        self._db.commit()
+        self._size = self._stored_bytes()
+
+    def _stored_bytes(self) -> int:
+        # key, faces and per-row overhead
+        row = self._db.execute("SELECT COALESCE(SUM(LENGTH(frame) + LENGTH(detector) + LENGTH(faces) + 16), 0) "
+                               "FROM detections").fetchone()
+        return int(row[0])
+
+    def get(self, key: bytes, detector: str) -> list[Face] | None:
+        """Cached faces for this frame hash and detector, or None."""
+        with self._lock:
+            pending = self._pending.get((key, detector))
+            if pending is not None:
+                blob = pending[0]
+            else:
+                row = self._db.execute("SELECT faces FROM detections WHERE frame = ? AND detector = ?",
+                                       (key, detector)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                blob = row[0]
+                self._touched[(key, detector)] = time.time()
+                self._write_if_due()
+            self.hits += 1
+
+        records = np.frombuffer(blob, dtype=_RECORD)
+        return [
+            Face.from_bbox(i, (r["x"], r["y"], r["w"], r["h"]), r["confidence"])
+            for i, r in enumerate(records)
+        ]
+
+    def put(self, key: bytes, detector: str, faces: list[Face]) -> None:
+        records = np.array([(*map(int, face.bbox), face.confidence) for face in faces], dtype=_RECORD)
+        blob = records.tobytes()
+        with self._lock:
+            self._pending[(key, detector)] = (blob, time.time())
+            self._size += len(key) + len(detector) + len(blob) + 16
+            self._write_if_due()
+
+    def _write_if_due(self) -> None:
+        if len(self._pending) + len(self._touched) >= self.commit_every:
+            self._write()
+
+    def _write(self) -> None:
+        """Writes the buffered results and use times in one transaction (caller holds the lock)."""
+        if not self._pending and not self._touched:
+            return
+        with self._db:      # commits, or rolls back if a statement fails
+            self._db.executemany("INSERT OR REPLACE INTO detections VALUES (?, ?, ?, ?)",
+                                 [(key, detector, blob, used)
+                                  for (key, detector), (blob, used) in self._pending.items()])
+            self._db.executemany("UPDATE detections SET used = ? WHERE frame = ? AND detector = ?",
+                                 [(used, key, detector) for (key, detector), used in self._touched.items()])
+            if self._size > self.max_bytes:
+                self._evict()
+        self._pending.clear()
+        self._touched.clear()
+
+    def _evict(self) -> None:
+        """Drops least recently used rows until the cache is back under 90% of max_bytes."""
+        self._size = self._stored_bytes()
+        target = int(self.max_bytes * 0.9)
+        while self._size > target:
+            count = self._db.execute("SELECT COUNT(*) FROM detections").fetchone()[0]
+            if not count:
+                break
+            excess = (self._size - target) / max(1, self._size)
+            self._db.execute("DELETE FROM detections WHERE (frame, detector) IN "
+                             "(SELECT frame, detector FROM detections ORDER BY used LIMIT ?)",
+                             (max(1, int(count * excess) + 1),))
+            self._size = self._stored_bytes()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._write()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self._touched.clear()
+            self._db.execute("DELETE FROM detections")
+            self._db.commit()
+            self._size = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._write()
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
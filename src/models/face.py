@@ -1,15 +1,23 @@
 from dataclasses import dataclass
 import numpy as np
 
-@dataclass
+@dataclass(slots=True)
 class Face:
+    """
+    One detected face box. Holds no pixels (a crop view would keep the whole
+    decoded frame alive); crop(frame) cuts the face out on demand.
+    """
     index: int
     bbox: tuple   # (x, y, w, h)
-    image: np.ndarray
     confidence: float
+    track_id: int = -1   # stable identity across frames (IouTracker), -1 = untracked
 
     @classmethod
-    def from_bbox(cls, index: int, frame: np.ndarray, bbox: tuple, confidence: float):
-        x, y, w, h = bbox
-        face_img = frame[y:y+h, x:x+w]
-        return cls(index=index, bbox=bbox, image=face_img, confidence=confidence)
+    def from_bbox(cls, index: int, bbox: tuple, confidence: float):
+        return cls(index=index, bbox=tuple(int(v) for v in bbox), confidence=float(confidence))
+
+    def crop(self, frame: np.ndarray) -> np.ndarray:
+        """View of this face's pixels in `frame`."""
+        x, y, w, h = self.bbox
+        return frame[y:y+h, x:x+w]
+
@@ -0,0 +1,286 @@
+import os
+import cv2
+import json
+import time
+import threading
+import dataclasses
+from queue import Queue, Full, Empty
+import numpy as np
+from typing import Iterable, Iterator
+from tqdm import tqdm
+from .face import Face
+from .face_map import FaceMap
+from .frame_store import FrameStore, PngFrameStore
+from .detection_cache import DetectionCache, frame_hash
+from .face_overlay import draw_faces
+
+_STATIC = object()      # plan marker: reuse the previous frame's boxes
+
+class FaceDetectorBase:
+    """
+    Frame iteration shared by every face detector.
+    Subclasses only have to implement detect(frame) -> list[Face]; those
+    that can run several frames per inference call override detect_batch()
+    and set `batch_size`, and detect_stream() feeds them batches.
+
+    Detectors with costly CPU-side preprocessing split detect_batch() into
+    prepare_batch() + detect_prepared(). With `prefetch` set, detection is a
+    three-stage pipeline: one thread reads (decodes) batches, another
+    prepares them and the caller runs inference, linked by bounded queues.
+    `stage_stats` holds the frames and busy seconds of each stage for the
+    last detect_stream() run; stage_report() turns them into throughput.
+
+    With `static_threshold` > 0, frames whose 64×36 grey thumbnail differs
+    from the last detected frame by less than that mean absolute difference
+    (0–255) are not detected; they reuse the boxes of the last detected
+    frame. `frames_skipped` counts them per detect_stream() run.
+
+    With a DetectionCache in `cache`, frames already seen by a detector with
+    the same cache_key() are served from it instead of being detected.
+    """
+    TEXT_COLOR = (255, 0, 0)
+    THUMB_SIZE = (64, 36)
+    batch_size = 1
+    prefetch = False
+    static_threshold = 0.0
+    frames_skipped = 0
+    cache: DetectionCache = None
+    STAGES = ("decode", "preprocess", "inference")
+    prefetch_depth = 2          # read batches buffered ahead of preprocessing
+    stage_stats: dict[str, list] = {}
+
+    def detect(self, frame: np.ndarray) -> list[Face]:
+        raise NotImplementedError
+
+    def cache_params(self) -> dict | None:
+        """Parameters that change detections; None means results must not be cached."""
+        return None
+
+    def cache_key(self) -> str | None:
+        params = self.cache_params()
+        if params is None:
+            return None
+        return f"{type(self).__name__}:{json.dumps(params, sort_keys=True)}"
+
+    def detect_batch(self, frames: list[np.ndarray]) -> list[list[Face]]:
+        """Detects faces in several frames at once; returns one list of faces per frame."""
+        return [self.detect(frame) for frame in frames]
+
+    def prepare_batch(self, frames: list[np.ndarray]):
+        """Preprocessing for detect_prepared(); runs on the prefetch thread when enabled."""
+        return None
+
+    def detect_prepared(self, prepared, frames: list[np.ndarray]) -> list[list[Face]]:
+        return self.detect_batch(frames)
+
+    def _timed(self, stage: str, frames: int, start: float) -> None:
+        stats = self.stage_stats[stage]
+        stats[0] += frames
+        stats[1] += time.perf_counter() - start
+
+    def stage_report(self) -> str:
+        """Throughput of each stage in the last detect_stream() run, e.g. "decode 240 fps, …"."""
+        rates = {stage: frames / seconds for stage, (frames, seconds) in self.stage_stats.items()
+                 if frames and seconds > 0}
+        if not rates:
+            return "no stage timings"
+        report = ", ".join(f"{stage} {rate:.0f} fps" for stage, rate in rates.items())
+        return f"{report} (slowest: {min(rates, key=rates.get)})"
+
+    def _read(self, batches: Iterator[list]) -> Iterator[list]:
+        """Decode stage: pulls batches from `batches`, timing how long each one takes to arrive."""
+        while True:
+            start = time.perf_counter()
+            batch = next(batches, None)
+            if batch is None:
+                return
+            self._timed("decode", len(batch), start)
+            yield batch
+
+    def _prepare(self, batch: list) -> tuple[list, object]:
+        """Preprocess stage: prepare_batch() on the frames of `batch` that need detection."""
+        start = time.perf_counter()
+        frames = [item[1] for item in batch if item[2] is None]
+        prepared = self.prepare_batch(frames)
+        self._timed("preprocess", len(frames), start)
+        return batch, prepared
+
+    def _prefetched(self, batches: Iterator[list]) -> Iterator[tuple[list, object]]:
+        """
+        Runs the decode stage and the preprocess stage on two background
+        threads while the caller runs inference. The read queue holds up to
+        `prefetch_depth` batches; the prepared queue holds one, since
+        prepared batches may pin device memory or shared-memory slots.
+        """
+        done = object()
+        read: Queue = Queue(maxsize=self.prefetch_depth)
+        ready: Queue = Queue(maxsize=1)
+        stop = threading.Event()
+
+        def put(queue: Queue, item) -> bool:
+            while not stop.is_set():
+                try:
+                    queue.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def get(queue: Queue):
+            while not stop.is_set():
+                try:
+                    return queue.get(timeout=0.1)
+                except Empty:
+                    continue
+            return done
+
+        def decode():
+            try:
+                for batch in self._read(batches):
+                    if not put(read, batch):
+                        return
+                put(read, done)
+            except BaseException as e:
+                put(read, e)
+
+        def preprocess():
+            while True:
+                batch = get(read)
+                if batch is done or isinstance(batch, BaseException):
+                    put(ready, batch)
+                    return
+                try:
+                    item = self._prepare(batch)
+                except BaseException as e:
+                    put(ready, e)
+                    return
+                if not put(ready, item):
+                    return
+
+        threads = [threading.Thread(target=decode, name="detect-decode", daemon=True),
+                   threading.Thread(target=preprocess, name="detect-preprocess", daemon=True)]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                item = ready.get()
+                if item is done:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.resize(gray, self.THUMB_SIZE, interpolation=cv2.INTER_AREA)
+
+    def _batches(self, frames: Iterable[tuple[int, np.ndarray]]) -> Iterator[list[tuple]]:
+        """
+        Groups frames into lists of (index, frame, plan, key) holding up to
+        `batch_size` frames to detect. plan is None (detect), _STATIC (reuse
+        the previous boxes) or the cached faces; key is the cache key of a
+        frame to detect.
+        """
+        cache_key = self.cache_key() if self.cache is not None else None
+        batch = []
+        pending = 0
+        reference = None
+        for index, frame in frames:
+            plan = key = thumb = None
+            if self.static_threshold > 0:
+                thumb = self._thumbnail(frame)
+                if reference is not None and float(cv2.absdiff(thumb, reference).mean()) < self.static_threshold:
+                    plan = _STATIC
+                else:
+                    reference = thumb
+            if plan is None and cache_key is not None:
+                key = frame_hash(self._thumbnail(frame) if thumb is None else thumb, frame.shape)
+                plan = self.cache.get(key, cache_key)
+
+            batch.append((index, frame, plan, key))
+            pending += plan is None
+            if pending >= self.batch_size or len(batch) >= 2 * self.batch_size:
+                yield batch
+                batch = []
+                pending = 0
+        if batch:
+            yield batch
+
+    def detect_stream(self,
+                      frames: Iterable[tuple[int, np.ndarray]],
+                      progress_fn: callable = None
+                     ) -> Iterator[tuple[int, np.ndarray, list[Face]]]:
+        """
+        Runs detection on each (index, frame) pair as it arrives and yields
+        (index, frame, faces), so detection can sit in the middle of a
+        decode -> embed -> encode generator chain without touching disk.
+        Frames are grouped into batches of `batch_size` for detect_batch().
+        """
+        self.results.clear()
+        self.frames_skipped = 0
+        self.stage_stats = {stage: [0, 0.0] for stage in self.STAGES}
+        cache_key = self.cache_key() if self.cache is not None else None
+        batches = self._batches(frames)
+        if self.prefetch:
+            prepared_batches = self._prefetched(batches)
+        else:
+            prepared_batches = (self._prepare(batch) for batch in self._read(batches))
+
+        last: list[Face] = []
+        try:
+            for batch, prepared in prepared_batches:
+                to_detect = [frame for _, frame, plan, _ in batch if plan is None]
+                start = time.perf_counter()
+                detections = iter(self.detect_prepared(prepared, to_detect) if to_detect else [])
+                self._timed("inference", len(to_detect), start)
+
+                for index, frame, plan, key in batch:
+                    if plan is None:
+                        detected = next(detections)
+                        if key is not None:
+                            self.cache.put(key, cache_key, detected)
+                    elif plan is _STATIC:
+                        # static frame: same boxes (copies, trackers set track_id per frame)
+                        detected = [dataclasses.replace(face) for face in last]
+                        self.frames_skipped += 1
+                    else:
+                        detected = plan
+                    last = detected
+                    self.results[index] = detected
+
+                    if progress_fn:
+                        progress_fn()
+
+                    yield index, frame, detected
+        finally:
+            if self.cache is not None:
+                self.cache.flush()
+
+    def detect_in_store(self, store: FrameStore, progress_fn: callable = None) -> FaceMap:
+        """Runs detect() on every frame of `store`, returns: { frame index: [Face, …], … }"""
+        if not len(store):
+            raise ValueError("frame store is empty")
+
+        frames = tqdm(store, total=len(store), desc="Detecting faces", unit="frame")
+        results = FaceMap()
+        for index, _, detected in self.detect_stream(frames, progress_fn):
+            results[index] = detected
+
+        return results
+
+    def detect_in_folder(self, folder: str = "frames", progress_fn: callable = None) -> FaceMap:
+        """Walks through all frame PNGs in `folder`, runs detect(), returns: { frame index: [Face, …], … }"""
+        if not os.path.isdir(folder):
+            raise ValueError(f"{folder} folder not found")
+
+        with PngFrameStore(folder) as store:
+            return self.detect_in_store(store, progress_fn)
+
+    def draw_faces(self, frame: np.ndarray, faces: list[Face], **style) -> np.ndarray:
+        """Preview overlay: a copy of `frame` with this detector's boxes and labels (see face_overlay)."""
+        style.setdefault("text_color", self.TEXT_COLOR)
+        return draw_faces(frame, faces, **style)
@@ -1,47 +1,75 @@
 import os
 import cv2
 import numpy as np
-from tqdm import tqdm
-from models import Face
+from .face import Face
+from .face_map import FaceMap
+from .face_detector_base import FaceDetectorBase
 
-class FaceDetectorDNN:
+class FaceDetectorDNN(FaceDetectorBase):
     """
     A faster/more accurate face detector using OpenCV's DNN (ResNet SSD) model.
+
+    Pipelined: while net.forward() runs on one batch (it releases the GIL),
+    the next batches are decoded and resized / mean-subtracted into a blob on
+    the prefetch threads.
     """
-    def __init__(self, proto_path: str = None, model_path: str = None, conf_threshold: float = 0.5):
+    prefetch = True
+
+    def __init__(self, proto_path: str = None, model_path: str = None, conf_threshold: float = 0.5,
+                 batch_size: int = 8):
         # defaults assume you’ve placed both files alongside this script:
         base = os.path.dirname(__file__)
         self.proto_path = proto_path or os.path.join(base, "deploy.prototxt")
         self.model_path = model_path or os.path.join(base, "res10_300x300_ssd_iter_140000.caffemodel")
         self.conf_threshold = conf_threshold
+        # frames per net.forward() in detect_stream()/detect_in_store()
+        self.batch_size = max(1, int(batch_size))
 
         # load network
         self.net = cv2.dnn.readNetFromCaffe(self.proto_path, self.model_path)
         
-        self.results: dict[str, list[Face]] = {}
+        self.results = FaceMap()
+
+    def cache_params(self) -> dict:
+        return {"model": os.path.basename(self.model_path), "conf_threshold": self.conf_threshold}
 
     def detect(self, frame: np.ndarray) -> list[Face]:
-        h, w = frame.shape[:2]
-        # build a 300x300 blob from the frame
-        blob = cv2.dnn.blobFromImage(
-            cv2.resize(frame, (300, 300)),
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames: list[np.ndarray]) -> list[list[Face]]:
+        return self.detect_prepared(self.prepare_batch(frames), frames)
+
+    def prepare_batch(self, frames: list[np.ndarray]) -> np.ndarray | None:
+        """Resize + mean subtraction: one N x 3 x 300 x 300 blob for the batch."""
+        if not frames:
+            return None
+        return cv2.dnn.blobFromImages(
+            [cv2.resize(frame, (300, 300)) for frame in frames],
             1.0,
             (300, 300),
             (104.0, 177.0, 123.0),
             swapRB=False,
             crop=False
         )
-        self.net.setInput(blob)
-        detections = self.net.forward()
 
+    def detect_prepared(self, prepared: np.ndarray, frames: list[np.ndarray]) -> list[list[Face]]:
+        # a single forward pass for the whole blob
+        self.net.setInput(prepared)
+        # rows: [image_id, label, confidence, x1, y1, x2, y2] for the whole batch
+        detections = self.net.forward()[0, 0]
+        detections = detections[detections[:, 2] >= self.conf_threshold]
+
+        image_ids = detections[:, 0].astype(int)
+        return [self._faces(frame, detections[image_ids == n]) for n, frame in enumerate(frames)]
+
+    def _faces(self, frame: np.ndarray, detections: np.ndarray) -> list[Face]:
+        h, w = frame.shape[:2]
         faces: list[Face] = []
-        for i in range(detections.shape[2]):
-            confidence = float(detections[0, 0, i, 2])
-            if confidence < self.conf_threshold:
-                continue
+        for i, detection in enumerate(detections):
+            confidence = float(detection[2])
 
             # compute the (x, y)-coordinates of the bounding box
-            box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
+            box = detection[3:7] * np.array([w, h, w, h])
             (startX, startY, endX, endY) = box.astype(int)
 
             # clamp to frame size
@@ -49,90 +77,6 @@ class FaceDetectorDNN:
             endX, endY     = min(w - 1, endX), min(h - 1, endY)
             bbox = (startX, startY, endX - startX, endY - startY)
 
-            faces.append(Face.from_bbox(i, frame, bbox, confidence))
+            faces.append(Face.from_bbox(i, bbox, confidence))
 
         return faces
-
-    def detect_in_folder(self, folder: str = "frames", progress_fn: callable = None) -> dict[str, list[Face]]:
-        """Walks through all .jpg/.png in `folder`, runs detect(), returns: { filename: [Face, …], … }"""
-        if not os.path.isdir(folder):
-            raise ValueError(f"{folder} folder not found")
-        
-        if not os.listdir(folder):
-            raise ValueError(f"{folder} folder is empty")       
-
-        self.results.clear()
-        results: dict[str, list[Face]] = {}
-        
-        image_files = [f for f in sorted(os.listdir(folder)) if f.lower().endswith((".jpg", ".jpeg", ".png"))]
-
-        for fname in tqdm(image_files, desc="Detecting faces", unit="frame"):
-            path = os.path.join(folder, fname)
-            frame = cv2.imread(path)
-            if frame is None:
-                continue
-
-            detected = self.detect(frame)
-            results[fname] = detected
-            self.results[fname] = detected
-            
-            # Optional GUI log
-            if progress_fn:
-                progress_fn()   
-        
-        return results
-
-    def draw_boundary(self,
-                        folder: str = "frames",
-                        box_color: tuple[int,int,int] = (0, 255, 0),
-                        text_color: tuple[int,int,int] = (255, 0, 0),
-                        box_thickness: int = 2,
-                        font_scale: float = 0.5,
-                        text_thickness: int = 1,
-                        font: int = cv2.FONT_HERSHEY_SIMPLEX):
-        """
-        For each image in `folder`, detect faces, draw a rectangle around each,
-        and put "index:confidence" at the bottom-left of the box.
-        Overwrites the originals in-place.
-        """
-        detections = self.results
-
-        for fname, faces in detections.items():
-            path = os.path.join(folder, fname)
-            frame = cv2.imread(path)
-            if frame is None:
-                continue
-
-            h_frame, w_frame = frame.shape[:2]
-            for face in faces:
-                x, y, w, h = face.bbox
-
-                # 1) draw bounding box
-                cv2.rectangle(frame, (x, y), (x + w, y + h), box_color, box_thickness)
-
-                # 2) prepare label text
-                label = f"face{face.index}"
-                (text_w, text_h), baseline = cv2.getTextSize(label, font, font_scale, text_thickness)
-
-                # 3) compute text origin at bottom-left of box
-                text_x = x
-                text_y = y + h + text_h + 4
-
-                # if text would go off-image, draw it inside the box instead
-                if text_y > h_frame:
-                    text_y = y + h - 4
-
-                # 4) put the text
-                cv2.putText(
-                    frame,
-                    label,
-                    (text_x, text_y),
-                    font,
-                    font_scale,
-                    text_color,
-                    text_thickness,
-                    cv2.LINE_AA
-                )
-
-            # overwrite the original frame
-            cv2.imwrite(path, frame)
@@ -1,18 +1,26 @@
-import cv2
 import os
+import cv2
 import numpy as np
-from tqdm import tqdm
-from models import Face
+from .face import Face
+from .face_map import FaceMap
+from .face_detector_base import FaceDetectorBase
+
+class FaceDetectorCascade(FaceDetectorBase):
+    TEXT_COLOR = (0, 0, 255)
 
-class FaceDetectorCascade:
     def __init__(self, cascade_path: str = None):
         # default to OpenCV’s bundled frontal-face Haar cascade
         cascade_path = cascade_path or (
             cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
         )
+        self.cascade_path = cascade_path
         self.detector = cv2.CascadeClassifier(cascade_path)
         
-        self.results: dict[str, list[Face]] = {}
+        self.results = FaceMap()
+
+    def cache_params(self) -> dict:
+        # detect_stream() always uses detect()'s default scaleFactor/minNeighbors/minSize
+        return {"cascade": os.path.basename(self.cascade_path)}
 
     def detect(self,
                frame: np.ndarray,
@@ -69,90 +77,6 @@ class FaceDetectorCascade:
         for i, bbox in enumerate(bboxes):
             x, y, w, h = tuple(bbox)
             confidence = float(norm_weights[i]) if i < len(norm_weights) else 0.0
-            faces.append(Face.from_bbox(i, frame, (x, y, w, h), confidence))
+            faces.append(Face.from_bbox(i, (x, y, w, h), confidence))
 
         return faces
-
-    def detect_in_folder(self, folder: str = "frames", progress_fn: callable = None) -> dict[str, list[Face]]:
-        """Walks through all .jpg/.png in `folder`, runs detect(), returns: { filename: [Face, …], … }"""
-        if not os.path.isdir(folder):
-            raise ValueError(f"{folder} folder not found")
-        
-        if not os.listdir(folder):
-            raise ValueError(f"{folder} folder is empty")       
-
-        self.results.clear()
-        results: dict[str, list[Face]] = {}
-        
-        image_files = [f for f in sorted(os.listdir(folder)) if f.lower().endswith((".jpg", ".jpeg", ".png"))]
-
-        for fname in tqdm(image_files, desc="Detecting faces", unit="frame"):
-            path = os.path.join(folder, fname)
-            frame = cv2.imread(path)
-            if frame is None:
-                continue
-
-            detected = self.detect(frame)
-            results[fname] = detected
-            self.results[fname] = detected
-            
-            # Optional GUI log
-            if progress_fn:
-                progress_fn()   
-        
-        return results 
-
-    def draw_boundary(self,
-                        folder: str = "frames",
-                        box_color: tuple[int,int,int] = (0, 255, 0),
-                        text_color: tuple[int,int,int] = (0, 0, 255),
-                        box_thickness: int = 2,
-                        font_scale: float = 0.5,
-                        text_thickness: int = 1,
-                        font: int = cv2.FONT_HERSHEY_SIMPLEX):
-        """
-        For each image in `folder`, detect faces, draw a rectangle around each,
-        and put "index:confidence" at the bottom-left of the box.
-        Overwrites the originals in-place.
-        """
-        detections = self.results
-
-        for fname, faces in detections.items():
-            path = os.path.join(folder, fname)
-            frame = cv2.imread(path)
-            if frame is None:
-                continue
-
-            h_frame, w_frame = frame.shape[:2]
-            for face in faces:
-                x, y, w, h = face.bbox
-
-                # 1) draw bounding box
-                cv2.rectangle(frame, (x, y), (x + w, y + h), box_color, box_thickness)
-
-                # 2) prepare label text
-                label = f"face{face.index}"
-                (text_w, text_h), baseline = cv2.getTextSize(label, font, font_scale, text_thickness)
-
-                # 3) compute text origin at bottom-left of box
-                text_x = x
-                text_y = y + h + text_h + 4
-
-                # if text would go off-image, draw it inside the box instead
-                if text_y > h_frame:
-                    text_y = y + h - 4
-
-                # 4) put the text
-                cv2.putText(
-                    frame,
-                    label,
-                    (text_x, text_y),
-                    font,
-                    font_scale,
-                    text_color,
-                    text_thickness,
-                    cv2.LINE_AA
-                )
-
-            # overwrite the original frame
-            cv2.imwrite(path, frame) 
\ No newline at end of file
@@ -1,20 +1,32 @@
-import os
 import torch
 import cv2
 import numpy as np
-from PIL import Image
 from facenet_pytorch import MTCNN
-from tqdm import tqdm
-from models import Face
+from .face import Face
+from .face_map import FaceMap
+from .face_detector_base import FaceDetectorBase
 
-class FaceDetectorMTCNN:
+class FaceDetectorMTCNN(FaceDetectorBase):
     """
    Uses facenet-pytorch's MTCNN for face detection.
+
+   Frames are fed to MTCNN as N×H×W×3 RGB uint8 tensor stacks (no PIL
+   round-trip); colour conversion and stacking of the next batch run on
+   the prefetch thread while the current batch is being detected.
     """
+    prefetch = True
+
     def __init__(self,
-                 device: str | torch.device = None):
+                 device: str | torch.device = None,
+                 batch_size: int = 16,
+                 num_threads: int = None):
         # choose GPU if available
         self.device = device or (torch.device('cuda:0') if torch.cuda.is_available() else torch.device('cpu'))
+        # frames per MTCNN call in detect_stream()/detect_in_store()
+        self.batch_size = max(1, int(batch_size))
+        # intra-op CPU threads for torch (process-wide); None keeps torch's default
+        if num_threads:
+            torch.set_num_threads(int(num_threads))
         # keep_all=True so we get all faces per frame
         self.mtcnn = MTCNN(
             keep_all=True,
@@ -22,16 +34,44 @@ class FaceDetectorMTCNN:
             device=self.device,
             thresholds=(0.7, 0.8, 0.85),
         )
-        self.results: dict[str, list[Face]] = {}
+        self.results = FaceMap()
 
-    def detect(self, frame: np.ndarray) -> list[Face]:
-        # convert BGR->RGB, to PIL
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = Image.fromarray(rgb)
+    def cache_params(self) -> dict:
+        return {"min_face_size": self.mtcnn.min_face_size, "thresholds": list(self.mtcnn.thresholds)}
 
-        # boxes: Nx4 array of [x1, y1, x2, y2], probs: N-array of confidences
-        boxes, probs = self.mtcnn.detect(img)
+    def detect(self, frame: np.ndarray) -> list[Face]:
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames: list[np.ndarray]) -> list[list[Face]]:
+        return self.detect_prepared(self.prepare_batch(frames), frames)
+
+    def prepare_batch(self, frames: list[np.ndarray]) -> list[torch.Tensor]:
+        """BGR frames -> RGB uint8 tensor stacks, one per distinct frame size (normally just one)."""
+        stacks = []
+        start = 0
+        while start < len(frames):
+            shape = frames[start].shape
+            end = start + 1
+            while end < len(frames) and frames[end].shape == shape:
+                end += 1
+
+            rgb = np.empty((end - start, *shape), dtype=np.uint8)
+            for i, frame in enumerate(frames[start:end]):
+                cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb[i])
+            stacks.append(torch.from_numpy(rgb).to(self.device))
+            start = end
+        return stacks
+
+    def detect_prepared(self, prepared: list[torch.Tensor], frames: list[np.ndarray]) -> list[list[Face]]:
+        results: list[list[Face]] = []
+        for stack in prepared:
+            # per image: boxes Nx4 [x1, y1, x2, y2] and probs N, or None when no face was found
+            boxes, probs = self.mtcnn.detect(stack)
+            for frame_boxes, frame_probs in zip(boxes, probs):
+                results.append(self._faces(frames[len(results)], frame_boxes, frame_probs))
+        return results
 
+    def _faces(self, frame: np.ndarray, boxes, probs) -> list[Face]:
         faces: list[Face] = []
         if boxes is None or probs is None:
             return faces
@@ -46,91 +86,6 @@ class FaceDetectorMTCNN:
 
             # confidence is already in [0,1]
             confidence = float(prob)
-            faces.append(Face.from_bbox(i, frame, bbox, confidence))
+            faces.append(Face.from_bbox(i, bbox, confidence))
 
         return faces
-
-    def detect_in_folder(self, folder: str = "frames", progress_fn: callable = None) -> dict[str, list[Face]]:
-        """Walks through all .jpg/.png in `folder`, runs detect(), returns: { filename: [Face, …], … }"""
-        if not os.path.isdir(folder):
-            raise ValueError(f"{folder} folder not found")
-        
-        if not os.listdir(folder):
-            raise ValueError(f"{folder} folder is empty")       
-
-        self.results.clear()
-        results: dict[str, list[Face]] = {}
-        
-        image_files = [f for f in sorted(os.listdir(folder)) if f.lower().endswith((".jpg", ".jpeg", ".png"))]
-
-        for fname in tqdm(image_files, desc="Detecting faces", unit="frame"):
-            path = os.path.join(folder, fname)
-            frame = cv2.imread(path)
-            if frame is None:
-                continue
-
-            detected = self.detect(frame)
-            results[fname] = detected
-            self.results[fname] = detected
-            
-            # Optional GUI log
-            if progress_fn:
-                progress_fn()   
-        
-        return results
-
-    def draw_boundary(self,
-                        folder: str = "frames",
-                        box_color: tuple[int,int,int] = (0, 255, 0),
-                        text_color: tuple[int,int,int] = (255, 0, 0),
-                        box_thickness: int = 2,
-                        font_scale: float = 0.5,
-                        text_thickness: int = 1,
-                        font: int = cv2.FONT_HERSHEY_SIMPLEX):
-        """
-        For each image in `folder`, detect faces, draw a rectangle around each,
-        and put "index:confidence" at the bottom-left of the box.
-        Overwrites the originals in-place.
-        """
-        # detections = self.detect_in_folder(folder)
-        detections = self.results
-
-        for fname, faces in detections.items():
-            path = os.path.join(folder, fname)
-            frame = cv2.imread(path)
-            if frame is None:
-                continue
-
-            h_frame, w_frame = frame.shape[:2]
-            for face in faces:
-                x, y, w, h = face.bbox
-
-                # 1) draw bounding box
-                cv2.rectangle(frame, (x, y), (x + w, y + h), box_color, box_thickness)
-
-                # 2) prepare label text
-                label = f"face{face.index}"
-                (text_w, text_h), baseline = cv2.getTextSize(label, font, font_scale, text_thickness)
-
-                # 3) compute text origin at bottom-left of box
-                text_x = x
-                text_y = y + h + text_h + 4
-
-                # if text would go off-image, draw it inside the box instead
-                if text_y > h_frame:
-                    text_y = y + h - 4
-
-                # 4) put the text
-                cv2.putText(
-                    frame,
-                    label,
-                    (text_x, text_y),
-                    font,
-                    font_scale,
-                    text_color,
-                    text_thickness,
-                    cv2.LINE_AA
-                )
-
-            # overwrite the original frame
-            cv2.imwrite(path, frame)
\ No newline at end of file
@@ -0,0 +1,111 @@
+import os
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .face import Face
+from .face_map import FaceMap
+from .face_detector_base import FaceDetectorBase
+
+# Per-process detector and attached shared-memory blocks, set up by _init_worker
+_worker = {}
+
+def _init_worker(detector_factory):
+    _worker["detector"] = detector_factory()
+    _worker["blocks"] = {}
+
+
+def _detect_task(task: tuple) -> list[tuple]:
+    """Runs in a worker: detects on a frame in shared memory (or a pickled frame)."""
+    name, offset, shape, frame = task
+    if frame is None:
+        blocks = _worker["blocks"]
+        if name not in blocks:
+            blocks[name] = shared_memory.SharedMemory(name=name)
+        frame = np.ndarray(shape, dtype=np.uint8, buffer=blocks[name].buf, offset=offset)
+    return [(face.index, tuple(map(int, face.bbox)), float(face.confidence))
+            for face in _worker["detector"].detect(frame)]
+
+
+class FaceDetectorPool(FaceDetectorBase):
+    """
+    Multi-process detection engine: `workers` processes each build their
+    own detector with `detector_factory` (a picklable callable, usually the
+    detector class) and detect whole batches in parallel.
+
+    Frames reach the workers through shared memory: prepare_batch() copies
+    a batch into one of three slot sets (the batch being detected, the one
+    queued by the prefetch thread and the one being prepared), so only
+    (block, offset, shape) is pickled. Frames larger than a slot fall back
+    to pickling. Results come back in frame order.
+    """
+    prefetch = True
+    SLOT_SETS = 3
+
+    def __init__(self, detector_factory, workers: int = None, batch_size: int = None):
+        self.detector_factory = detector_factory
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size or 2 * self.workers
+        self.TEXT_COLOR = getattr(detector_factory, "TEXT_COLOR", FaceDetectorBase.TEXT_COLOR)
+
+        # spawn: the GUI process has live threads, which fork does not copy safely
+        self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                         mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=_init_worker,
+                                         initargs=(detector_factory,))
+        self._blocks: list[shared_memory.SharedMemory] = []
+        self._slot_bytes = 0
+        self._next_set = 0
+        self.results = FaceMap()
+
+    def _allocate(self, frame_bytes: int) -> None:
+        self._release_blocks()
+        self._slot_bytes = frame_bytes
+        self._blocks = [shared_memory.SharedMemory(create=True, size=frame_bytes * self.batch_size)
+                        for _ in range(self.SLOT_SETS)]
+
+    def prepare_batch(self, frames: list[np.ndarray]) -> list[tuple]:
+        if not self._blocks and frames:
+            self._allocate(frames[0].nbytes)
+        block = self._blocks[self._next_set] if self._blocks else None
+        self._next_set = (self._next_set + 1) % self.SLOT_SETS
+
+        tasks = []
+        for slot, frame in enumerate(frames):
+            if block is None or frame.dtype != np.uint8 or frame.nbytes > self._slot_bytes:
+                tasks.append((None, 0, frame.shape, frame))
+                continue
+            offset = slot * self._slot_bytes
+            view = np.ndarray(frame.shape, dtype=np.uint8, buffer=block.buf, offset=offset)
+            view[...] = frame
+            tasks.append((block.name, offset, frame.shape, None))
+        return tasks
+
+    def detect_prepared(self, prepared: list[tuple], frames: list[np.ndarray]) -> list[list[Face]]:
+        futures = [self._pool.submit(_detect_task, task) for task in prepared]
+        return [
+            [Face.from_bbox(index, bbox, confidence) for index, bbox, confidence in future.result()]
+            for future in futures
+        ]
+
+    def detect_batch(self, frames: list[np.ndarray]) -> list[list[Face]]:
+        return self.detect_prepared(self.prepare_batch(frames), frames)
+
+    def detect(self, frame: np.ndarray) -> list[Face]:
+        return self.detect_batch([frame])[0]
+
+    def _release_blocks(self) -> None:
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._release_blocks()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,149 @@
+import cv2
+import numpy as np
+from typing import Iterable, Iterator
+from .face import Face
+from .face_map import FaceMap
+from .face_detector_base import FaceDetectorBase
+
+class FaceDetectorTracking(FaceDetectorBase):
+    """
+    Detect-then-track wrapper around any other face detector.
+
+    The wrapped detector runs on every `detect_every`-th frame, on scene
+    changes and whenever tracking degrades; in between, each face box is
+    carried forward with pyramidal Lucas-Kanade optical flow on corner
+    points inside the box. Points that fail the forward-backward check are
+    dropped, and when the surviving fraction of any box falls below
+    `min_quality` the frame is re-detected.
+
+    Frames must arrive in order (detect_stream / detect_in_store do that).
+    """
+    LK_PARAMS = dict(winSize=(21, 21), maxLevel=3,
+                     criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+    MAX_FB_ERROR = 1.0      # px, forward-backward round trip
+    MIN_POINTS = 6
+    SCENE_SIZE = (64, 36)
+
+    def __init__(self,
+                 detector: FaceDetectorBase,
+                 detect_every: int = 5,
+                 min_quality: float = 0.5,
+                 scene_threshold: float = 30.0):
+        self.detector = detector
+        self.detect_every = max(1, int(detect_every))
+        self.min_quality = min_quality
+        self.scene_threshold = scene_threshold
+
+        self.results = FaceMap()
+        self.reset()
+
+    @classmethod
+    def wrap(cls, detector_factory, **kwargs) -> "FaceDetectorTracking":
+        """Picklable factory for SegmentedPipeline: wrap(FaceDetectorDNN, detect_every=5)."""
+        return cls(detector_factory(), **kwargs)
+
+    @property
+    def TEXT_COLOR(self):
+        return self.detector.TEXT_COLOR
+
+    def reset(self) -> None:
+        self._prev_gray = None
+        self._prev_small = None
+        self._tracks: list[tuple[Face, np.ndarray]] = []   # (face, points N×1×2)
+        self._since_detect = 0
+        self.frames_detected = 0
+        self.frames_tracked = 0
+
+    def detect_stream(self,
+                      frames: Iterable[tuple[int, np.ndarray]],
+                      progress_fn: callable = None
+                     ) -> Iterator[tuple[int, np.ndarray, list[Face]]]:
+        self.reset()
+        yield from super().detect_stream(frames, progress_fn)
+
+    def detect(self, frame: np.ndarray) -> list[Face]:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, self.SCENE_SIZE, interpolation=cv2.INTER_AREA)
+
+        faces = None
+        if (self._prev_gray is not None
+                and self._since_detect < self.detect_every
+                and not self._scene_changed(small)):
+            faces = self._track(frame, gray)
+
+        if faces is None:
+            faces = self.detector.detect(frame)
+            self._start_tracks(gray, faces)
+            self._since_detect = 1
+            self.frames_detected += 1
+        else:
+            self._since_detect += 1
+            self.frames_tracked += 1
+
+        self._prev_gray, self._prev_small = gray, small
+        return faces
+
+    def _scene_changed(self, small: np.ndarray) -> bool:
+        diff = cv2.absdiff(small, self._prev_small)
+        return float(diff.mean()) > self.scene_threshold
+
+    def _start_tracks(self, gray: np.ndarray, faces: list[Face]) -> None:
+        self._tracks = []
+        for face in faces:
+            x, y, w, h = face.bbox
+            if w <= 0 or h <= 0:
+                continue
+            mask = np.zeros_like(gray)
+            mask[y:y+h, x:x+w] = 255
+            points = cv2.goodFeaturesToTrack(gray, maxCorners=50, qualityLevel=0.01,
+                                             minDistance=max(3, min(w, h) // 10), mask=mask)
+            self._tracks.append((face, points if points is not None else np.empty((0, 1, 2), np.float32)))
+
+    def _track(self, frame: np.ndarray, gray: np.ndarray) -> list[Face] | None:
+        """Moves every box along its points' flow; None means "re-detect"."""
+        if not self._tracks:
+            return []
+        counts = [len(points) for _, points in self._tracks]
+        if min(counts) < self.MIN_POINTS:
+            return None
+
+        # one LK call (forward and backward) for all boxes together
+        points = np.concatenate([points for _, points in self._tracks]).astype(np.float32)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, points, None, **self.LK_PARAMS)
+        back, status_back, _ = cv2.calcOpticalFlowPyrLK(gray, self._prev_gray, moved, None, **self.LK_PARAMS)
+        fb_error = np.linalg.norm((points - back).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (status_back.ravel() == 1) & (fb_error < self.MAX_FB_ERROR)
+
+        h_frame, w_frame = gray.shape
+        faces: list[Face] = []
+        tracks = []
+        start = 0
+        for (face, _), count in zip(self._tracks, counts):
+            ok = good[start:start + count]
+            old = points[start:start + count][ok].reshape(-1, 2)
+            new = moved[start:start + count][ok].reshape(-1, 2)
+            start += count
+            if ok.sum() < self.MIN_POINTS or ok.mean() < self.min_quality:
+                return None
+
+            # translation = median shift; scale = median change of spread around the centroid
+            dx, dy = np.median(new - old, axis=0)
+            spread_old = np.linalg.norm(old - old.mean(axis=0), axis=1)
+            spread_new = np.linalg.norm(new - new.mean(axis=0), axis=1)
+            valid = spread_old > 1e-3
+            scale = float(np.median(spread_new[valid] / spread_old[valid])) if valid.any() else 1.0
+
+            x, y, w, h = face.bbox
+            cx, cy = x + w / 2 + dx, y + h / 2 + dy
+            w, h = w * scale, h * scale
+            x1, y1 = max(0, int(round(cx - w / 2))), max(0, int(round(cy - h / 2)))
+            x2, y2 = min(w_frame - 1, int(round(cx + w / 2))), min(h_frame - 1, int(round(cy + h / 2)))
+            if x2 <= x1 or y2 <= y1:
+                return None
+
+            tracked = Face.from_bbox(face.index, (x1, y1, x2 - x1, y2 - y1), face.confidence)
+            faces.append(tracked)
+            tracks.append((tracked, new.reshape(-1, 1, 2)))
+
+        self._tracks = tracks
+        return faces
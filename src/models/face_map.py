@@ -0,0 +1,246 @@
+"""
+Columnar face map: { frame index: [Face, …] } stored as two arrays.
+
+    rows     one FACE_DTYPE record per face box, sorted by frame
+    offsets  offsets[k] .. offsets[k + 1] are the rows of frame first + k
+
+so a frame lookup is two array reads, a frame range is a slice of both
+arrays, and the whole map serialises as header + offsets + rows, which
+from_buffer() maps back without copying (e.g. straight from an mmap).
+Only frames with at least one face are keys.
+"""
+import struct
+from collections.abc import MutableMapping
+from typing import Iterable, Iterator, Mapping
+import numpy as np
+from .face import Face
+
+# one row per face box
+FACE_DTYPE = np.dtype([("frame", "<i4"), ("track", "<i4"),
+                       ("x", "<i4"), ("y", "<i4"), ("w", "<i4"), ("h", "<i4"),
+                       ("confidence", "<f4")])
+
+MAGIC = b"FMCO"
+VERSION = 1
+# magic | version | first frame | offsets | rows  (32 bytes, keeps the arrays 8-byte aligned)
+_HEADER = struct.Struct("<4sB3xqqq")
+
+
+class FaceMap(MutableMapping):
+    """
+    Frame-indexed face map in columnar form (see the module docstring).
+
+    Setting frames in increasing order (as every pipeline does) appends in
+    amortised O(1); setting an earlier frame rebuilds the arrays. Faces are
+    built on access (Face.index is the position in its frame), so changing
+    a returned Face does not change the map; assign the list back instead.
+    """
+    def __init__(self, face_map: Mapping[int, list[Face]] | Iterable[tuple[int, list[Face]]] = None):
+        self._set_arrays(np.empty(0, dtype=FACE_DTYPE), np.zeros(1, dtype=np.int64), 0)
+        if isinstance(face_map, FaceMap):
+            self._set_arrays(face_map.rows.copy(), face_map.offsets.copy(), face_map.first)
+        elif face_map is not None:
+            items = face_map.items() if hasattr(face_map, "items") else face_map
+            for index, faces in sorted(((int(i), faces) for i, faces in items), key=lambda item: item[0]):
+                self[index] = faces
+
+    def _set_arrays(self, rows: np.ndarray, offsets: np.ndarray, first: int) -> None:
+        self._rows = rows                  # capacity may exceed the rows in use
+        self._offsets = offsets            # likewise; _span + 1 entries are in use
+        self._span = len(offsets) - 1
+        self._n = int(offsets[-1])
+        self.first = int(first)
+        self._count = int(np.count_nonzero(np.diff(offsets))) if self._span else 0
+
+    @classmethod
+    def from_rows(cls, rows: np.ndarray) -> "FaceMap":
+        """Builds a map from FACE_DTYPE rows (sorted by frame here, stably)."""
+        rows = np.asarray(rows, dtype=FACE_DTYPE)
+        face_map = cls()
+        if len(rows):
+            frames = rows["frame"]
+            if np.any(frames[1:] < frames[:-1]):
+                rows = rows[np.argsort(frames, kind="stable")]
+                frames = rows["frame"]
+            first = int(frames[0])
+            offsets = np.searchsorted(frames, np.arange(first, int(frames[-1]) + 2)).astype(np.int64)
+            face_map._set_arrays(rows, offsets, first)
+        return face_map
+
+    @classmethod
+    def concat(cls, maps: Iterable[Mapping[int, list[Face]]]) -> "FaceMap":
+        """One map from several with disjoint frames (e.g. per-segment maps), in any order."""
+        parts = [cls.coerce(face_map).rows for face_map in maps]
+        return cls.from_rows(np.concatenate(parts) if parts else np.empty(0, dtype=FACE_DTYPE))
+
+    @classmethod
+    def coerce(cls, face_map: Mapping[int, list[Face]]) -> "FaceMap":
+        """`face_map` itself if it already is a FaceMap, else a FaceMap copy of it."""
+        return face_map if isinstance(face_map, cls) else cls(face_map)
+
+    # --- columns ---------------------------------------------------------
+
+    @property
+    def rows(self) -> np.ndarray:
+        """All face rows in frame order (a view)."""
+        return self._rows[:self._n]
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """Row offsets per frame from `first` on; len(offsets) == frames covered + 1 (a view)."""
+        return self._offsets[:self._span + 1]
+
+    def frames(self) -> np.ndarray:
+        """Frame indices that have faces, in decode order."""
+        return np.flatnonzero(np.diff(self.offsets)) + self.first
+
+    def _bounds(self, index: int) -> tuple[int, int]:
+        k = index - self.first
+        if 0 <= k < self._span:
+            return int(self._offsets[k]), int(self._offsets[k + 1])
+        return 0, 0
+
+    def _faces(self, start: int, end: int) -> list[Face]:
+        return [Face(i, (x, y, w, h), confidence, track)
+                for i, (_, track, x, y, w, h, confidence) in enumerate(self._rows[start:end].tolist())]
+
+    # --- mapping ---------------------------------------------------------
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.slice(index.start, index.stop)
+        start, end = self._bounds(int(index))
+        if start == end:
+            raise KeyError(index)
+        return self._faces(start, end)
+
+    def get(self, index: int, default=None):
+        start, end = self._bounds(int(index))
+        return self._faces(start, end) if end > start else default
+
+    def __contains__(self, index) -> bool:
+        start, end = self._bounds(int(index))
+        return end > start
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[int]:
+        return (int(index) for index in self.frames())
+
+    def items(self) -> Iterator[tuple[int, list[Face]]]:
+        offsets = self.offsets
+        for k in np.flatnonzero(np.diff(offsets)).tolist():
+            yield self.first + k, self._faces(int(offsets[k]), int(offsets[k + 1]))
+
+    def values(self) -> Iterator[list[Face]]:
+        return (faces for _, faces in self.items())
+
+    def slice(self, start: int = None, stop: int = None) -> "FaceMap":
+        """Frames start <= index < stop as a FaceMap sharing this map's rows."""
+        k0 = 0 if start is None else min(max(start - self.first, 0), self._span)
+        k1 = self._span if stop is None else min(max(stop - self.first, k0), self._span)
+        offsets = self._offsets[k0:k1 + 1]
+        view = FaceMap()
+        view._set_arrays(self._rows[offsets[0]:offsets[-1]], offsets - offsets[0], self.first + k0)
+        return view
+
+    def range(self, start: int = 0, stop: int = None) -> Iterator[tuple[int, list[Face]]]:
+        """Yields (frame index, faces) for start <= index < stop."""
+        return self.slice(start, stop).items()
+
+    def __setitem__(self, index: int, faces: list[Face]) -> None:
+        index = int(index)
+        if self._span and index < self.first + self._span:
+            self._splice(index, faces)
+            return
+        if not faces:
+            return
+        if not self._span:
+            self.first = index
+            self._reserve(self._n, 1)
+            self._offsets[0] = self._n
+
+        k = index - self.first
+        end = self._n + len(faces)
+        self._reserve(end, k + 2)
+        self._offsets[self._span + 1:k + 1] = self._n      # frames in the gap have no rows
+        rows = self._rows[self._n:end]
+        for row, face in enumerate(faces):
+            rows[row] = (index, face.track_id, *face.bbox, face.confidence)
+        self._offsets[k + 1] = end
+        self._span = k + 1
+        self._n = end
+        self._count += 1
+
+    def _reserve(self, n_rows: int, n_offsets: int) -> None:
+        """Grows (or makes writable) the backing arrays, doubling their capacity."""
+        if len(self._rows) < n_rows or not self._rows.flags.writeable:
+            rows = np.empty(max(n_rows, 2 * len(self._rows), 64), dtype=FACE_DTYPE)
+            rows[:self._n] = self._rows[:self._n]
+            self._rows = rows
+        if len(self._offsets) < n_offsets or not self._offsets.flags.writeable:
+            offsets = np.empty(max(n_offsets, 2 * len(self._offsets), 64), dtype=np.int64)
+            offsets[:self._span + 1] = self._offsets[:self._span + 1]
+            self._offsets = offsets
+
+    def _splice(self, index: int, faces: list[Face]) -> None:
+        """Replaces (or removes, when `faces` is empty) a frame before the end: rebuilds the arrays."""
+        start, end = self._bounds(index)
+        new = np.array([(index, face.track_id, *face.bbox, face.confidence) for face in faces], dtype=FACE_DTYPE)
+        rows = self.rows
+        at = start if end > start else int(np.searchsorted(rows["frame"], index))
+        rows = np.concatenate([rows[:at], new, rows[end if end > start else at:]])
+        self._set_arrays(*self._arrays_of(rows))
+
+    @staticmethod
+    def _arrays_of(rows: np.ndarray) -> tuple[np.ndarray, np.ndarray, int]:
+        built = FaceMap.from_rows(rows)
+        return built._rows, built._offsets, built.first
+
+    def __delitem__(self, index: int) -> None:
+        if index not in self:
+            raise KeyError(index)
+        self._splice(int(index), [])
+
+    def clear(self) -> None:
+        self._set_arrays(np.empty(0, dtype=FACE_DTYPE), np.zeros(1, dtype=np.int64), 0)
+
+    def copy(self) -> "FaceMap":
+        return FaceMap(self)
+
+    def __repr__(self) -> str:
+        return f"FaceMap({len(self)} frames, {self._n} faces)"
+
+    # --- serialisation ---------------------------------------------------
+
+    def to_bytes(self) -> bytes:
+        offsets, rows = self.offsets, self.rows
+        header = _HEADER.pack(MAGIC, VERSION, self.first, len(offsets), len(rows))
+        return b"".join((header, offsets.astype("<i8", copy=False).tobytes(), rows.tobytes()))
+
+    @classmethod
+    def from_buffer(cls, buffer) -> "FaceMap":
+        """Maps a to_bytes() buffer (bytes, mmap, memmap, …) without copying the arrays."""
+        magic, version, first, n_offsets, n_rows = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a columnar face map")
+        if version != VERSION:
+            raise ValueError(f"Unsupported columnar face map version: {version}")
+        offsets = np.frombuffer(buffer, dtype="<i8", count=n_offsets, offset=_HEADER.size)
+        rows = np.frombuffer(buffer, dtype=FACE_DTYPE, count=n_rows, offset=_HEADER.size + offsets.nbytes)
+        face_map = cls()
+        face_map._set_arrays(rows, offsets, first)
+        return face_map
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> "FaceMap":
+        """Memory-maps a saved map; frames are read from the page cache on access."""
+        return cls.from_buffer(np.memmap(path, dtype=np.uint8, mode="r"))
+
+    def __reduce__(self):
+        return FaceMap.from_buffer, (self.to_bytes(),)
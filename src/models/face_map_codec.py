@@ -0,0 +1,233 @@
+"""
+Compact, versioned binary encoding for face maps.
+
+Layout (all integers are unsigned LEB128 varints unless noted):
+
+    b"FMAP" | version (u8) | chunk_frames | entries | n_chunks
+    n_chunks × (first_frame delta, frames in chunk, compressed size)
+    n_chunks × zlib(chunk payload)
+
+A chunk payload is one record per frame that has faces:
+
+    frame delta | n_boxes | n_boxes × (zigzag dx, dy, dw, dh, confidence u8, zigzag dtrack)
+
+Frame indices are delta-coded against the previous record, and each box
+(and its track id) against the box at the same position in the previous
+record, so a steady
+talking head costs a few bytes per frame. Chunks are compressed and
+decoded independently, which lets FaceMapReader decode only the frame
+ranges a caller asks for.
+"""
+import zlib
+import bisect
+from collections import OrderedDict
+from typing import Iterator
+from .face import Face
+from .face_map import FaceMap
+
+MAGIC = b"FMAP"
+VERSION = 2             # 2: adds track ids; version 1 maps are still readable
+SIDECAR_SUFFIX = ".fmap"
+
+
+def _put_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(data, pos: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _unzigzag(value: int) -> int:
+    return (value >> 1) ^ -(value & 1)
+
+
+def _encode_chunk(records: list[tuple[int, list[Face]]], first_frame: int) -> bytes:
+    out = bytearray()
+    prev_frame = first_frame
+    prev_boxes: list[tuple] = []
+    for index, faces in records:
+        _put_varint(out, index - prev_frame)
+        _put_varint(out, len(faces))
+        boxes = []
+        for i, face in enumerate(faces):
+            box = (*(int(v) for v in face.bbox), int(face.track_id))
+            ref = prev_boxes[i] if i < len(prev_boxes) else (0, 0, 0, 0, -1)
+            for value, base in zip(box[:4], ref):
+                _put_varint(out, _zigzag(value - base))
+            out.append(max(0, min(255, round(float(face.confidence) * 255))))
+            _put_varint(out, _zigzag(box[4] - ref[4]))
+            boxes.append(box)
+        prev_frame, prev_boxes = index, boxes
+    return zlib.compress(bytes(out), 9)
+
+
+def _decode_chunk(payload: bytes, first_frame: int, n_frames: int, version: int) -> list[tuple[int, list[Face]]]:
+    data = zlib.decompress(payload)
+    pos = 0
+    frame = first_frame
+    prev_boxes: list[tuple] = []
+    records = []
+    for _ in range(n_frames):
+        delta, pos = _get_varint(data, pos)
+        count, pos = _get_varint(data, pos)
+        frame += delta
+        faces, boxes = [], []
+        for i in range(count):
+            ref = prev_boxes[i] if i < len(prev_boxes) else (0, 0, 0, 0, -1)
+            box = []
+            for base in ref[:4]:
+                value, pos = _get_varint(data, pos)
+                box.append(base + _unzigzag(value))
+            confidence = data[pos] / 255
+            pos += 1
+            track_id = -1
+            if version >= 2:
+                value, pos = _get_varint(data, pos)
+                track_id = ref[4] + _unzigzag(value)
+            boxes.append((*box, track_id))
+            faces.append(Face(i, tuple(box), confidence, track_id))
+        records.append((frame, faces))
+        prev_boxes = boxes
+    return records
+
+
+def encode_face_map(face_map, chunk_frames: int = 256) -> bytes:
+    """Serialises {frame index: [Face, …]} (frames without faces are dropped)."""
+    records = sorted((int(i), faces) for i, faces in face_map.items() if faces)
+
+    chunks = []
+    for start in range(0, len(records), chunk_frames):
+        part = records[start:start + chunk_frames]
+        chunks.append((part[0][0], len(part), _encode_chunk(part, part[0][0])))
+
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    _put_varint(out, chunk_frames)
+    _put_varint(out, len(records))
+    _put_varint(out, len(chunks))
+    prev_first = 0
+    for first, n_frames, payload in chunks:
+        _put_varint(out, first - prev_first)
+        _put_varint(out, n_frames)
+        _put_varint(out, len(payload))
+        prev_first = first
+    for _, _, payload in chunks:
+        out += payload
+    return bytes(out)
+
+
+class FaceMapReader:
+    """
+    Read-only, dict-like view over an encoded face map.
+
+    Only the header is parsed up front; chunks are decompressed on first
+    access and the most recent ones are kept in a small cache.
+    """
+    CACHED_CHUNKS = 8
+
+    def __init__(self, data: bytes):
+        if data[:4] != MAGIC:
+            raise ValueError("Not an encoded face map")
+        if not 1 <= data[4] <= VERSION:
+            raise ValueError(f"Unsupported face map version: {data[4]}")
+        self.version = data[4]
+        self._data = memoryview(data)
+        pos = 5
+        self.chunk_frames, pos = _get_varint(data, pos)
+        self.entries, pos = _get_varint(data, pos)
+        n_chunks, pos = _get_varint(data, pos)
+
+        self._first: list[int] = []
+        self._sizes: list[tuple[int, int, int]] = []    # (frames, offset, length)
+        first = 0
+        header = []
+        for _ in range(n_chunks):
+            delta, pos = _get_varint(data, pos)
+            n_frames, pos = _get_varint(data, pos)
+            length, pos = _get_varint(data, pos)
+            first += delta
+            header.append((first, n_frames, length))
+        for first, n_frames, length in header:
+            self._first.append(first)
+            self._sizes.append((n_frames, pos, length))
+            pos += length
+        self._cache: OrderedDict[int, FaceMap] = OrderedDict()
+
+    def _chunk(self, c: int) -> FaceMap:
+        if c in self._cache:
+            self._cache.move_to_end(c)
+            return self._cache[c]
+        n_frames, offset, length = self._sizes[c]
+        chunk = FaceMap(_decode_chunk(self._data[offset:offset + length], self._first[c], n_frames,
+                                      self.version))
+        self._cache[c] = chunk
+        if len(self._cache) > self.CACHED_CHUNKS:
+            self._cache.popitem(last=False)
+        return chunk
+
+    def _chunk_of(self, index: int) -> int:
+        return bisect.bisect_right(self._first, index) - 1
+
+    def range(self, start: int = 0, stop: int = None) -> Iterator[tuple[int, list[Face]]]:
+        """Yields (frame index, faces) for start <= index < stop, decoding only overlapping chunks."""
+        c = max(self._chunk_of(start), 0)
+        for c in range(c, len(self._first)):
+            if stop is not None and self._first[c] >= stop:
+                break
+            yield from self._chunk(c).range(start, stop)
+
+    def get(self, index: int, default=None):
+        c = self._chunk_of(index)
+        if c < 0:
+            return default
+        return self._chunk(c).get(index, default)
+
+    def __getitem__(self, index: int) -> list[Face]:
+        faces = self.get(index)
+        if faces is None:
+            raise KeyError(index)
+        return faces
+
+    def __contains__(self, index) -> bool:
+        return self.get(index) is not None
+
+    def __len__(self) -> int:
+        return self.entries
+
+    def __bool__(self) -> bool:
+        return self.entries > 0
+
+    def items(self) -> Iterator[tuple[int, list[Face]]]:
+        return self.range()
+
+    def keys(self) -> Iterator[int]:
+        return (index for index, _ in self.range())
+
+    def __iter__(self) -> Iterator[int]:
+        return self.keys()
+
+    def values(self) -> Iterator[list[Face]]:
+        return (faces for _, faces in self.range())
+
+    def copy(self) -> FaceMap:
+        return FaceMap.concat(self._chunk(c) for c in range(len(self._first)))
+
+
+def decode_face_map(data: bytes) -> FaceMap:
+    """Eagerly decodes everything; prefer FaceMapReader for partial access."""
+    return FaceMapReader(data).copy()
@@ -0,0 +1,51 @@
+import cv2
+import numpy as np
+from typing import Iterable, Iterator, Mapping
+from .face import Face
+
+
+def draw_faces(frame: np.ndarray,
+               faces: list[Face],
+               box_color: tuple[int, int, int] = (0, 255, 0),
+               text_color: tuple[int, int, int] = (255, 0, 0),
+               box_thickness: int = 2,
+               font_scale: float = 0.5,
+               text_thickness: int = 1,
+               font: int = cv2.FONT_HERSHEY_SIMPLEX) -> np.ndarray:
+    """
+    Returns a copy of `frame` with a rectangle around each face and
+    "face<track id>" at the bottom-left of the box. The input frame is
+    never modified, so boxes cannot leak into watermarked output.
+    """
+    canvas = frame.copy()
+    h_frame = canvas.shape[0]
+    for face in faces:
+        x, y, w, h = face.bbox
+
+        # 1) draw bounding box
+        cv2.rectangle(canvas, (x, y), (x + w, y + h), box_color, box_thickness)
+
+        # 2) prepare label text
+        label = f"face{face.track_id if face.track_id >= 0 else face.index}"
+        (text_w, text_h), baseline = cv2.getTextSize(label, font, font_scale, text_thickness)
+
+        # 3) compute text origin at bottom-left of box
+        text_x = x
+        text_y = y + h + text_h + 4
+
+        # if text would go off-image, draw it inside the box instead
+        if text_y > h_frame:
+            text_y = y + h - 4
+
+        # 4) put the text
+        cv2.putText(canvas, label, (text_x, text_y), font, font_scale, text_color, text_thickness, cv2.LINE_AA)
+    return canvas
+
+
+def overlay_frames(frames: Iterable[tuple[int, np.ndarray]],
+                   face_map: Mapping[int, list[Face]],
+                   **style) -> Iterator[np.ndarray]:
+    """Yields preview frames: (index, frame) items with the face_map boxes drawn on copies."""
+    for index, frame in frames:
+        faces = face_map.get(index)
+        yield draw_faces(frame, faces, **style) if faces else frame
@@ -0,0 +1,142 @@
+import numpy as np
+from collections import deque
+from typing import Iterable, Iterator, Mapping
+from .face import Face
+from .face_map import FaceMap
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # SciPy is optional; greedy matching is used instead
+    linear_sum_assignment = None
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of two (N, 4) / (M, 4) arrays of (x, y, w, h) boxes -> (N, M)."""
+    a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+    ax1, ay1, ax2, ay2 = a[:, 0:1], a[:, 1:2], a[:, 0:1] + a[:, 2:3], a[:, 1:2] + a[:, 3:4]
+    bx1, by1, bx2, by2 = b[:, 0], b[:, 1], b[:, 0] + b[:, 2], b[:, 1] + b[:, 3]
+
+    inter_w = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None)
+    inter_h = np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None)
+    inter = inter_w * inter_h
+    union = (a[:, 2:3] * a[:, 3:4]) + (b[:, 2] * b[:, 3]) - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def _match(iou: np.ndarray, threshold: float) -> list[tuple[int, int]]:
+    """(row, col) pairs with IoU >= threshold: Hungarian if SciPy is there, else greedy by IoU."""
+    if iou.size == 0:
+        return []
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(-iou)
+        return [(r, c) for r, c in zip(rows, cols) if iou[r, c] >= threshold]
+
+    pairs = []
+    used_rows, used_cols = set(), set()
+    for flat in np.argsort(-iou, axis=None):
+        r, c = divmod(int(flat), iou.shape[1])
+        if iou[r, c] < threshold:
+            break
+        if r in used_rows or c in used_cols:
+            continue
+        pairs.append((r, c))
+        used_rows.add(r)
+        used_cols.add(c)
+    return pairs
+
+
+class IouTracker:
+    """
+    Gives every face a stable `track_id` across frames by matching boxes to
+    the live tracks with an IoU matrix, and drops faces whose track lasts
+    less than `min_duration` seconds (brief false positives, passers-by).
+
+    A track survives gaps of up to `max_gap` seconds without a match.
+    """
+    def __init__(self,
+                 fps: float,
+                 min_duration: float = 0.5,
+                 max_gap: float = 0.2,
+                 iou_threshold: float = 0.3):
+        fps = fps or 25.0
+        self.min_frames = max(1, int(round(min_duration * fps)))
+        self.max_gap = max(1, int(round(max_gap * fps)))
+        self.iou_threshold = iou_threshold
+        self.reset()
+
+    def reset(self) -> None:
+        self._next_id = 0
+        self._boxes = np.empty((0, 4))          # last box of each live track
+        self._ids: list[int] = []
+        self._last_seen: list[int] = []
+        self.lengths: dict[int, int] = {}        # track id -> frames seen
+        self.faces_dropped = 0
+
+    def update(self, index: int, faces: list[Face]) -> list[Face]:
+        """Assigns track_id to each face of frame `index` (in place) and returns them."""
+        alive = [i for i, seen in enumerate(self._last_seen) if index - seen <= self.max_gap]
+        boxes = self._boxes[alive]
+        ids = [self._ids[i] for i in alive]
+        last_seen = [self._last_seen[i] for i in alive]
+
+        matched = {}
+        if faces and ids:
+            iou = iou_matrix(np.array([face.bbox for face in faces]), boxes)
+            matched = dict(_match(iou, self.iou_threshold))
+
+        new_boxes = list(boxes)
+        for f, face in enumerate(faces):
+            t = matched.get(f)
+            if t is None:
+                face.track_id = self._next_id
+                self._next_id += 1
+                ids.append(face.track_id)
+                new_boxes.append(np.asarray(face.bbox, dtype=np.float64))
+                last_seen.append(index)
+            else:
+                face.track_id = ids[t]
+                new_boxes[t] = np.asarray(face.bbox, dtype=np.float64)
+                last_seen[t] = index
+            self.lengths[face.track_id] = self.lengths.get(face.track_id, 0) + 1
+
+        self._boxes = np.array(new_boxes).reshape(-1, 4)
+        self._ids = ids
+        self._last_seen = last_seen
+        return faces
+
+    def _keep(self, faces: list[Face]) -> list[Face]:
+        kept = [face for face in faces if self.lengths.get(face.track_id, 0) >= self.min_frames]
+        self.faces_dropped += len(faces) - len(kept)
+        return kept
+
+    def track_map(self, face_map: Mapping[int, list[Face]]) -> FaceMap:
+        """Tracks a whole face_map and returns it, with track ids, without the short tracks."""
+        self.reset()
+        # FaceMap builds new Faces on every access, so keep the lists the ids were set on
+        tracked = [(index, self.update(index, face_map[index])) for index in sorted(face_map)]
+        result = FaceMap()
+        for index, faces in tracked:
+            result[index] = self._keep(faces)
+        return result
+
+    def track_stream(self,
+                     detections: Iterable[tuple[int, np.ndarray, list[Face]]]
+                    ) -> Iterator[tuple[int, np.ndarray, list[Face]]]:
+        """
+        Streaming version for (index, frame, faces) items. Items are held back
+        for min_frames + max_gap frames, long enough to know whether a face's
+        track reaches the minimum duration, then passed on with short-track
+        faces removed.
+        """
+        self.reset()
+        delay = self.min_frames + self.max_gap
+        pending: deque = deque()
+        for index, frame, faces in detections:
+            pending.append((index, frame, self.update(index, faces)))
+            if len(pending) > delay:
+                index, frame, faces = pending.popleft()
+                yield index, frame, self._keep(faces)
+        while pending:
+            index, frame, faces = pending.popleft()
+            yield index, frame, self._keep(faces)
@@ -0,0 +1,447 @@
+import os
+import re
+import json
+import shutil
+import cv2
+import numpy as np
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator
+
+class FrameStore:
+    """
+    Indexed storage for decoded BGR frames.
+
+    Detectors and watermarkers address frames by integer index through this
+    interface, so the backend (PNG folder, raw memmap, FFV1 container,
+    in-memory LRU) can be picked per job.
+    """
+    def __len__(self) -> int:
+        return len(self.indices())
+
+    def indices(self) -> list[int]:
+        """Sorted indices of the frames currently held."""
+        raise NotImplementedError
+
+    def read(self, index: int) -> np.ndarray | None:
+        """Returns frame `index`, or None if it is not stored."""
+        raise NotImplementedError
+
+    def write(self, index: int, frame: np.ndarray) -> None:
+        """Stores (or replaces) frame `index`."""
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Persists pending writes. A no-op for stores that write through."""
+
+    def close(self) -> None:
+        self.flush()
+
+    def iter_indices(self, indices: Iterable[int]) -> Iterator[tuple[int, np.ndarray]]:
+        """Yields (index, frame) for `indices`, in the given order, skipping missing frames."""
+        for index in indices:
+            frame = self.read(index)
+            if frame is not None:
+                yield index, frame
+
+    def __iter__(self) -> Iterator[tuple[int, np.ndarray]]:
+        """Yields (index, frame) in index order."""
+        return self.iter_indices(self.indices())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def ordered_map(fn: Callable, items: Iterable, pool: ThreadPoolExecutor, max_in_flight: int) -> Iterator:
+    """
+    Like pool.map(fn, items), but submits lazily with at most `max_in_flight`
+    calls outstanding, so a long frame sequence never piles up in memory.
+    Results come back in input order.
+    """
+    in_flight: deque[Future] = deque()
+    try:
+        for item in items:
+            in_flight.append(pool.submit(fn, item))
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+    finally:
+        # consumer stopped early (e.g. verification found a match)
+        for future in in_flight:
+            future.cancel()
+
+
+class PngFrameStore(FrameStore):
+    """
+    One `frame_0001.png` file per frame in a folder (the original layout).
+
+    cv2.imread/imwrite release the GIL, so PNG decode and deflate run on a
+    thread pool: iteration prefetches up to `max_in_flight` frames ahead, and
+    write() returns immediately with at most `max_in_flight` encodes pending.
+    `png_compression` (0-9) trades disk space for encode time.
+    """
+    PATTERN = re.compile(r"frame_(\d+)\.png$", re.IGNORECASE)
+
+    def __init__(self, folder: str = "frames", png_compression: int = 1, workers: int = None, max_in_flight: int = None):
+        if not 0 <= png_compression <= 9:
+            raise ValueError("png_compression must be between 0 and 9")
+        self.folder = folder
+        self.png_compression = png_compression
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.max_in_flight = max_in_flight or 2 * self.workers
+        self._pool = None
+        self._pending: dict[int, Future] = {}
+
+        os.makedirs(folder, exist_ok=True)
+        self._indices = {
+            int(m.group(1))
+            for m in map(self.PATTERN.search, os.listdir(folder)) if m
+        }
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="png")
+        return self._pool
+
+    @staticmethod
+    def file_name(index: int) -> str:
+        return f"frame_{index:04d}.png"
+
+    def path(self, index: int) -> str:
+        return os.path.join(self.folder, self.file_name(index))
+
+    def indices(self) -> list[int]:
+        return sorted(self._indices)
+
+    def read(self, index: int) -> np.ndarray | None:
+        if index not in self._indices:
+            return None
+        if index in self._pending:
+            self._pending.pop(index).result()
+        return cv2.imread(self.path(index))
+
+    def iter_indices(self, indices: Iterable[int]) -> Iterator[tuple[int, np.ndarray]]:
+        wanted = [i for i in indices if i in self._indices]
+        for index in wanted:
+            if index in self._pending:
+                self._pending.pop(index).result()
+        frames = ordered_map(cv2.imread, map(self.path, wanted), self._executor(), self.max_in_flight)
+        try:
+            for index, frame in zip(wanted, frames):
+                if frame is not None:
+                    yield index, frame
+        finally:
+            frames.close()
+
+    def _encode(self, index: int, frame: np.ndarray) -> None:
+        path = self.path(index)
+        if not cv2.imwrite(path, frame, [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression]):
+            raise ValueError(f"Cannot write frame: {path}")
+
+    def write(self, index: int, frame: np.ndarray) -> None:
+        """Queues the PNG encode; the caller must not modify `frame` afterwards."""
+        if index in self._pending:
+            self._pending.pop(index).result()
+        while len(self._pending) >= self.max_in_flight:
+            oldest = next(iter(self._pending))
+            self._pending.pop(oldest).result()
+        self._pending[index] = self._executor().submit(self._encode, index, frame)
+        self._indices.add(index)
+
+    def flush(self) -> None:
+        while self._pending:
+            _, future = self._pending.popitem()
+            future.result()
+
+    def close(self) -> None:
+        self.flush()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+class MemmapFrameStore(FrameStore):
+    """
+    Raw BGR frames in a single `numpy.memmap` file: no encode/decode cost
+    and O(1) random access by index. The shape lives in a `.json` sidecar;
+    the file grows automatically if more frames arrive than were reserved.
+    """
+    def __init__(self, path: str, frame_count: int = 0, height: int = None, width: int = None):
+        self.path = path
+        self.meta_path = path + ".json"
+
+        if os.path.exists(self.path) and os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            self.height, self.width = meta["height"], meta["width"]
+            self._count = meta["count"]
+            capacity = max(meta["capacity"], frame_count)
+            mode = "r+"
+        else:
+            if height is None or width is None:
+                raise ValueError("height and width are required for a new memmap store")
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.height, self.width = height, width
+            self._count = 0
+            capacity = max(frame_count, 1)
+            mode = "w+"
+
+        self._map(capacity, mode)
+
+    def _map(self, capacity: int, mode: str = "r+") -> None:
+        shape = (capacity, self.height, self.width, 3)
+        if mode == "r+":
+            # memmap cannot map past the end of the file, so extend it first
+            size = int(np.prod(shape))
+            if os.path.getsize(self.path) < size:
+                with open(self.path, "r+b") as f:
+                    f.truncate(size)
+        self._frames = np.memmap(self.path, dtype=np.uint8, mode=mode, shape=shape)
+
+    def _grow(self, needed: int) -> None:
+        capacity = max(needed, 2 * self._frames.shape[0])
+        self._frames.flush()
+        del self._frames
+        self._map(capacity)
+
+    def indices(self) -> list[int]:
+        return list(range(self._count))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def read(self, index: int) -> np.ndarray | None:
+        if not 0 <= index < self._count:
+            return None
+        return self._frames[index]
+
+    def write(self, index: int, frame: np.ndarray) -> None:
+        if frame.shape != (self.height, self.width, 3):
+            raise ValueError(f"Frame shape {frame.shape} does not match store {(self.height, self.width, 3)}")
+        if index >= self._frames.shape[0]:
+            self._grow(index + 1)
+        # read() hands out views, so writing a frame back onto itself is free
+        if not np.shares_memory(self._frames[index], frame):
+            self._frames[index] = frame
+        self._count = max(self._count, index + 1)
+
+    def flush(self) -> None:
+        self._frames.flush()
+        with open(self.meta_path, "w") as f:
+            json.dump({
+                "height": self.height,
+                "width": self.width,
+                "count": self._count,
+                "capacity": self._frames.shape[0],
+            }, f)
+
+
+class Ffv1FrameStore(FrameStore):
+    """
+    Frames in a lossless FFV1/MKV container: far smaller than PNGs and much
+    cheaper to encode. Frames must first be appended in order; rewriting
+    existing frames is buffered and applied in a single remux on flush().
+    """
+    FOURCC = "FFV1"
+
+    def __init__(self, path: str, fps: float = 25.0):
+        self.path = path
+        self.fps = fps or 25.0
+        self._count = 0
+        self._writer = None
+        self._reader = None
+        self._reader_pos = 0
+        self._pending: dict[int, np.ndarray] = {}
+
+        if os.path.exists(path):
+            cap = cv2.VideoCapture(path)
+            self._count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+
+    def indices(self) -> list[int]:
+        return list(range(self._count))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _close_writer(self) -> None:
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+    def _close_reader(self) -> None:
+        if self._reader is not None:
+            self._reader.release()
+            self._reader = None
+
+    def read(self, index: int) -> np.ndarray | None:
+        if index in self._pending:
+            return self._pending[index]
+        if not 0 <= index < self._count:
+            return None
+
+        self._close_writer()
+        if self._reader is None:
+            self._reader = cv2.VideoCapture(self.path)
+            self._reader_pos = 0
+        # FFV1 is intra-only, so seeking is exact; skip it for sequential reads
+        if index != self._reader_pos:
+            self._reader.set(cv2.CAP_PROP_POS_FRAMES, index)
+        ret, frame = self._reader.read()
+        self._reader_pos = index + 1
+        return frame if ret else None
+
+    def write(self, index: int, frame: np.ndarray) -> None:
+        if index < self._count:
+            self._pending[index] = frame.copy()
+            return
+        if index != self._count:
+            raise ValueError(f"FFV1 store is append-only: expected frame {self._count}, got {index}")
+
+        self._close_reader()
+        if self._writer is None:
+            if self._count:
+                # reopening a container for append is not possible; fold it into a rewrite
+                self._pending[index] = frame.copy()
+                self._count += 1
+                return
+            h, w = frame.shape[:2]
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.FOURCC), self.fps, (w, h))
+            if not self._writer.isOpened():
+                raise ValueError("Cannot create FFV1 writer. Check the OpenCV FFmpeg build.")
+        self._writer.write(frame)
+        self._count += 1
+
+    def flush(self) -> None:
+        self._close_writer()
+        if not self._pending:
+            return
+
+        self._close_reader()
+        tmp = self.path + ".tmp.mkv"
+        cap = cv2.VideoCapture(self.path)
+        out = None
+        try:
+            for index in range(self._count):
+                ret, frame = cap.read() if cap.isOpened() else (False, None)
+                frame = self._pending.get(index, frame if ret else None)
+                if frame is None:
+                    raise ValueError(f"Cannot read frame {index} from {self.path}")
+                if out is None:
+                    h, w = frame.shape[:2]
+                    out = cv2.VideoWriter(tmp, cv2.VideoWriter_fourcc(*self.FOURCC), self.fps, (w, h))
+                out.write(frame)
+        finally:
+            cap.release()
+            if out is not None:
+                out.release()
+        os.replace(tmp, self.path)
+        self._pending.clear()
+
+
+class LruFrameStore(FrameStore):
+    """
+    Bounded in-memory frame cache holding at most `capacity` frames.
+
+    With a `backing` store, misses are read through and evicted frames that
+    were modified are written back, so it works as a RAM cache in front of
+    any other backend. Without one it is the only copy of its frames, so it
+    refuses (RuntimeError) to write a new frame once it is full rather than
+    evict a frame that was never stored anywhere else.
+    """
+    def __init__(self, capacity: int = 256, backing: FrameStore = None):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.backing = backing
+        self._frames: OrderedDict[int, np.ndarray] = OrderedDict()
+        self._dirty: set[int] = set()
+
+    def indices(self) -> list[int]:
+        if self.backing is None:
+            return sorted(self._frames)
+        return sorted(set(self.backing.indices()) | set(self._frames))
+
+    def _evict(self) -> None:
+        while len(self._frames) > self.capacity:
+            index, frame = self._frames.popitem(last=False)
+            if index in self._dirty:
+                self._dirty.discard(index)
+                if self.backing is not None:
+                    self.backing.write(index, frame)
+
+    def read(self, index: int) -> np.ndarray | None:
+        if index in self._frames:
+            self._frames.move_to_end(index)
+            return self._frames[index]
+        if self.backing is None:
+            return None
+        frame = self.backing.read(index)
+        if frame is not None:
+            self._frames[index] = frame
+            self._evict()
+        return frame
+
+    def write(self, index: int, frame: np.ndarray) -> None:
+        if self.backing is None and index not in self._frames and len(self._frames) >= self.capacity:
+            raise RuntimeError(f"In-memory frame store is full ({self.capacity} frames) "
+                               f"and has no backing store to evict frame {index} to")
+        self._frames[index] = frame
+        self._frames.move_to_end(index)
+        self._dirty.add(index)
+        self._evict()
+
+    def flush(self) -> None:
+        if self.backing is None:
+            return
+        for index in sorted(self._dirty):
+            self.backing.write(index, self._frames[index])
+        self._dirty.clear()
+        self.backing.flush()
+
+
+FRAME_STORES = ("png", "memmap", "ffv1", "memory")
+
+def open_frame_store(kind: str,
+                     folder: str = "frames",
+                     frame_count: int = 0,
+                     width: int = None,
+                     height: int = None,
+                     fps: float = None,
+                     cache_size: int = 0,
+                     clear: bool = False,
+                     png_compression: int = 1) -> FrameStore:
+    """
+    Creates the frame store `kind` (one of FRAME_STORES) inside `folder`.
+    A non-zero `cache_size` puts an LruFrameStore of that size in front of it.
+    "memory" is that LruFrameStore alone: it needs a `cache_size` of at
+    least `frame_count`, as nothing backs the frames it would evict.
+    """
+    if clear and os.path.isdir(folder):
+        shutil.rmtree(folder)
+    os.makedirs(folder, exist_ok=True)
+
+    if kind == "png":
+        store = PngFrameStore(folder, png_compression)
+    elif kind == "memmap":
+        store = MemmapFrameStore(os.path.join(folder, "frames.raw"), frame_count, height, width)
+    elif kind == "ffv1":
+        store = Ffv1FrameStore(os.path.join(folder, "frames.mkv"), fps)
+    elif kind == "memory":
+        if not cache_size:
+            raise ValueError('The "memory" frame store needs a cache_size (frames kept in RAM)')
+        if frame_count > cache_size:
+            raise ValueError(f'The "memory" frame store holds {cache_size} frames, the video has {frame_count}; '
+                             f'use a disk store or a larger cache_size')
+        return LruFrameStore(cache_size)
+    else:
+        raise ValueError(f"Unknown frame store: {kind}")
+
+    if cache_size:
+        store = LruFrameStore(cache_size, backing=store)
+    return store
@@ -0,0 +1,59 @@
+import importlib
+import threading
+
+# method name -> "module:Class"; modules are imported on first use, so torch,
+# facenet_pytorch and pywt only load when MTCNN / DWT are actually chosen
+DETECTORS = {
+    "haarcascade": "face_detector_haarcascade:FaceDetectorCascade",
+    "dnn": "face_detector_dnn:FaceDetectorDNN",
+    "mtcnn": "face_detector_mtcnn:FaceDetectorMTCNN",
+}
+WATERMARKS = {
+    "lsb": "watermark_lsb_fragile:WatermarkLsbFragile",
+    "avgqim": "watermark_avg_hash_qim:WatermarkAvgHashQim",
+    "dwt": "watermark_block_checksum_dwt:WatermarkBlockChecksumDwt",
+}
+
+
+def load_class(spec: str) -> type:
+    """Imports "module:Class" (a module of this package) and returns the class."""
+    module, name = spec.split(":")
+    return getattr(importlib.import_module(f"{__package__}.{module}"), name)
+
+
+class Registry:
+    """
+    Name -> instance, each built on first get() from `specs` (see DETECTORS)
+    with the keyword arguments in `kwargs[name]`, then passed to `setup`.
+    Instances are kept, so a model is loaded at most once. Thread-safe:
+    the controller's workers run on background threads.
+    """
+    def __init__(self, specs: dict[str, str], kwargs: dict[str, dict] = None, setup: callable = None):
+        self.specs = specs
+        self.kwargs = kwargs or {}
+        self.setup = setup
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.specs
+
+    def names(self) -> list[str]:
+        return list(self.specs)
+
+    def cls(self, name: str) -> type:
+        return load_class(self.specs[name])
+
+    def loaded(self) -> dict:
+        """Instances created so far."""
+        return dict(self._instances)
+
+    def get(self, name: str):
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                instance = self.cls(name)(**self.kwargs.get(name, {}))
+                if self.setup:
+                    self.setup(instance)
+                self._instances[name] = instance
+            return instance
@@ -0,0 +1,227 @@
+import os
+import shutil
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .face_map import FaceMap
+from .face_tracker import IouTracker
+from .detection_cache import DetectionCache
+from .av_io import AvReader, AvWriter, concat_segments
+from .video_probe import probe_video
+from .video_model import Video
+
+# Per-process detector/watermark, created once by _init_worker
+_worker = {}
+
+def _init_worker(detector_factory, watermark_factory):
+    _worker["detector"] = detector_factory()
+    _worker["watermark"] = watermark_factory()
+
+
+def _detector(task: dict):
+    detector = _worker["detector"]
+    detector.static_threshold = task["static_threshold"]
+    if task["detection_cache"] and detector.cache is None:
+        detector.cache = DetectionCache(task["detection_cache"], task["detection_cache_bytes"])
+    return detector
+
+
+def _detect_segment(task: dict) -> dict:
+    """
+    Runs in a worker process: decodes and detects one segment without
+    writing anything, for the two-pass mode where tracking has to see the
+    whole video (see SegmentedPipeline.run()).
+    """
+    detector = _detector(task)
+    face_map = FaceMap()
+    frames = 0
+    with AvReader(task["video_path"]) as reader:
+        decoded = enumerate(reader.iter_range(task["start_pts"], task["end_pts"]), task["start"])
+        for index, _, faces in detector.detect_stream(decoded):
+            if faces:
+                face_map[index] = faces
+            frames += 1
+    return {"face_map": face_map, "frames": frames, "skipped": detector.frames_skipped}
+
+
+def _process_segment(task: dict) -> dict:
+    """
+    Runs in a worker process: decodes one GOP-aligned segment, detects (or
+    takes the faces from task["face_map"] when given), embeds, optionally
+    verifies, and encodes it to its own file.
+    """
+    known = task.get("face_map")
+    detector = None if known is not None else _detector(task)
+    watermark = _worker["watermark"]
+    face_map = FaceMap()
+    frames = verified = failed = 0
+
+    with AvReader(task["video_path"]) as reader, \
+         AvWriter(task["output_path"], reader.width, reader.height, task["fps"],
+                  codec=task["encoder"], preset=task["preset"], crf=task["crf"]) as out:
+        decoded = enumerate(reader.iter_range(task["start_pts"], task["end_pts"]), task["start"])
+        if detector is not None:
+            detected = detector.detect_stream(decoded)
+        else:
+            detected = ((index, frame, known.get(index, [])) for index, frame in decoded)
+        for index, frame, faces in detected:
+            if faces:
+                watermark.embed_frame(frame, faces, index)
+                if task["verify"]:
+                    if watermark.verify_frame(frame, faces) is not None:
+                        verified += 1
+                    else:
+                        failed += 1
+                face_map[index] = faces
+            out.write(frame)
+            frames += 1
+
+    return {"face_map": face_map, "frames": frames, "verified": verified, "failed": failed,
+            "skipped": detector.frames_skipped if detector is not None else 0}
+
+
+class SegmentedPipeline:
+    """
+    GOP-parallel variant of StreamPipeline.
+
+    The input is split at keyframes into segments of at least
+    `segment_frames` frames; each segment is decoded, detected, watermarked
+    and encoded by a worker process with its own detector and watermark
+    instance, then the segments are joined with the concat demuxer without
+    re-encoding, with the face map muxed in as metadata. Memory per worker
+    stays at one frame plus codec buffers.
+
+    With `min_face_duration` set, face tracks have to be followed across
+    segment joins, so the segments are first only detected in parallel,
+    tracked once over the whole video in this process, and then watermarked
+    and encoded in parallel from the tracked face map.
+
+    `detector_factory` / `watermark_factory` are picklable callables (usually
+    the classes themselves) invoked once per worker process.
+    """
+    def __init__(self,
+                 video: Video,
+                 detector_factory,
+                 watermark_factory,
+                 verify: bool = True,
+                 segment_frames: int = 300,
+                 workers: int = None,
+                 min_face_duration: float = None,
+                 static_threshold: float = 0.0,
+                 detection_cache: str = None,
+                 detection_cache_bytes: int = 256 * 1024 * 1024):
+        self.video = video
+        self.detector_factory = detector_factory
+        self.watermark_factory = watermark_factory
+        self.verify = verify
+        self.segment_frames = segment_frames
+        self.workers = workers or os.cpu_count() or 1
+        self.min_face_duration = min_face_duration
+        self.static_threshold = static_threshold
+        self.detection_cache = detection_cache      # path of a DetectionCache shared by the workers
+        self.detection_cache_bytes = detection_cache_bytes
+
+        self.face_map = FaceMap()
+        self.frames_processed = 0
+        self.frames_verified = 0
+        self.frames_failed = 0
+        self.faces_dropped = 0
+        self.frames_skipped = 0
+
+    @staticmethod
+    def plan_segments(keyframes: list[int], frame_count: int, segment_frames: int) -> list[tuple[int, int]]:
+        """Groups GOPs into [start, end) frame ranges of at least `segment_frames` frames."""
+        starts = [k for k in keyframes if k < frame_count] or [0]
+        if starts[0] != 0:
+            starts.insert(0, 0)
+
+        segments = []
+        seg_start = 0
+        for k in starts[1:]:
+            if k - seg_start >= segment_frames:
+                segments.append((seg_start, k))
+                seg_start = k
+        segments.append((seg_start, frame_count))
+        return segments
+
+    def run(self, output_path: str = "video_output.mp4", progress_fn=None) -> FaceMap:
+        """Processes the video across the process pool and returns the face_map."""
+        if self.video.fps is None:
+            self.video.get_video_info()
+
+        probe = probe_video(self.video.video_path)
+        frame_pts = probe.frame_pts
+        segments = self.plan_segments(probe.keyframes, len(frame_pts), self.segment_frames)
+
+        self.face_map = FaceMap()
+        parts: list[FaceMap] = []
+        self.frames_processed = self.frames_verified = self.frames_failed = 0
+        self.faces_dropped = self.frames_skipped = 0
+
+        work_dir = tempfile.mkdtemp(prefix="segments_", dir=os.path.dirname(os.path.abspath(output_path)))
+        try:
+            tasks = []
+            for i, (start, end) in enumerate(segments):
+                tasks.append({
+                    "segment": i,
+                    "video_path": self.video.video_path,
+                    "output_path": os.path.join(work_dir, f"seg_{i:05d}.mp4"),
+                    "start": start,
+                    "start_pts": frame_pts[start],
+                    "end_pts": frame_pts[end] if end < len(frame_pts) else None,
+                    "fps": self.video.fps,
+                    "encoder": self.video.encoder,
+                    "preset": self.video.preset,
+                    "crf": self.video.crf,
+                    "verify": self.verify,
+                    "min_face_duration": self.min_face_duration,
+                    "static_threshold": self.static_threshold,
+                    "detection_cache": self.detection_cache,
+                    "detection_cache_bytes": self.detection_cache_bytes,
+                })
+
+            # spawn: the GUI process has live threads, which fork does not copy safely
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks)),
+                                     mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_worker,
+                                     initargs=(self.detector_factory, self.watermark_factory)) as pool:
+                # with a minimum face duration the tracks must be decided over the
+                # whole video, or faces crossing a segment join would be cut in two:
+                # detect per segment, track once here, then embed per segment
+                share = 1.0
+                if self.min_face_duration is not None:
+                    share = 0.5
+                    detected = []
+                    for future in as_completed([pool.submit(_detect_segment, task) for task in tasks]):
+                        result = future.result()
+                        detected.append(result["face_map"])
+                        self.frames_skipped += result["skipped"]
+                        if progress_fn:
+                            progress_fn(result["frames"] * share)
+
+                    tracker = IouTracker(self.video.fps, self.min_face_duration)
+                    tracked = tracker.track_map(FaceMap.concat(detected))
+                    self.faces_dropped = tracker.faces_dropped
+                    for task, (start, end) in zip(tasks, segments):
+                        task["face_map"] = tracked.slice(start, end)
+
+                futures = [pool.submit(_process_segment, task) for task in tasks]
+                for future in as_completed(futures):
+                    result = future.result()
+                    parts.append(result["face_map"])
+                    self.frames_processed += result["frames"]
+                    self.frames_verified += result["verified"]
+                    self.frames_failed += result["failed"]
+                    self.frames_skipped += result["skipped"]
+
+                    if progress_fn:
+                        progress_fn(result["frames"] * share)
+
+            self.face_map = FaceMap.concat(parts)
+            audio_source = self.video.video_path if self.video.copy_audio else None
+            concat_segments([task["output_path"] for task in tasks], output_path, audio_source,
+                            metadata=self.video.face_map_metadata(self.face_map))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        return self.face_map
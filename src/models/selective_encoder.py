@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+from .face_map import FaceMap
+from .av_io import AvReader, AvWriter, concat_segments, copy_video_packets, segments_splice
+from .video_probe import probe_video
+from .segmented_pipeline import SegmentedPipeline
+from .video_model import Video
+
+class SelectiveEncoder:
+    """
+    Writes the watermarked output by re-encoding only the GOPs that contain
+    faces. GOPs without any entry in the face_map are stream-copied from the
+    source, untouched, and everything is remuxed into one file.
+
+    Copying is only possible when the source is H.264 with closed GOPs and
+    the output encoder is libx264; otherwise every GOP is re-encoded.
+    Re-encoded runs take the source's B-frame use, GOP length, profile and
+    time base, and if they still do not splice with the copied GOPs (DTS
+    not increasing across a join) the whole video is re-encoded instead.
+    """
+    # FFmpeg H.264 profile name -> libx264 profile
+    X264_PROFILES = {"Baseline": "baseline", "Constrained Baseline": "baseline",
+                     "Main": "main", "High": "high"}
+
+    def __init__(self, video: Video, watermark, face_map: FaceMap):
+        self.video = video
+        self.watermark = watermark
+        self.face_map = FaceMap.coerce(face_map)
+
+        self.gops_copied = 0
+        self.gops_encoded = 0
+        self.frames_encoded = 0
+        self._encoder_settings = {}
+
+    def _can_copy(self, probe) -> bool:
+        if not probe.closed_gops or self.video.encoder != "libx264":
+            return False
+        video = next(s for s in probe.streams if s["type"] == "video")
+        if video["codec"] != "h264":
+            return False
+        with AvReader(self.video.video_path) as reader:
+            codec = reader.stream.codec_context
+            return codec.format is not None and codec.format.name == "yuv420p"
+
+    def _splice_settings(self, gops: list[tuple[int, int]]) -> dict:
+        """AvWriter settings that make re-encoded runs match the source GOPs they sit between."""
+        with AvReader(self.video.video_path) as reader:
+            settings = {"keyint": max(end - start for start, end in gops),
+                        "profile": self.X264_PROFILES.get(reader.stream.profile),
+                        "time_base": reader.stream.time_base}
+            if not reader.stream.codec_context.has_b_frames:
+                settings["bframes"] = 0
+        return settings
+
+    def plan(self) -> list[tuple[int, int, bool]]:
+        """Returns [start, end) frame runs with a flag telling whether they need re-encoding."""
+        probe = probe_video(self.video.video_path)
+        frame_pts = self._frame_pts = probe.frame_pts
+        gops = SegmentedPipeline.plan_segments(probe.keyframes, len(frame_pts), 1)
+
+        self.gops_copied = 0
+        self.gops_encoded = len(gops)
+        self._encoder_settings = {}
+        if not self._can_copy(probe):
+            return [(0, len(frame_pts), True)]
+        self._encoder_settings = self._splice_settings(gops)
+
+        runs: list[tuple[int, int, bool]] = []
+        for start, end in gops:
+            # any face frame inside [start, end)?
+            dirty = len(self.face_map.slice(start, end)) > 0
+            if not dirty:
+                self.gops_copied += 1
+                self.gops_encoded -= 1
+            if runs and runs[-1][2] == dirty:
+                runs[-1] = (runs[-1][0], end, dirty)
+            else:
+                runs.append((start, end, dirty))
+        return runs
+
+    def _encode_run(self, start: int, end: int, path: str, progress_fn=None) -> None:
+        end_pts = self._frame_pts[end] if end < len(self._frame_pts) else None
+        with AvReader(self.video.video_path) as reader, \
+             AvWriter(path, reader.width, reader.height, self.video.fps,
+                      codec=self.video.encoder, preset=self.video.preset, crf=self.video.crf,
+                      repeat_headers=True, **self._encoder_settings) as out:
+            for index, frame in enumerate(reader.iter_range(self._frame_pts[start], end_pts), start):
+                faces = self.face_map.get(index)
+                if faces:
+                    self.watermark.embed_frame(frame, faces, index)
+                out.write(frame)
+                self.frames_encoded += 1
+
+                if progress_fn:
+                    progress_fn()
+
+    def run(self, output_path: str = "video_output.mp4", progress_fn=None) -> str:
+        if self.video.fps is None:
+            self.video.get_video_info()
+
+        runs = self.plan()
+        self.frames_encoded = 0
+
+        work_dir = tempfile.mkdtemp(prefix="selective_", dir=os.path.dirname(os.path.abspath(output_path)))
+        try:
+            paths = []
+            for i, (start, end, dirty) in enumerate(runs):
+                path = os.path.join(work_dir, f"run_{i:05d}.mp4")
+                if dirty:
+                    self._encode_run(start, end, path, progress_fn)
+                else:
+                    end_pts = self._frame_pts[end] if end < len(self._frame_pts) else None
+                    copy_video_packets(self.video.video_path, path, self._frame_pts[start], end_pts)
+                    if progress_fn:
+                        progress_fn(end - start)
+                paths.append(path)
+
+            if self.gops_copied and not segments_splice(paths):
+                # the re-encoded runs do not line up with the copied GOPs
+                for path in paths:
+                    os.remove(path)
+                paths = [os.path.join(work_dir, "full.mp4")]
+                self.gops_encoded += self.gops_copied
+                self.gops_copied = 0
+                self.frames_encoded = 0
+                self._encode_run(0, len(self._frame_pts), paths[0])
+
+            audio_source = self.video.video_path if self.video.copy_audio else None
+            concat_segments(paths, output_path, audio_source,
+                            metadata=self.video.face_map_metadata(self.face_map))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        return output_path
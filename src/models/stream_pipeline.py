@@ -0,0 +1,83 @@
+import numpy as np
+from typing import Iterator
+from .face import Face
+from .face_map import FaceMap
+from .face_tracker import IouTracker
+from .av_io import defers_tags
+from .video_model import Video
+
+class StreamPipeline:
+    """
+    Single-pass decode -> detect -> embed -> (optional) verify -> encode.
+
+    Every stage is a generator, so only the frame currently being processed
+    is held in memory and nothing is written to the frames folder.
+
+    With `min_face_duration` set, faces get stable track ids (IouTracker)
+    and those on screen for less than that many seconds are not
+    watermarked; this holds back about that many seconds of frames.
+    """
+    def __init__(self, video: Video, detector, watermark, verify: bool = True, min_face_duration: float = None):
+        self.video = video
+        self.detector = detector
+        self.watermark = watermark
+        self.verify = verify
+        self.min_face_duration = min_face_duration
+        self.faces_dropped = 0
+        self.frames_skipped = 0
+
+        self.face_map = FaceMap()
+        self.frames_processed = 0
+        self.frames_verified = 0
+        self.frames_failed = 0
+
+    def _verify_stage(self, items) -> Iterator[tuple[int, np.ndarray, list[Face]]]:
+        for index, frame, faces in items:
+            if self.verify and faces:
+                if self.watermark.verify_frame(frame, faces) is not None:
+                    self.frames_verified += 1
+                else:
+                    self.frames_failed += 1
+            yield index, frame, faces
+
+    def frames(self) -> Iterator[np.ndarray]:
+        """Yields fully processed frames, ready for the encoder."""
+        self.face_map = FaceMap()
+        self.frames_processed = self.frames_verified = self.frames_failed = 0
+
+        detected = self.detector.detect_stream(self.video.iter_frames())
+        tracker = None
+        if self.min_face_duration is not None:
+            if self.video.fps is None:
+                self.video.get_video_info()
+            tracker = IouTracker(self.video.fps, self.min_face_duration)
+            detected = tracker.track_stream(detected)
+        embedded = self.watermark.embed_stream(detected)
+        for index, frame, faces in self._verify_stage(embedded):
+            if faces:
+                self.face_map[index] = faces
+            self.frames_processed += 1
+            yield frame
+        self.faces_dropped = tracker.faces_dropped if tracker else 0
+        self.frames_skipped = self.detector.frames_skipped
+
+    def run(self, output_path: str = "video_output.mp4", progress_fn=None) -> FaceMap:
+        """
+        Processes the whole video in one pass and returns the face_map, which
+        is also written into the output's metadata when the encoder closes.
+        Containers whose tags have to be final before the first frame (e.g.
+        MKV with the "av" engine) get it as a `.fmap` sidecar instead.
+        """
+        if self.video.engine == "av" and not defers_tags(output_path):
+            self.video.write_frames(self.frames(), output_path, progress_fn=progress_fn)
+            self.video.save_face_map_sidecar(self.face_map, output_path)
+            return self.face_map
+
+        metadata = {"face_map": None}   # reserved now, filled once all frames are through
+
+        def frames():
+            yield from self.frames()
+            metadata.update(self.video.face_map_metadata(self.face_map))
+
+        self.video.write_frames(frames(), output_path, progress_fn=progress_fn, metadata=metadata)
+        return self.face_map
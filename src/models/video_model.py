@@ -3,7 +3,18 @@ import shutil
 import cv2
 import subprocess
 import json
-from models import Face
+import base64
+import hashlib
+import bisect
+from typing import Iterable, Iterator, Mapping
+import numpy as np
+from .face import Face
+from .frame_store import FrameStore, PngFrameStore
+from .av_io import av, AvReader, AvWriter
+from .video_probe import VideoProbe, probe_video
+from .face_map import FaceMap
+from .face_map_codec import MAGIC, SIDECAR_SUFFIX, FaceMapReader, encode_face_map
+from .face_overlay import overlay_frames
 
 class Video:
     def __init__(self):
@@ -14,6 +25,13 @@ class Video:
         self.duration = None
         self.width = None
         self.height = None
+        # "av": PyAV with threaded codecs, libx264 output and audio stream-copy
+        # "cv2": OpenCV VideoCapture/VideoWriter (no audio)
+        self.engine = "av" if av is not None else "cv2"
+        self.encoder = "libx264"
+        self.preset = "veryfast"
+        self.crf = 18
+        self.copy_audio = True
 
     def get_frame_count(self):
         return self.frame_count
@@ -24,22 +42,30 @@ class Video:
     def get_video_path(self):
         return self.video_path
 
-    def get_video_info(self):
-        cap = cv2.VideoCapture(self.video_path)
+    def video_id(self) -> bytes:
+        """8-byte id of the source (file name and size), carried in watermark payloads."""
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(os.path.basename(self.video_path).encode("utf-8"))
+        digest.update(str(os.path.getsize(self.video_path)).encode("ascii"))
+        return digest.digest()
 
-        if not cap.isOpened():
-            raise ValueError("Cannot open video.")
+    def probe(self) -> VideoProbe:
+        """Cached single probe of the current file (dimensions, fps, exact frame count, streams, keyframes, tags)."""
+        if not self.video_path:
+            raise ValueError("No video file selected.")
+        return probe_video(self.video_path)
+
+    def get_video_info(self):
+        info = self.probe()
 
         self.file_name = os.path.basename(self.video_path)
-        self.fps = cap.get(cv2.CAP_PROP_FPS)
-        self.frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        self.duration = self.frame_count / self.fps if self.fps else 0
-        self.width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        self.height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = info.fps
+        self.frame_count = info.frame_count
+        self.duration = info.duration
+        self.width = info.width
+        self.height = info.height
         format_ext = os.path.splitext(self.video_path)[-1].replace('.', '')
 
-        cap.release()
-
         return {
             "File Name": self.file_name,
             "Format": format_ext,
@@ -49,133 +75,309 @@ class Video:
             "Frame Count": self.frame_count
         }
         
-    def video_to_frames(self, output_folder="frames", progress_fn=None):
+    def iter_frames(self) -> Iterator[tuple[int, np.ndarray]]:
+        """
+        Decodes the video one frame at a time and yields (index, frame),
+        keeping a single decoded frame in memory.
+        """
+        if not self.video_path:
+            raise ValueError("No video file selected.")
+
+        if self.engine == "av":
+            with AvReader(self.video_path) as reader:
+                yield from reader
+            return
+
+        cap = cv2.VideoCapture(self.video_path)
+
+        if not cap.isOpened():
+            raise ValueError("Cannot open video.")
+
+        try:
+            index = 0
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield index, frame
+                index += 1
+        finally:
+            cap.release()
 
+    def iter_frames_at(self, indices: Iterable[int]) -> Iterator[tuple[int, np.ndarray]]:
+        """
+        Yields (index, frame) for the given frame indices only, seeking
+        instead of decoding the whole video.
+        """
         if not self.video_path:
             raise ValueError("No video file selected.")
+        indices = sorted(set(indices))
+
+        if self.engine == "av":
+            probe = self.probe()
+            with AvReader(self.video_path) as reader:
+                yield from reader.iter_at(indices, probe.frame_pts, probe.keyframes)
+            return
 
-        if os.path.exists(output_folder):
-            shutil.rmtree(output_folder)      # delete folder + contents
-        os.makedirs(output_folder, exist_ok=True)
-         
         cap = cv2.VideoCapture(self.video_path)
 
         if not cap.isOpened():
             raise ValueError("Cannot open video.")
 
-        # total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        try:
+            position = 0
+            for index in indices:
+                if index != position:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                position = index + 1
+                yield index, frame
+        finally:
+            cap.release()
+
+    def iter_keyframes(self) -> Iterator[tuple[int, np.ndarray]]:
+        """Yields (index, frame) for keyframes only; non-key frames are never decoded (PyAV only)."""
+        if not self.video_path:
+            raise ValueError("No video file selected.")
+        if self.engine != "av":
+            raise RuntimeError("Keyframe-only decoding needs the PyAV engine")
+
+        frame_pts = self.probe().frame_pts
+        with AvReader(self.video_path) as reader:
+            for pts, frame in reader.iter_keyframes():
+                yield bisect.bisect_left(frame_pts, pts), frame
+
+    def verify_watermark(self, watermark, face_map: Mapping[int, list[Face]], keyframes_only=False,
+                         progress_fn=None) -> bool:
+        """
+        Verifies `watermark` straight from the container, without extracting frames.
+
+        :param face_map: Face boxes per frame index (e.g. from load_face_map()).
+        :param keyframes_only: Decode keyframes only and check those that have faces;
+                               otherwise seek to exactly the frames in the face map.
+        :return: True as soon as one face ROI verifies.
+        """
+        if keyframes_only:
+            frames = self.iter_keyframes()
+        else:
+            frames = self.iter_frames_at(index for index, faces in face_map.items() if faces)
+        return watermark.verify_frames(frames, face_map, progress_fn)
+
+    def write_frames(self, frames: Iterable[np.ndarray], output_path="video_output.mp4", codec=None, progress_fn=None,
+                     metadata: dict[str, str] = None):
+        """
+        Encodes frames from any iterable (e.g. a processing generator) into a video file.
+        With the "av" engine the source audio is stream-copied into the output.
+
+        :param frames: Iterable of BGR frames, consumed lazily.
+        :param output_path: Path for saving the output video.
+        :param codec: "av" engine: encoder name (default self.encoder).
+                      "cv2" engine: FourCC codec (e.g., 'XVID' for .avi, default 'mp4v').
+        :param metadata: Container tags. Keys set to None are reserved and filled from
+                         the dict once all frames are written (see AvWriter). The "cv2"
+                         engine cannot write tags and falls back to an ffmpeg -codec copy pass.
+        :return: Number of frames written.
+        """
+        if self.fps is None:
+            self.get_video_info()
+
+        if self.engine == "av":
+            return self._write_frames_av(frames, output_path, codec or self.encoder, progress_fn, metadata)
+
+        fourcc = cv2.VideoWriter_fourcc(*(codec or "mp4v"))
+        out = cv2.VideoWriter(output_path, fourcc, self.fps, (self.width, self.height))
+        if not out.isOpened():
+            raise ValueError("Cannot create video writer. Check codec and output path.")
+
+        written = 0
+        try:
+            for frame in frames:
+                out.write(frame)
+                written += 1
+
+                if progress_fn:
+                    progress_fn()
+        finally:
+            out.release()
+
+        if metadata:
+            self._rewrite_metadata(output_path, metadata)
+        return written
+
+    def _write_frames_av(self, frames: Iterable[np.ndarray], output_path: str, codec: str, progress_fn=None,
+                         metadata: dict[str, str] = None) -> int:
+        audio_source = self.video_path if self.copy_audio else None
+        written = 0
+        with AvWriter(output_path, self.width, self.height, self.fps,
+                      codec=codec, preset=self.preset, crf=self.crf,
+                      audio_source=audio_source, metadata=metadata) as out:
+            for frame in frames:
+                out.write(frame)
+                written += 1
+
+                if progress_fn:
+                    progress_fn()
+
+        return written
+
+    def video_to_frames(self, output_folder="frames", progress_fn=None, store: FrameStore = None, png_compression=1):
+        """
+        Decodes every frame into `store` (default: one PNG per frame in `output_folder`,
+        encoded on a thread pool at `png_compression` 0-9).
+        Only needed for debugging/export; the streaming pipeline never touches disk.
+        """
+        if not self.video_path:
+            raise ValueError("No video file selected.")
+
+        own_store = store is None
+        if own_store:
+            if os.path.exists(output_folder):
+                shutil.rmtree(output_folder)      # delete folder + contents
+            store = PngFrameStore(output_folder, png_compression)
+
         frame_count = 0
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            frame_file_name = os.path.join(output_folder, f"frame_{frame_count:04d}.png")
-            cv2.imwrite(frame_file_name, frame)
-            frame_count += 1
-            
-            if progress_fn:
-                progress_fn(frame_count)
-
-        cap.release()
-        
+        try:
+            for index, frame in self.iter_frames():
+                store.write(index, frame)
+                frame_count += 1
+
+                if progress_fn:
+                    progress_fn()
+        finally:
+            store.close() if own_store else store.flush()
+
         return frame_count
     
-    def frames_to_video(self, frames_folder="frames", output_path="video_output.mp4", codec="mp4v", progress_fn=None):
+    def write_preview(self, face_map: Mapping[int, list[Face]], output_path="video_preview.mp4",
+                      frames: Iterable[tuple[int, np.ndarray]] = None, progress_fn=None, **style) -> str:
+        """
+        Renders a separate preview/debug video with the face boxes drawn over
+        the frames (decoded from this video unless `frames` is given). The
+        production output is never touched; `style` goes to draw_faces().
+        """
+        frames = self.iter_frames() if frames is None else frames
+        self.write_frames(overlay_frames(frames, face_map, **style), output_path, progress_fn=progress_fn)
+        return output_path
+
+    def frames_to_video(self, frames_folder="frames", output_path="video_output.mp4", codec=None, progress_fn=None,
+                        store: FrameStore = None, face_map: Mapping[int, list[Face]] = None):
         """
-        Stitch frames from a folder back into a video file.
+        Stitch frames from a folder (or any frame store) back into a video file.
 
         :param frames_folder: Directory containing image frames.
         :param output_path: Path for saving the output video.
-        :param codec: FourCC codec (e.g., 'XVID' for .avi, 'mp4v' for .mp4).
-        :param fps: Frames per second. Defaults to original video's FPS if available.
+        :param codec: Encoder name ("av" engine) or FourCC ("cv2" engine); see write_frames().
+        :param store: Frame store to read from instead of `frames_folder`.
+        :param face_map: Face map to mux into the output's metadata.
         :return: The output video path.
         """
-        fps = self.fps
-        size = (self.width, self.height)
-        
-        # output_path = self.file_name.replace('.mp4', '_output.mp4')
-
-        # Collect and sort frame files
-        frames = sorted([
-            f for f in os.listdir(frames_folder)
-            if f.lower().endswith(('.png'))
-        ])
-        if not frames:
-            raise ValueError(f"No frames found in folder: {frames_folder}")
-
-        # Initialize VideoWriter
-        fourcc = cv2.VideoWriter_fourcc(*codec)
-        out = cv2.VideoWriter(output_path, fourcc, fps, size)
-        if not out.isOpened():
-            raise ValueError("Cannot create video writer. Check codec and output path.")
+        own_store = store is None
+        if own_store:
+            store = PngFrameStore(frames_folder)
+        try:
+            if not len(store):
+                raise ValueError(f"No frames found in: {frames_folder}")
+            store.flush()
 
-        # Write frames to video
-        for idx, fname in enumerate(frames, start=1):
-            frame_path = os.path.join(frames_folder, fname)
-            img = cv2.imread(frame_path)
-            if img is None:
-                raise ValueError(f"Cannot read frame: {frame_path}")
-            out.write(img)
-            
-            if progress_fn:
-                progress_fn(idx)
-
-        out.release()
+            metadata = self.face_map_metadata(face_map) if face_map else None
+            self.write_frames((frame for _, frame in store), output_path, codec, progress_fn, metadata)
+        finally:
+            if own_store:
+                store.close()
         return output_path
     
-    def load_face_map(self) -> dict[str, list[Face]] | None:
-        """
-        Reads the embedded `face_map` tag from this video's metadata
-        and reconstructs Face objects. Returns the face_map or None.
-        """
-        ffprobe = shutil.which("ffprobe") or shutil.which("ffprobe.exe")
-        if not ffprobe:
-            raise RuntimeError("ffprobe not found on PATH")
-        proc = subprocess.run([
-            ffprobe,
-            "-v", "error",
-            "-print_format", "json",
-            "-show_format",
-            self.video_path
-        ], capture_output=True, text=True, check=True)
-        info = json.loads(proc.stdout)
-        raw = info.get("format", {}).get("tags", {}).get("face_map")
-        if not raw:
-            return None
+    def load_face_map(self, video_path: str = None) -> FaceMap | None:
+        """
+        Reads the face map of this video (or of `video_path`): the `face_map`
+        metadata tag if present, else the `.fmap` sidecar next to the file
+        (see save_face_map_sidecar()). Legacy JSON tags and FMAP sidecars
+        are still read.
+        Returns the face_map or None.
+        """
+        face_map = self.read_face_map(video_path)
+        return face_map.copy() if isinstance(face_map, FaceMapReader) else face_map
+
+    def read_face_map(self, video_path: str = None) -> FaceMap | FaceMapReader | None:
+        """
+        Read-only variant of load_face_map(): an FMAP-encoded map comes back
+        as a FaceMapReader, which decompresses its chunks only when the
+        frames in them are asked for (get()/range()/items()), so a verify
+        pass that stops at the first valid face decodes one chunk.
+        """
+        video_path = video_path or self.video_path
+        raw = probe_video(video_path).face_map_raw
+        if raw:
+            if raw.lstrip().startswith("{"):
+                return self._load_json_face_map(raw)
+            return FaceMapReader(base64.b64decode(raw))
+
+        sidecar = video_path + SIDECAR_SUFFIX
+        if os.path.isfile(sidecar):
+            with open(sidecar, "rb") as f:
+                if f.read(len(MAGIC)) == MAGIC:
+                    f.seek(0)
+                    return FaceMapReader(f.read())
+            return FaceMap.load(sidecar)
+        return None
+
+    def _load_json_face_map(self, raw: str) -> FaceMap:
         data = json.loads(raw)
-        face_map = {
-            frame: [
-                Face.from_bbox(idx, None, tuple(box), confidence=1.0)
+        return FaceMap(
+            (self._frame_key(frame), [
+                Face.from_bbox(idx, tuple(box), confidence=1.0)
                 for idx, box in enumerate(boxes)
-            ]
+            ])
             for frame, boxes in data.items()
-        }
-        return face_map
+        )
+
+    @staticmethod
+    def _frame_key(key: str) -> int:
+        """face_map keys are frame indices; older files used 'frame_0001.png' names."""
+        if key.isdigit():
+            return int(key)
+        match = PngFrameStore.PATTERN.search(key)
+        if not match:
+            raise ValueError(f"Invalid face_map frame key: {key}")
+        return int(match.group(1))
+
+    @staticmethod
+    def face_map_metadata(face_map: Mapping[int, list[Face]]) -> dict[str, str]:
+        """Container tags carrying the face_map (the compact face_map_codec encoding, base64)."""
+        data = encode_face_map(face_map)
+        return {"face_map": base64.b64encode(data).decode("ascii")}
 
-    def embed_face_map(self, face_map: dict[str, list[Face]]) -> None:
+    @staticmethod
+    def save_face_map_sidecar(face_map: Mapping[int, list[Face]], video_path: str) -> str:
         """
-        Embeds the given face_map into this video’s metadata in place
-        (replacing the file), using ffmpeg -codec copy.
+        Writes the face_map as a columnar `.fmap` file next to `video_path`,
+        for outputs that cannot carry it as a tag. Returns the sidecar path.
         """
-        # Serialize to JSON
-        serializable = {
-            frame: [[*map(int, f.bbox)] for f in faces]
-            for frame, faces in face_map.items()
-        }
-        fm_json = json.dumps(serializable, separators=(",", ":"))
+        sidecar = video_path + SIDECAR_SUFFIX
+        FaceMap.coerce(face_map).save(sidecar)
+        return sidecar
+
+    def embed_face_map(self, face_map: Mapping[int, list[Face]], video_path: str = None) -> None:
+        """
+        Embeds the given face_map into an already written video (this one or
+        `video_path`) in place. Writers should rather pass face_map_metadata()
+        as `metadata` so the tag goes in with the final mux.
+        """
+        video_path = video_path or self.video_path
+        self._rewrite_metadata(video_path, self.face_map_metadata(face_map))
 
+    @staticmethod
+    def _rewrite_metadata(video_path: str, metadata: dict[str, str]) -> None:
+        """Adds container tags to `video_path` in place, using ffmpeg -codec copy."""
         ffmpeg = shutil.which("ffmpeg") or shutil.which("ffmpeg.exe")
         if not ffmpeg:
             raise RuntimeError("ffmpeg not found on PATH")
 
-        tmp = self.video_path.replace(".mp4", "_meta.mp4")
-        subprocess.run([
-            ffmpeg, "-y",
-            "-i", self.video_path,
-            "-map_metadata", "0",
-            "-metadata", f"face_map={fm_json}",
-            "-c", "copy",
-            tmp
-        ], check=True)
-        os.replace(tmp, self.video_path)
\ No newline at end of file
+        root, ext = os.path.splitext(video_path)
+        tmp = f"{root}_meta{ext}"
+        args = [ffmpeg, "-y", "-i", video_path, "-map_metadata", "0"]
+        for key, value in metadata.items():
+            args += ["-metadata", f"{key}={value}"]
+        subprocess.run(args + ["-c", "copy", tmp], check=True)
+        os.replace(tmp, video_path)
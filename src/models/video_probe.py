@@ -0,0 +1,156 @@
+import os
+import json
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from fractions import Fraction
+from .av_io import av
+
+@dataclass
+class VideoProbe:
+    """Everything we need to know about a video file, collected in one probe."""
+    path: str
+    format_name: str
+    width: int
+    height: int
+    fps: float
+    frame_count: int
+    duration: float
+    streams: list[dict] = field(default_factory=list)   # [{"index", "type", "codec"}, …]
+    tags: dict[str, str] = field(default_factory=dict)  # container-level metadata
+    frame_pts: list[int] = field(default_factory=list)  # video pts in presentation order
+    keyframes: list[int] = field(default_factory=list)  # frame indices of keyframes
+    closed_gops: bool = True
+
+    @property
+    def face_map_raw(self) -> str | None:
+        return self.tags.get("face_map")
+
+
+def _probe_av(path: str) -> VideoProbe:
+    with av.open(path) as container:
+        if not container.streams.video:
+            raise ValueError("Cannot open video: no video stream.")
+        video = container.streams.video[0]
+        rate = video.average_rate or video.guessed_rate or Fraction(0)
+        streams = [{"index": s.index, "type": s.type, "codec": s.codec_context.name}
+                   for s in container.streams]
+        tags = dict(container.metadata)
+        width, height = video.codec_context.width, video.codec_context.height
+
+        # demux only (no decode): exact frame count, pts order and keyframes
+        frame_pts, keyframe_pts = [], set()
+        last_key = None
+        closed_gops = True
+        for packet in container.demux(video):
+            if packet.pts is None:
+                continue
+            frame_pts.append(packet.pts)
+            if packet.is_keyframe:
+                keyframe_pts.add(packet.pts)
+                last_key = packet.pts
+            elif last_key is not None and packet.pts < last_key:
+                # leading pictures shown before their keyframe: open GOP
+                closed_gops = False
+        format_name = container.format.name
+
+    return _build(path, format_name, width, height, float(rate), streams, tags,
+                  frame_pts, keyframe_pts, closed_gops)
+
+
+def _probe_ffprobe(path: str) -> VideoProbe:
+    ffprobe = shutil.which("ffprobe") or shutil.which("ffprobe.exe")
+    if not ffprobe:
+        raise RuntimeError("Neither PyAV nor ffprobe is available to probe the video")
+    proc = subprocess.run([
+        ffprobe,
+        "-v", "error",
+        "-print_format", "json",
+        "-show_format",
+        "-show_streams",
+        "-show_entries", "packet=stream_index,pts,flags",
+        path
+    ], capture_output=True, text=True, check=True)
+    info = json.loads(proc.stdout)
+
+    streams = info.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    if video is None:
+        raise ValueError("Cannot open video: no video stream.")
+    avg_rate = video.get("avg_frame_rate", "0/0")
+    rate = Fraction(avg_rate) if avg_rate not in ("", "0/0") else Fraction(0)
+
+    frame_pts, keyframe_pts = [], set()
+    last_key = None
+    closed_gops = True
+    for packet in info.get("packets", []):
+        if packet.get("stream_index") != video["index"] or "pts" not in packet:
+            continue
+        pts = int(packet["pts"])
+        frame_pts.append(pts)
+        if "K" in packet.get("flags", ""):
+            keyframe_pts.add(pts)
+            last_key = pts
+        elif last_key is not None and pts < last_key:
+            closed_gops = False
+
+    return _build(
+        path,
+        info.get("format", {}).get("format_name", ""),
+        int(video.get("width", 0)),
+        int(video.get("height", 0)),
+        float(rate),
+        [{"index": s["index"], "type": s.get("codec_type"), "codec": s.get("codec_name")} for s in streams],
+        info.get("format", {}).get("tags", {}),
+        frame_pts, keyframe_pts, closed_gops
+    )
+
+
+def _build(path, format_name, width, height, fps, streams, tags, frame_pts, keyframe_pts, closed_gops) -> VideoProbe:
+    frame_pts.sort()
+    keyframes = [i for i, pts in enumerate(frame_pts) if pts in keyframe_pts]
+    frame_count = len(frame_pts)
+    return VideoProbe(
+        path=path,
+        format_name=format_name,
+        width=width,
+        height=height,
+        fps=fps,
+        frame_count=frame_count,
+        duration=frame_count / fps if fps else 0,
+        streams=streams,
+        tags=tags,
+        frame_pts=frame_pts,
+        keyframes=keyframes,
+        closed_gops=closed_gops,
+    )
+
+
+_CACHE_SIZE = 16
+_cache: "OrderedDict[tuple, VideoProbe]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def probe_video(path: str) -> VideoProbe:
+    """
+    Probes `path` once (PyAV, else a single ffprobe call) and caches the result
+    keyed by (path, size, mtime), so repeated calls on an unchanged file cost a stat().
+    """
+    if not path or not os.path.isfile(path):
+        raise ValueError("Cannot open video.")
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    result = _probe_av(path) if av is not None else _probe_ffprobe(path)
+
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
@@ -1,159 +1,129 @@
 # src/models/watermark_avg_hash_qim.py
 
-import os
 import numpy as np
-import cv2
-from .face import Face
+from .watermark_base import WatermarkBase
 
-class WatermarkAvgHashQim:
+
+def _dct_matrix(n: int = 8) -> np.ndarray:
+    """Orthonormal DCT-II matrix: dct(B) = C @ B @ C.T, idct(D) = C.T @ D @ C (same as cv2.dct)."""
+    k, x = np.meshgrid(np.arange(n), np.arange(n), indexing="ij")
+    c = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * x + 1) * k / (2 * n))
+    c[0] /= np.sqrt(2.0)
+    return c.astype(np.float32)
+
+
+_DCT = _dct_matrix()
+
+
+def _block_view(luma: np.ndarray) -> np.ndarray:
+    """(h, w) -> (h//8, 8, w//8, 8) view of the whole 8×8 blocks (edges that do not fill one are left out)."""
+    h, w = luma.shape
+    H, W = h - (h % 8), w - (w % 8)
+    return luma[:H, :W].reshape(H // 8, 8, W // 8, 8)
+
+
+class WatermarkAvgHashQim(WatermarkBase):
+    """
+    QIM on one mid-frequency DCT coefficient of every 8×8 luma block.
+
+    Only coefficient COEFF is ever read or changed, so the forward DCT of
+    all blocks is one contraction of the block view with that coefficient's
+    basis image, and the inverse adds the quantisation change times the same
+    basis image back onto every block in place. The HEADER (plus payload) is
+    repeated over all blocks of the face, row-major, and read back by
+    majority vote, so a few damaged blocks do not break it. A face with
+    fewer blocks than HEADER has bits cannot be marked (ValueError); one too
+    small for HEADER + payload is marked with the HEADER alone and counted
+    in `payloads_skipped`, rather than carrying a cut-off payload.
+
+    The change is written back onto the luma of the BGR ROI in place (see
+    _shift_luma()), so the face keeps its colour.
+    """
     HEADER = "WMARK"
     STEP = 10.0   # quantization step for QIM
+    COEFF = (4, 1)
+    SUPPORTS_PAYLOAD = True
+
+    @property
+    def basis(self) -> np.ndarray:
+        """8×8 DCT basis image of COEFF: coefficient = <block, basis>."""
+        u, v = self.COEFF
+        return np.outer(_DCT[u], _DCT[v])
+
+    def _coefficients(self, roi: np.ndarray) -> np.ndarray:
+        """COEFF of every whole 8×8 luma block (rows × cols of blocks)."""
+        return np.einsum("aibj,ij->ab", _block_view(self._luma(roi)), self.basis, optimize=True)
+
+    def _embed_into(self, roi: np.ndarray, payload: bytes) -> None:
+        header_bits = self.header_bits
+        coeff = self._coefficients(roi)
+        if coeff.size < len(header_bits):
+            raise ValueError("ROI too small for QIM header")
+        payload_bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8))
+        if coeff.size < len(header_bits) + len(payload_bits):
+            payload_bits = payload_bits[:0]
+            self.payloads_skipped += 1
+        message = np.concatenate([header_bits, payload_bits])
+        bits = np.resize(message, coeff.shape).astype(np.float32)
+
+        q = np.round(coeff / self.STEP)
+        q += bits - q % 2           # move to the nearest level of the right parity
+        delta = q * self.STEP - coeff
+        rows, cols = coeff.shape
+        change = delta[:, None, :, None] * self.basis[None, :, None, :]
+        self._shift_luma(roi, change.reshape(rows * 8, cols * 8), block=8)
+
+    def embed(self, roi: np.ndarray, payload: bytes = b"") -> np.ndarray:
+        """
+        Embed HEADER + payload bits into a copy of the ROI by quantising one
+        DCT coefficient per 8×8 luma block, repeating the message over all blocks.
+        """
+        marked = roi.copy()
+        self._embed_into(marked, payload)
+        return marked
 
-    @staticmethod
-    def _string_to_bits(s: str) -> list[int]:
-        bits = []
-        for byte in s.encode('utf-8'):
-            for i in range(8):
-                bits.append((byte >> (7 - i)) & 1)
-        return bits
+    def _block_bits(self, roi: np.ndarray) -> np.ndarray:
+        """QIM bit of every block, row-major."""
+        coeff = self._coefficients(roi)
+        return (np.round(coeff.ravel() / self.STEP) % 2).astype(np.uint8)
 
     @staticmethod
-    def _bits_to_string(bits: list[int]) -> str:
-        chars = []
-        for i in range(0, len(bits), 8):
-            byte = 0
-            for j in range(8):
-                byte = (byte << 1) | bits[i + j]
-            chars.append(byte)
-        return bytes(chars).decode('utf-8', errors='ignore')
-
-    def embed(self, roi: np.ndarray) -> np.ndarray:
-        """
-        Embed HEADER bits into the ROI by modifying one DCT coefficient per 8×8 block.
-        Only the HEADER string is embedded (no extra payload).
-        """
-        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY).astype(np.float32)
-        bits = self._string_to_bits(self.HEADER)
-        h, w = gray.shape
-        H, W = h - (h % 8), w - (w % 8)
-        idx = 0
-
-        for y in range(0, H, 8):
-            for x in range(0, W, 8):
-                if idx >= len(bits):
-                    break
-                block = gray[y:y+8, x:x+8]
-                dct = cv2.dct(block)
-                b = bits[idx]
-                coeff = dct[4, 1]
-                q = np.round(coeff / self.STEP)
-                if (q % 2) != b:
-                    q += (b - (q % 2))
-                dct[4, 1] = q * self.STEP
-                gray[y:y+8, x:x+8] = cv2.idct(dct)
-                idx += 1
-            if idx >= len(bits):
-                break
-
-        watermarked = cv2.cvtColor(
-            np.clip(gray, 0, 255).astype(np.uint8),
-            cv2.COLOR_GRAY2BGR
-        )
-        return watermarked
+    def _vote(bits: np.ndarray, period: int) -> np.ndarray:
+        """Majority of every `period`-th block bit: the message repeated over the blocks."""
+        reps = -(-len(bits) // period)
+        padded = np.full(reps * period, -1, dtype=np.int8)
+        padded[:len(bits)] = bits
+        padded = padded.reshape(reps, period)
+        ones = (padded == 1).sum(axis=0)
+        votes = (padded >= 0).sum(axis=0)
+        return (2 * ones > votes).astype(np.uint8)
 
     def extract(self, roi: np.ndarray) -> str:
         """
-        Read back the HEADER bits from the ROI by examining the same DCT coefficient.
+        Read back the HEADER from the same DCT coefficient: majority vote
+        for the message with and without a payload, then the first copy
+        alone (marks made before the message was repeated).
         Returns the extracted string (ideally 'WMARK').
         """
-        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY).astype(np.float32)
-        bits = []
-        h, w = gray.shape
-        H, W = h - (h % 8), w - (w % 8)
-        needed = len(self._string_to_bits(self.HEADER))
-        idx = 0
-
-        for y in range(0, H, 8):
-            for x in range(0, W, 8):
-                if idx >= needed:
-                    break
-                dct = cv2.dct(gray[y:y+8, x:x+8])
-                q = np.round(dct[4, 1] / self.STEP)
-                bits.append(int(q % 2))
-                idx += 1
-            if idx >= needed:
-                break
-
-        return self._bits_to_string(bits)
-
-    def verify(self, roi: np.ndarray) -> bool:
-        """True if the extracted HEADER matches exactly."""
-        return self.extract(roi) == self.HEADER
-
-    def embed_in_folder(self,
-                        folder: str,
-                        face_map: dict[str, list[Face]],
-                        progress_fn=None
-                       ) -> dict[str, list[Face]]:
-        """
-        Uses the provided face_map (cached from controller) to embed HEADER into each face ROI.
-        Overwrites frames in-place.
-        """
-        files = list(face_map.keys())
-        for idx, fname in enumerate(files, start=1):
-            path = os.path.join(folder, fname)
-            frame = cv2.imread(path)
-            if frame is None:
-                if progress_fn:
-                    progress_fn(idx)
-                continue
-
-            for face in face_map[fname]:
-                x, y, w, h = face.bbox
-                roi = frame[y:y+h, x:x+w]
-                if roi is None or roi.size == 0:
-                    continue
-                try:
-                    wm_frame = self.embed(roi)
-                    frame[y:y+h, x:x+w] = wm_frame
-                except Exception:
-                    pass
-            cv2.imwrite(path, frame)
-            
-            if progress_fn:
-                progress_fn(idx)
-
-    def verify_in_folder(self,
-                         folder: str,
-                         face_map: dict[str, list[Face]],
-                         progress_fn=None
-                        ) -> bool:
-        """
-        Uses the provided face_map to check for any valid HEADER in each face ROI.
-        Returns True as soon as one ROI verifies; else False.
-        """
-        files = list(face_map.keys())
-        for idx, fname in enumerate(files, start=1):
-            path = os.path.join(folder, fname)
-            frame = cv2.imread(path)
-            if frame is None:
-                if progress_fn:
-                    progress_fn(idx)
-                continue
-
-            for face in face_map[fname]:
-                x, y, w, h = face.bbox
-                roi = frame[y:y+h, x:x+w]
-                if roi is None or roi.size == 0:
-                    continue
-                try:
-                    if self.verify(roi):
-                        print(f"Valid header found in {fname} at face index {face.index}.")
-                        return True
-                except Exception:
-                    continue
-
-            if progress_fn:
-                progress_fn(idx)
-        print("No valid header found in any face.")
-        return False
\ No newline at end of file
+        bits = self._block_bits(roi)
+        n = len(self.header_bits)
+        if len(bits) < n:
+            return self._bits_to_string(bits[:len(bits) - len(bits) % 8])
+
+        candidates = [self._vote(bits, period)[:n] for period in (n, n + 8 * self.PAYLOAD.size)
+                      if len(bits) >= period]
+        candidates.append(bits[:n])
+        for candidate in candidates:
+            text = self._bits_to_string(candidate)
+            if text == self.HEADER:
+                return text
+        return self._bits_to_string(candidates[0])
+
+    def extract_payload(self, roi: np.ndarray, length: int = None) -> bytes:
+        """The `length` payload bytes (default: one PAYLOAD), majority-voted over the repeats."""
+        length = self.PAYLOAD.size if length is None else length
+        n = len(self.header_bits)
+        bits = self._block_bits(roi)
+        if len(bits) < n + 8 * length:
+            raise ValueError("ROI too small for QIM payload")
+        return np.packbits(self._vote(bits, n + 8 * length)[n:]).tobytes()
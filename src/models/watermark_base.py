@@ -0,0 +1,243 @@
+import struct
+import functools
+import numpy as np
+import cv2
+from typing import Iterable, Iterator
+from .face import Face
+from .face_map import FaceMap
+from .frame_store import FrameStore, PngFrameStore
+
+
+@functools.lru_cache(maxsize=32)
+def _text_bits(text: str) -> np.ndarray:
+    bits = np.unpackbits(np.frombuffer(text.encode("utf-8"), dtype=np.uint8))
+    bits.flags.writeable = False
+    return bits
+
+
+class WatermarkBase:
+    """
+    Per-frame and per-folder plumbing shared by every watermark method.
+    Subclasses implement embed(roi, payload) and extract(roi); those that
+    can mark a ROI view directly override _embed_into(), those with a
+    vectorised path over several ROIs override embed_batch() and
+    verify_batch().
+
+    Methods with SUPPORTS_PAYLOAD also carry payload(index) after the
+    HEADER once `video_id` is set: the 8-byte video id and the frame index
+    (big-endian u32), so a face crop can be traced to its video and frame.
+    Faces marked without their payload (too small for it) are counted in
+    `payloads_skipped`.
+    """
+    HEADER = "WMARK"
+    SUPPORTS_PAYLOAD = False
+    PAYLOAD = struct.Struct(">8sI")     # video id, frame index
+    video_id: bytes = None
+    payloads_skipped = 0
+
+    @classmethod
+    def create(cls, video_id: bytes = None) -> "WatermarkBase":
+        """Picklable factory (for worker processes) that keeps the video id."""
+        watermark = cls()
+        watermark.video_id = video_id
+        return watermark
+
+    @staticmethod
+    def _string_to_bits(s: str) -> np.ndarray:
+        return _text_bits(s)
+
+    @staticmethod
+    def _bits_to_string(bits) -> str:
+        return np.packbits(np.asarray(bits, dtype=np.uint8)).tobytes().decode('utf-8', errors='ignore')
+
+    @property
+    def header_bits(self) -> np.ndarray:
+        """HEADER as a (read-only, cached) bit vector, MSB first."""
+        return _text_bits(self.HEADER)
+
+    def payload(self, index: int = None) -> bytes:
+        """Payload for frame `index`; empty unless the method supports one and video_id is set."""
+        if not self.SUPPORTS_PAYLOAD or self.video_id is None or index is None:
+            return b""
+        return self.PAYLOAD.pack(self.video_id, index & 0xFFFFFFFF)
+
+    def parse_payload(self, data: bytes) -> tuple[bytes, int]:
+        """(video id, frame index) from an extracted payload."""
+        return self.PAYLOAD.unpack(data)
+
+    def embed(self, roi: np.ndarray, payload: bytes = b"") -> np.ndarray:
+        raise NotImplementedError
+
+    def extract(self, roi: np.ndarray) -> str:
+        raise NotImplementedError
+
+    @staticmethod
+    def _luma(roi: np.ndarray) -> np.ndarray:
+        """Y plane (BT.601, the Y of cv2's YCrCb) of a BGR ROI, as float32."""
+        return cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY).astype(np.float32)
+
+    @staticmethod
+    def _shift_luma(roi: np.ndarray, delta: np.ndarray, block: int = None) -> None:
+        """
+        Adds `delta` (rounded) to the luma of the top-left delta.shape
+        samples of a BGR ROI, in place. The same step on B, G and R moves Y
+        by exactly that step and leaves Cr/Cb alone, so the colour is kept.
+
+        Clipping at 0/255 would cut the change off on saturated pixels, so
+        with `block` (the embedder's transform block, dividing delta.shape)
+        each block×block tile that would leave the range is moved back into
+        it by a constant: that only changes the tile's DC/LL term, which no
+        embedder reads.
+        """
+        h, w = delta.shape
+        region = roi[:h, :w]
+        shifted = region.astype(np.int16)
+        shifted += np.rint(delta).astype(np.int16)[..., None]
+        if block:
+            tiles = shifted.reshape(h // block, block, w // block, block, 3)
+            hi = tiles.max(axis=(1, 3, 4))
+            lo = tiles.min(axis=(1, 3, 4))
+            tiles += (np.maximum(0, -lo) - np.maximum(0, hi - 255))[:, None, :, None, None]
+        np.clip(shifted, 0, 255, out=shifted)
+        region[...] = shifted
+
+    def _embed_into(self, roi: np.ndarray, payload: bytes = b"") -> None:
+        """Marks `roi` in place."""
+        roi[...] = self.embed(roi, payload)
+
+    def verify(self, roi: np.ndarray) -> bool:
+        """True if the extracted HEADER matches exactly."""
+        return self.extract(roi) == self.HEADER
+
+    def embed_batch(self, rois: list[np.ndarray], payload: bytes = b"") -> list[bool]:
+        """
+        Marks every ROI in place (they are usually views into a frame);
+        returns, per ROI, whether it could be marked.
+        """
+        marked = []
+        for roi in rois:
+            try:
+                self._embed_into(roi, payload)
+                marked.append(True)
+            except Exception:
+                marked.append(False)
+        return marked
+
+    def verify_batch(self, rois: list[np.ndarray]) -> np.ndarray:
+        """Per ROI: does it carry a valid HEADER?"""
+        ok = np.zeros(len(rois), dtype=bool)
+        for i, roi in enumerate(rois):
+            try:
+                ok[i] = self.verify(roi)
+            except Exception:
+                continue
+        return ok
+
+    @staticmethod
+    def _rois(frame: np.ndarray, faces: list[Face]) -> tuple[list[Face], list[np.ndarray]]:
+        kept, rois = [], []
+        for face in faces:
+            x, y, w, h = face.bbox
+            roi = frame[y:y+h, x:x+w]
+            if roi.size:
+                kept.append(face)
+                rois.append(roi)
+        return kept, rois
+
+    def embed_frame(self, frame: np.ndarray, faces: list[Face], index: int = None) -> np.ndarray:
+        """Embeds HEADER (and payload(index)) into every face ROI of `frame`, in place."""
+        _, rois = self._rois(frame, faces)
+        if rois:
+            self.embed_batch(rois, self.payload(index))
+        return frame
+
+    def verify_frame(self, frame: np.ndarray, faces: list[Face]) -> Face | None:
+        """Returns the first face of `frame` whose ROI carries a valid HEADER, else None."""
+        kept, rois = self._rois(frame, faces)
+        if not rois:
+            return None
+        ok = np.flatnonzero(self.verify_batch(rois))
+        return kept[ok[0]] if len(ok) else None
+
+    def embed_stream(self,
+                     detections: Iterable[tuple[int, np.ndarray, list[Face]]],
+                     progress_fn=None
+                    ) -> Iterator[tuple[int, np.ndarray, list[Face]]]:
+        """Embeds into each (index, frame, faces) item as it passes through and yields it on."""
+        for index, frame, faces in detections:
+            if faces:
+                self.embed_frame(frame, faces, index)
+
+            if progress_fn:
+                progress_fn()
+
+            yield index, frame, faces
+
+    def embed_in_store(self,
+                       store: FrameStore,
+                       face_map: FaceMap,
+                       progress_fn=None
+                      ) -> None:
+        """
+        Uses the provided face_map (cached from controller) to embed HEADER into each face ROI.
+        Overwrites frames in the store.
+        """
+        face_map = FaceMap.coerce(face_map)
+        for index, frame in store.iter_indices(face_map.frames().tolist()):
+            self.embed_frame(frame, face_map[index], index)
+            store.write(index, frame)
+
+            if progress_fn:
+                progress_fn()
+        store.flush()
+
+    def verify_in_store(self,
+                        store: FrameStore,
+                        face_map: FaceMap,
+                        progress_fn=None
+                       ) -> bool:
+        """
+        Uses the provided face_map to check for any valid HEADER in each face ROI.
+        Returns True as soon as one ROI verifies; else False.
+        """
+        face_map = FaceMap.coerce(face_map)
+        return self.verify_frames(store.iter_indices(face_map.frames().tolist()), face_map, progress_fn)
+
+    def verify_frames(self,
+                      frames: Iterable[tuple[int, np.ndarray]],
+                      face_map: FaceMap,
+                      progress_fn=None
+                     ) -> bool:
+        """
+        Checks (index, frame) items against the face_map; frames without faces are skipped.
+        Returns True as soon as one ROI verifies; else False.
+        """
+        for index, frame in frames:
+            faces = face_map.get(index)
+            face = self.verify_frame(frame, faces) if faces else None
+            if face is not None:
+                print(f"Valid header found in frame {index} at face index {face.index}.")
+                return True
+
+            if progress_fn:
+                progress_fn()
+        print("No valid header found in any face.")
+        return False
+
+    def embed_in_folder(self,
+                        folder: str,
+                        face_map: FaceMap,
+                        progress_fn=None
+                       ) -> None:
+        """Folder (PNG) variant of embed_in_store()."""
+        with PngFrameStore(folder) as store:
+            self.embed_in_store(store, face_map, progress_fn)
+
+    def verify_in_folder(self,
+                         folder: str,
+                         face_map: FaceMap,
+                         progress_fn=None
+                        ) -> bool:
+        """Folder (PNG) variant of verify_in_store()."""
+        with PngFrameStore(folder) as store:
+            return self.verify_in_store(store, face_map, progress_fn)
@@ -1,135 +1,86 @@
 # src/models/watermark_block_checksum_dwt.py
 
-import os
 import numpy as np
 import pywt
-import cv2
-from .face import Face
+from .watermark_base import WatermarkBase
 
-class WatermarkBlockChecksumDwt:
+class WatermarkBlockChecksumDwt(WatermarkBase):
+    """
+    HEADER (plus payload) bits in the parity of the quantised LH
+    coefficients of a 1-level Haar DWT of the ROI's luma, one bit per
+    coefficient in row-major order. Only the top rows of the ROI that hold
+    those coefficients are transformed, and the change is written back onto
+    their luma in place (see _shift_luma()), so the face keeps its colour.
+    A face too small for HEADER + payload is marked with the HEADER alone
+    and counted in `payloads_skipped`.
+    """
     HEADER = "WMARK"
+    STEP = 8.0   # quantisation step of the LH coefficients; outlasts the uint8 rounding
+    SUPPORTS_PAYLOAD = True
 
     @staticmethod
-    def _string_to_bits(s: str) -> list[int]:
-        bits = []
-        for byte in s.encode('utf-8'):
-            for i in range(8):
-                bits.append((byte >> (7 - i)) & 1)
-        return bits
+    def _strip(roi: np.ndarray, n_bits: int) -> tuple[int, int] | None:
+        """Rows and (even) columns of the ROI whose LH coefficients carry `n_bits` bits, or None."""
+        h, w = roi.shape[:2]
+        cols = w // 2
+        if not cols or n_bits > (h // 2) * cols:
+            return None
+        return 2 * -(-n_bits // cols), 2 * cols
 
-    @staticmethod
-    def _bits_to_string(bits: list[int]) -> str:
-        chars = []
-        for i in range(0, len(bits), 8):
-            byte = 0
-            for j in range(8):
-                byte = (byte << 1) | bits[i + j]
-            chars.append(byte)
-        return bytes(chars).decode('utf-8', errors='ignore')
-
-    def embed(self, roi: np.ndarray) -> np.ndarray:
-        """
-        Embed HEADER bits into the LH subband of a 1-level Haar DWT of the grayscale ROI,
-        using LSB on each coefficient to encode one bit.
-        """
-        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-        bits = self._string_to_bits(self.HEADER)
+    def _lh_bits(self, roi: np.ndarray, n_bits: int) -> np.ndarray | None:
+        strip = self._strip(roi, n_bits)
+        if strip is None:
+            return None
+        rows, cols = strip
+        _, (LH, _, _) = pywt.dwt2(self._luma(roi[:rows, :cols]), 'haar')
+        return (np.round(LH.reshape(-1)[:n_bits] / self.STEP) % 2).astype(np.uint8)
 
-        LL, (LH, HL, HH) = pywt.dwt2(gray, 'haar')
-        flat = LH.flatten()
-        if len(bits) > flat.size:
-            raise ValueError("ROI too small for DWT header")
-
-        for i, bit in enumerate(bits):
-            coeff = flat[i]
-            val = int(np.round(coeff))
-            val = (val & ~1) | bit       # clear LSB, set to bit
-            flat[i] = val
-        LH_wm = flat.reshape(LH.shape)
+    def _embed_into(self, roi: np.ndarray, payload: bytes) -> None:
+        header_bits = self.header_bits
+        payload_bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8))
+        strip = self._strip(roi, len(header_bits) + len(payload_bits))
+        if strip is None:
+            strip = self._strip(roi, len(header_bits))
+            if strip is None:
+                raise ValueError("ROI too small for DWT header")
+            payload_bits = payload_bits[:0]
+            self.payloads_skipped += 1
+        bits = np.concatenate([header_bits, payload_bits])
+        rows, cols = strip
+        luma = self._luma(roi[:rows, :cols])
 
-        watermarked = pywt.idwt2((LL, (LH_wm, HL, HH)), 'haar')
-        wm_uint8 = np.clip(watermarked, 0, 255).astype(np.uint8)
-        return cv2.cvtColor(wm_uint8, cv2.COLOR_GRAY2BGR)
-
-    def extract(self, roi: np.ndarray) -> str:
-        """
-        Extract HEADER bits from the LH subband LSBs, reconstruct the string.
-        """
-        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-        LL, (LH, HL, HH) = pywt.dwt2(gray, 'haar')
-        flat = LH.flatten()
-        n = len(self._string_to_bits(self.HEADER))
-        bits = [int(int(np.round(flat[i])) & 1) for i in range(n)]
-        return self._bits_to_string(bits)
+        LL, (LH, HL, HH) = pywt.dwt2(luma, 'haar')
+        flat = LH.reshape(-1)
+        q = np.round(flat[:len(bits)] / self.STEP)
+        q += bits - q % 2            # nearest level whose parity is the bit
+        flat[:len(bits)] = q * self.STEP
 
-    def verify(self, roi: np.ndarray) -> bool:
-        """True if the extracted HEADER matches exactly."""
-        return self.extract(roi) == self.HEADER
+        watermarked = pywt.idwt2((LL, (flat.reshape(LH.shape), HL, HH)), 'haar')
+        self._shift_luma(roi, watermarked - luma, block=2)
 
-    def embed_in_folder(self,
-                        folder: str,
-                        face_map: dict[str, list[Face]],
-                        progress_fn=None
-                       ) -> dict[str, list[Face]]:
+    def embed(self, roi: np.ndarray, payload: bytes = b"") -> np.ndarray:
         """
-        Uses the provided face_map (cached from controller) to embed HEADER into each face ROI.
-        Overwrites frames in-place.
+        Embed HEADER (and `payload`) bits into the LH subband of a 1-level
+        Haar DWT of the luma of a copy of the ROI, one bit per quantised coefficient.
         """
-        files = list(face_map.keys())
-        for idx, fname in enumerate(files, start=1):
-            path = os.path.join(folder, fname)
-            frame = cv2.imread(path)
-            if frame is None:
-                if progress_fn:
-                    progress_fn(idx)
-                continue
-
-            for face in face_map[fname]:
-                x, y, w, h = face.bbox
-                roi = frame[y:y+h, x:x+w]
-                if roi is None or roi.size == 0:
-                    continue
-                try:
-                    wm_frame = self.embed(roi)
-                    frame[y:y+h, x:x+w] = wm_frame
-                except Exception:
-                    pass
-            cv2.imwrite(path, frame)
-            
-            if progress_fn:
-                progress_fn(idx)
+        marked = roi.copy()
+        self._embed_into(marked, payload)
+        return marked
 
-    def verify_in_folder(self,
-                         folder: str,
-                         face_map: dict[str, list[Face]],
-                         progress_fn=None
-                        ) -> bool:
+    def extract(self, roi: np.ndarray) -> str:
         """
-        Uses the provided face_map to check for any valid HEADER in each face ROI.
-        Returns True as soon as one ROI verifies; else False.
+        Extract HEADER bits from the parity of the quantised LH coefficients, reconstruct the string.
         """
-        files = list(face_map.keys())
-        for idx, fname in enumerate(files, start=1):
-            path = os.path.join(folder, fname)
-            frame = cv2.imread(path)
-            if frame is None:
-                if progress_fn:
-                    progress_fn(idx)
-                continue
-
-            for face in face_map[fname]:
-                x, y, w, h = face.bbox
-                roi = frame[y:y+h, x:x+w]
-                if roi is None or roi.size == 0:
-                    continue
-                try:
-                    if self.verify(roi):
-                        print(f"Valid header found in {fname} at face index {face.index}.")
-                        return True
-                except Exception:
-                    continue
+        bits = self._lh_bits(roi, len(self.header_bits))
+        if bits is None:
+            raise ValueError("ROI too small for DWT header")
+        return self._bits_to_string(bits)
 
-            if progress_fn:
-                progress_fn(idx)
-        print("No valid header found in any face.")
-        return False
\ No newline at end of file
+    def extract_payload(self, roi: np.ndarray, length: int = None) -> bytes:
+        """The `length` payload bytes (default: one PAYLOAD) after the HEADER bits."""
+        length = self.PAYLOAD.size if length is None else length
+        n = len(self.header_bits)
+        bits = self._lh_bits(roi, n + 8 * length)
+        if bits is None:
+            raise ValueError("ROI too small for DWT payload")
+        return np.packbits(bits[n:]).tobytes()
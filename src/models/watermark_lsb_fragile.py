@@ -1,116 +1,83 @@
-import os
-import cv2
+import functools
 import numpy as np
-from models import Face
+from .watermark_base import WatermarkBase
 
-class WatermarkLsbFragile:
-    HEADER = "WMARK"   # 5-byte magic header
 
-    @staticmethod
-    def _string_to_bits(s: str) -> list[int]:
-        bits = []
-        for byte in s.encode('utf-8'):
-            for i in range(8):
-                bits.append((byte >> (7 - i)) & 1)
-        return bits
+@functools.lru_cache(maxsize=256)
+def _positions(shape: tuple, n_header: int, n_payload: int) -> tuple[tuple, tuple]:
+    """
+    Index tuples (into an ROI of `shape`) of the header samples, the first
+    `n_header` in C order, and of `n_payload` samples spread evenly over
+    the rest of the ROI.
+    """
+    size = int(np.prod(shape))
+    header = np.unravel_index(np.arange(n_header), shape)
+    stride = (size - n_header) // n_payload if n_payload else 1
+    payload = np.unravel_index(n_header + np.arange(n_payload) * stride, shape)
+    return header, payload
+
 
-    @staticmethod
-    def _bits_to_string(bits: list[int]) -> str:
-        chars = []
-        for i in range(0, len(bits), 8):
-            byte = 0
-            for j in range(8):
-                byte = (byte << 1) | bits[i + j]
-            chars.append(byte)
-        return bytes(chars).decode('utf-8', errors='ignore')
+class WatermarkLsbFragile(WatermarkBase):
+    """
+    Fragile LSB watermark: HEADER bits go into the least significant bit of
+    the first samples of the ROI (row-major, channels interleaved), the
+    optional payload into samples spread evenly across the rest of it. A
+    ROI too small for both gets the HEADER alone (see `payloads_skipped`).
 
-    def embed(self, roi: np.ndarray) -> np.ndarray:
-        """Embed HEADER bits into the LSB of each byte in this ROI."""
-        bits = self._string_to_bits(self.HEADER)
-        # print(f"Embedding {len(bits)} bits into ROI of shape {roi.shape}") # debug
-        flat = roi.flatten()
-        if len(bits) > flat.size:
+    Bits are read and written through cached index arrays straight on the
+    ROI view, so no per-bit Python loop and no flattened copy of the ROI.
+    """
+    HEADER = "WMARK"   # 5-byte magic header
+    SUPPORTS_PAYLOAD = True
+
+    def _marks(self, roi: np.ndarray, payload: bytes) -> tuple[tuple, np.ndarray, tuple, np.ndarray]:
+        header_bits = self.header_bits
+        payload_bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8))
+        if len(header_bits) > roi.size:
             raise ValueError("ROI too small for LSB header")
-        for idx, bit in enumerate(bits):
-            flat[idx] = (flat[idx] & 0xFE) | bit
-        return flat.reshape(roi.shape)
+        if len(header_bits) + len(payload_bits) > roi.size:
+            payload_bits = payload_bits[:0]
+            self.payloads_skipped += 1
+        header, spread = _positions(roi.shape, len(header_bits), len(payload_bits))
+        return header, header_bits, spread, payload_bits
 
-    def extract(self, roi: np.ndarray) -> str:
-        """Extract the exact number of HEADER bits from the LSBs and decode."""
-        flat = roi.flatten()
-        n = len(self._string_to_bits(self.HEADER))
-        bits = [int(flat[i] & 1) for i in range(n)]
-        return self._bits_to_string(bits)
+    def _embed_into(self, roi: np.ndarray, payload: bytes) -> None:
+        header, header_bits, spread, payload_bits = self._marks(roi, payload)
+        roi[header] = (roi[header] & 0xFE) | header_bits
+        if len(payload_bits):
+            roi[spread] = (roi[spread] & 0xFE) | payload_bits
 
-    def verify(self, roi: np.ndarray) -> bool:
-        """True if the extracted header matches exactly."""
-        # print(f"Verifying ROI of shape {roi.shape}")  # debug
-        return self.extract(roi) == self.HEADER
+    def embed(self, roi: np.ndarray, payload: bytes = b"") -> np.ndarray:
+        """Embed HEADER (and `payload`) bits into the LSBs of a copy of this ROI."""
+        marked = roi.copy()
+        self._embed_into(marked, payload)
+        return marked
 
-    def embed_in_folder(self,
-                        folder: str,
-                        face_map: dict[str, list[Face]],
-                        progress_fn=None
-                       ) -> dict[str, list[Face]]:
-        """
-        Uses the provided face_map (cached from controller) to embed HEADER into each face ROI.
-        Overwrites frames in-place.
-        """
-        files = list(face_map.keys())
-        for idx, fname in enumerate(files, start=1):
-            path = os.path.join(folder, fname)
-            frame = cv2.imread(path)
-            if frame is None:
-                if progress_fn:
-                    progress_fn(idx)
-                continue
+    def extract(self, roi: np.ndarray) -> str:
+        """Extract the exact number of HEADER bits from the LSBs and decode."""
+        n = len(self.header_bits)
+        header, _ = _positions(roi.shape, n, 0)
+        return self._bits_to_string(roi[header] & 1)
 
-            for face in face_map[fname]:
-                x, y, w, h = face.bbox
-                roi = frame[y:y+h, x:x+w]
-                if roi is None or roi.size == 0:
-                    continue
-                try:
-                    wm_frame = self.embed(roi)
-                    frame[y:y+h, x:x+w] = wm_frame
-                except Exception:
-                    pass
-            cv2.imwrite(path, frame)
-            
-            if progress_fn:
-                progress_fn(idx)
+    def extract_payload(self, roi: np.ndarray, length: int = None) -> bytes:
+        """The `length` payload bytes (default: one PAYLOAD) spread across the ROI."""
+        length = self.PAYLOAD.size if length is None else length
+        n_header = len(self.header_bits)
+        if n_header + 8 * length > roi.size:
+            raise ValueError("ROI too small for LSB payload")
+        _, spread = _positions(roi.shape, n_header, 8 * length)
+        return np.packbits(roi[spread] & 1).tobytes()
 
-    def verify_in_folder(self,
-                         folder: str,
-                         face_map: dict[str, list[Face]],
-                         progress_fn=None
-                        ) -> bool:
-        """
-        Uses the provided face_map to check for any valid HEADER in each face ROI.
-        Returns True as soon as one ROI verifies; else False.
-        """
-        files = list(face_map.keys())
-        for idx, fname in enumerate(files, start=1):
-            path = os.path.join(folder, fname)
-            frame = cv2.imread(path)
-            if frame is None:
-                if progress_fn:
-                    progress_fn(idx)
-                continue
-            
-            for face in face_map[fname]:
-                x, y, w, h = face.bbox
-                roi = frame[y:y+h, x:x+w]
-                if roi is None or roi.size == 0:
-                    continue
-                try:
-                    if self.verify(roi):
-                        print(f"Valid header found in {fname} at face index {face.index}.")
-                        return True
-                except Exception:
-                    continue
+    def verify_batch(self, rois: list[np.ndarray]) -> np.ndarray:
+        """One comparison for all ROIs: their header LSBs stacked into an N × bits array."""
+        header_bits = self.header_bits
+        n = len(header_bits)
+        ok = np.zeros(len(rois), dtype=bool)
+        usable = [i for i, roi in enumerate(rois) if roi.size >= n]
+        if usable:
+            lsbs = np.stack([rois[i][_positions(rois[i].shape, n, 0)[0]] for i in usable]) & 1
+            ok[usable] = (lsbs == header_bits).all(axis=1)
+        return ok
 
-            if progress_fn:
-                progress_fn(idx)
-        print("No valid header found in any face.")
-        return False
+    def verify(self, roi: np.ndarray) -> bool:
+        return bool(self.verify_batch([roi])[0])
@@ -0,0 +1,35 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# the app runs from src/ (main.py imports `models`, `views`, `controllers`)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+
+FRAMES, GOP = 90, 15
+
+
+@pytest.fixture
+def make_video(tmp_path):
+    """Writes a smooth synthetic H.264 clip of FRAMES frames with closed GOPs of GOP frames."""
+    av = pytest.importorskip("av")
+
+    def make(x264_params: str = "bframes=0", name: str = "source.mp4") -> str:
+        path = str(tmp_path / name)
+        y, x = np.mgrid[0:240, 0:320]
+        with av.open(path, "w") as out:
+            stream = out.add_stream("libx264", rate=30)
+            stream.width, stream.height, stream.pix_fmt = 320, 240, "yuv420p"
+            stream.options = {"g": str(GOP), "keyint_min": str(GOP), "sc_threshold": "0",
+                              "x264-params": x264_params}
+            for i in range(FRAMES):
+                image = np.stack([(x + 2 * i) % 256, (y + i) % 256, np.full_like(x, 128)], axis=-1)
+                frame = av.VideoFrame.from_ndarray(image.astype(np.uint8), format="bgr24")
+                frame.pts = i
+                for packet in stream.encode(frame):
+                    out.mux(packet)
+            for packet in stream.encode():
+                out.mux(packet)
+        return path
+
+    return make
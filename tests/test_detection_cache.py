@@ -0,0 +1,45 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from models.face import Face
+from models.detection_cache import DetectionCache
+
+FRAMES = 100
+
+
+def _detect_and_cache(path: str, worker: int, delay: float) -> float:
+    """A segment worker: 'detects' each frame, caches the result; returns its slowest put()."""
+    slowest = 0.0
+    with DetectionCache(path) as cache:
+        for i in range(FRAMES):
+            time.sleep(delay)
+            start = time.perf_counter()
+            cache.put(f"{worker}:{i}".encode(), "dnn", [Face(0, (i, i, 10, 10), 0.9)])
+            slowest = max(slowest, time.perf_counter() - start)
+    return slowest
+
+
+def test_workers_sharing_the_cache_do_not_block_each_other(tmp_path):
+    path = str(tmp_path / "detections.sqlite")
+    DetectionCache(path).close()
+
+    with ProcessPoolExecutor(2) as pool:
+        slowest = list(pool.map(_detect_and_cache, [path, path], [0, 1], [0.01, 0.01]))
+
+    # each worker runs for about a second; an open write transaction would stall the other that long
+    assert max(slowest) < 0.5
+    with DetectionCache(path) as cache:
+        for worker in (0, 1):
+            assert all(cache.get(f"{worker}:{i}".encode(), "dnn") for i in range(FRAMES))
+
+
+def test_results_are_committed_without_flush(tmp_path):
+    path = str(tmp_path / "detections.sqlite")
+    writer = DetectionCache(path, commit_every=8)
+    for i in range(8):
+        writer.put(bytes([i]), "dnn", [Face(0, (1, 2, 3, 4), 0.5)])
+
+    with DetectionCache(path) as reader:
+        assert [face.bbox for face in reader.get(bytes([7]), "dnn")] == [(1, 2, 3, 4)]
+        assert reader.get(bytes([7]), "haar") is None
+    writer.close()
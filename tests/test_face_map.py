@@ -0,0 +1,72 @@
+import pickle
+import pytest
+
+from models.face import Face
+from models.face_map import FaceMap
+
+
+def _faces(index: int, count: int = 1) -> list[Face]:
+    return [Face(i, (index, 10 * i, 32, 32), 0.5, track_id=i) for i in range(count)]
+
+
+def _boxes(face_map) -> list[tuple[int, list[tuple]]]:
+    return [(index, [(face.bbox, face.track_id) for face in faces]) for index, faces in face_map.items()]
+
+
+def _sample() -> FaceMap:
+    face_map = FaceMap()
+    for index in (3, 4, 7, 10):
+        face_map[index] = _faces(index, count=index % 3 + 1)
+    return face_map
+
+
+def test_set_in_order_and_lookup():
+    face_map = _sample()
+    assert list(face_map) == [3, 4, 7, 10]
+    assert len(face_map) == 4
+    assert [face.index for face in face_map[7]] == [0, 1]
+    assert 5 not in face_map and face_map.get(5) is None
+    with pytest.raises(KeyError):
+        face_map[5]
+
+
+def test_splice_earlier_frames():
+    face_map = _sample()
+    face_map[5] = _faces(5, count=2)        # insert into a gap
+    face_map[4] = _faces(4, count=3)        # replace with more faces
+    face_map[3] = []                        # empty list removes the frame
+    del face_map[10]
+
+    assert _boxes(face_map) == _boxes({4: _faces(4, count=3), 5: _faces(5, count=2), 7: _faces(7, count=2)})
+    with pytest.raises(KeyError):
+        del face_map[10]
+
+
+def test_slice_shares_rows_and_keeps_indices():
+    face_map = _sample()
+    part = face_map.slice(4, 10)
+    assert list(part) == [4, 7]
+    assert _boxes(part) == _boxes(face_map)[1:3]
+    assert list(face_map.slice(11)) == [] and list(face_map[:4]) == [3]
+    assert _boxes(FaceMap.concat([face_map.slice(7), face_map.slice(None, 7)])) == _boxes(face_map)
+
+
+def test_pickle_and_buffer_round_trip():
+    face_map = _sample()
+    assert _boxes(pickle.loads(pickle.dumps(face_map))) == _boxes(face_map)
+    assert _boxes(FaceMap.from_buffer(face_map.to_bytes())) == _boxes(face_map)
+    with pytest.raises(ValueError):
+        FaceMap.from_buffer(b"\0" * 64)
+
+
+def test_save_load_maps_the_file_and_stays_writable(tmp_path):
+    face_map = _sample()
+    path = str(tmp_path / "faces.fmc")
+    face_map.save(path)
+
+    loaded = FaceMap.load(path)
+    assert _boxes(loaded) == _boxes(face_map)
+    loaded[12] = _faces(12)                 # appending copies off the read-only mapping
+    loaded[3] = _faces(3, count=2)
+    assert list(loaded) == [3, 4, 7, 10, 12]
+    assert _boxes(FaceMap.load(path)) == _boxes(face_map)
@@ -0,0 +1,51 @@
+from models import face_map_codec
+from models.face import Face
+from models.face_map import FaceMap
+from models.face_map_codec import FaceMapReader, decode_face_map, encode_face_map
+
+
+def _face_map(frames: int = 100) -> FaceMap:
+    """A drifting face on every frame, a second one on every third, none on every tenth."""
+    face_map = FaceMap()
+    for index in range(frames):
+        if index % 10 == 9:
+            continue
+        faces = [Face(0, (10 + index, 20, 64, 64 + index % 3), 0.5, track_id=1)]
+        if index % 3 == 0:
+            faces.append(Face(1, (200, 30 + index, 40, 40), 1.0, track_id=2))
+        face_map[index] = faces
+    return face_map
+
+
+def _boxes(items):
+    return [(index, [(face.bbox, face.track_id, round(face.confidence, 2)) for face in faces])
+            for index, faces in items]
+
+
+def test_round_trip():
+    face_map = _face_map()
+    data = encode_face_map(face_map, chunk_frames=16)
+
+    reader = FaceMapReader(data)
+    assert len(reader) == len(face_map)
+    assert list(reader) == list(face_map)
+    assert _boxes(reader.items()) == _boxes(face_map.items())
+    assert _boxes(decode_face_map(data).items()) == _boxes(face_map.items())
+    assert 9 not in reader and reader.get(9) is None
+    assert reader[42][0].bbox == (52, 20, 64, 64)
+
+
+def test_range_decodes_only_the_chunks_it_covers(monkeypatch):
+    face_map = _face_map()
+    reader = FaceMapReader(encode_face_map(face_map, chunk_frames=16))
+    decoded = []
+    decode_chunk = face_map_codec._decode_chunk
+    monkeypatch.setattr(face_map_codec, "_decode_chunk",
+                        lambda payload, first, *args: decoded.append(first) or decode_chunk(payload, first, *args))
+
+    # chunks hold 16 frames with faces: entries 32..47 are frames 35..52, 48..63 frames 53..70
+    assert _boxes(reader.range(50, 60)) == _boxes(face_map.range(50, 60))
+    assert decoded == [35, 53]
+
+    assert _boxes(reader.range(50, 60)) == _boxes(face_map.range(50, 60))
+    assert decoded == [35, 53]              # served from the chunk cache
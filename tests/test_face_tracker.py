@@ -0,0 +1,59 @@
+from models.face import Face
+from models.face_tracker import IouTracker
+
+FPS = 10    # min_duration 0.5 s -> 5 frames, max_gap 0.2 s -> 2 frames
+
+
+def _detections(frames: int, boxes: dict[int, list[tuple]]):
+    """(index, frame, faces) items; `boxes` maps frame index -> face boxes."""
+    for index in range(frames):
+        yield index, f"frame {index}", [Face(i, box, 1.0) for i, box in enumerate(boxes.get(index, []))]
+
+
+def test_short_tracks_are_dropped_and_long_ones_keep_one_id():
+    boxes = {i: [(10, 10, 40, 40)] for i in range(12)}              # 12 frames: kept
+    for i in range(3, 6):
+        boxes[i] = boxes[i] + [(200, 200, 30, 30)]                   # 3 frames: dropped
+    tracker = IouTracker(FPS, min_duration=0.5, max_gap=0.2)
+
+    out = list(tracker.track_stream(_detections(15, boxes)))
+
+    assert [index for index, _, _ in out] == list(range(15))
+    assert [frame for _, frame, _ in out] == [f"frame {i}" for i in range(15)]
+    assert {face.track_id for _, _, faces in out for face in faces} == {0}
+    assert sum(len(faces) for _, _, faces in out) == 12
+    assert tracker.faces_dropped == 3
+
+
+def test_track_survives_gaps_up_to_max_gap():
+    # frame 3 missing (2 frames since last seen: same track), then 6..8 missing (a new track)
+    boxes = {i: [(10, 10, 40, 40)] for i in (0, 1, 2, 4, 5, 9, 10)}
+    out = {index: faces for index, _, faces in
+           IouTracker(FPS, min_duration=0.5, max_gap=0.2).track_stream(_detections(12, boxes))}
+
+    assert [out[i][0].track_id for i in (0, 1, 2, 4, 5)] == [0] * 5
+    assert out[9] == [] and out[10] == []       # the new track lasts 2 frames only
+
+
+def test_items_are_held_back_only_as_long_as_the_drop_rule_needs():
+    tracker = IouTracker(FPS, min_duration=0.5, max_gap=0.2)
+    delay = tracker.min_frames + tracker.max_gap
+    consumed = []
+
+    def source():
+        for item in _detections(20, {}):
+            consumed.append(item[0])
+            yield item
+
+    stream = tracker.track_stream(source())
+    assert next(stream)[0] == 0
+    assert len(consumed) == delay + 1
+
+
+def test_track_map_matches_the_stream():
+    boxes = {i: [(10 + i, 10, 40, 40)] for i in range(8)}
+    boxes.update({i: [(300, 300, 20, 20)] for i in range(20, 23)})
+    tracked = IouTracker(FPS).track_map({i: [Face(0, box, 1.0) for box in b] for i, b in boxes.items()})
+
+    assert list(tracked) == list(range(8))
+    assert {faces[0].track_id for faces in tracked.values()} == {0}
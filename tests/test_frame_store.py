@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from models.frame_store import Ffv1FrameStore, LruFrameStore, MemmapFrameStore, open_frame_store
+
+H, W = 64, 64
+
+
+def _frame(value: int) -> np.ndarray:
+    return np.full((H, W, 3), value, dtype=np.uint8)
+
+
+def _values(store) -> list[int]:
+    return [int(frame[0, 0, 0]) for _, frame in store]
+
+
+def test_memmap_store_grows_and_reopens(tmp_path):
+    path = str(tmp_path / "frames.raw")
+    store = MemmapFrameStore(path, frame_count=2, height=H, width=W)
+    for index in range(5):                  # past the reserved 2 frames
+        store.write(index, _frame(index * 10))
+    frame = store.read(3)
+    frame += 1                              # read() hands out a view: edit in place
+    store.write(3, frame)
+    store.flush()
+
+    reopened = MemmapFrameStore(path)
+    assert len(reopened) == 5
+    assert _values(reopened) == [0, 10, 20, 31, 40]
+    assert reopened.read(5) is None
+    with pytest.raises(ValueError):
+        reopened.write(5, np.zeros((H, W + 2, 3), dtype=np.uint8))
+
+
+def test_ffv1_store_appends_and_rewrites_on_flush(tmp_path):
+    path = str(tmp_path / "frames.mkv")
+    store = Ffv1FrameStore(path, fps=10)
+    for index in range(4):
+        store.write(index, _frame(index * 10))
+    store.flush()
+    store.write(1, _frame(99))              # buffered until flush()
+    assert int(store.read(1)[0, 0, 0]) == 99
+    with pytest.raises(ValueError):
+        store.write(6, _frame(0))           # append-only past the end
+    store.flush()
+
+    assert _values(Ffv1FrameStore(path)) == [0, 99, 20, 30]
+
+
+def test_lru_store_writes_evicted_frames_back(tmp_path):
+    backing = MemmapFrameStore(str(tmp_path / "frames.raw"), height=H, width=W)
+    store = LruFrameStore(capacity=2, backing=backing)
+    for index in range(4):
+        store.write(index, _frame(index))
+
+    assert len(store._frames) == 2
+    assert backing.indices() == [0, 1]      # the two least recently used, written on eviction
+    assert int(store.read(0)[0, 0, 0]) == 0  # read through from the backing store
+    store.flush()
+    assert _values(backing) == [0, 1, 2, 3]
+
+
+def test_lru_store_without_backing_refuses_to_evict():
+    store = LruFrameStore(capacity=2)
+    store.write(0, _frame(0))
+    store.write(1, _frame(1))
+    store.write(1, _frame(5))               # overwriting a held frame is fine
+    with pytest.raises(RuntimeError):
+        store.write(2, _frame(2))
+    assert _values(store) == [0, 5]
+
+
+def test_memory_store_needs_room_for_every_frame(tmp_path):
+    with pytest.raises(ValueError):
+        open_frame_store("memory", str(tmp_path), frame_count=10, cache_size=4)
+    assert isinstance(open_frame_store("memory", str(tmp_path), frame_count=10, cache_size=10), LruFrameStore)
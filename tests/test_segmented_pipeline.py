@@ -0,0 +1,34 @@
+from conftest import GOP
+from models.face import Face
+from models.video_model import Video
+from models.segmented_pipeline import SegmentedPipeline
+from models.watermark_lsb_fragile import WatermarkLsbFragile
+
+# at 30 fps a 0.5 s minimum is 15 frames, one GOP, and segments are one GOP each
+CROSSING = range(GOP - 10, GOP + 10)     # 20 frames, 10 on each side of the first join
+BRIEF = range(4 * GOP, 4 * GOP + 5)      # 5 frames, inside one segment
+
+
+class WindowDetector:
+    """Reports one face box in the CROSSING and BRIEF frames only."""
+    frames_skipped = 0
+    static_threshold = 0.0
+    cache = None
+
+    def detect_stream(self, frames):
+        for index, frame in frames:
+            faces = [Face(0, (40, 40, 64, 64), 1.0)] if index in CROSSING or index in BRIEF else []
+            yield index, frame, faces
+
+
+def test_tracks_span_segment_joins(tmp_path, make_video):
+    video = Video()
+    video.set_video_path(make_video())
+    pipeline = SegmentedPipeline(video, WindowDetector, WatermarkLsbFragile, verify=False,
+                                 segment_frames=GOP, workers=2, min_face_duration=0.5)
+
+    face_map = pipeline.run(str(tmp_path / "output.mp4"))
+
+    assert sorted(face_map) == list(CROSSING)
+    assert {faces[0].track_id for faces in face_map.values()} == {0}
+    assert pipeline.faces_dropped == len(BRIEF)
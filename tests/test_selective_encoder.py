@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from conftest import FRAMES, GOP
+from models.face import Face
+from models.video_model import Video
+from models.av_io import AvReader
+from models.watermark_lsb_fragile import WatermarkLsbFragile
+from models.selective_encoder import SelectiveEncoder
+
+def _decode(path: str) -> list[np.ndarray]:
+    with AvReader(path) as reader:
+        return [frame for _, frame in reader]
+
+
+def _encoder(source: str) -> SelectiveEncoder:
+    video = Video()
+    video.set_video_path(source)
+    video.get_video_info()
+    face_map = {i: [Face(0, (60, 60, 100, 100), 1.0)] for i in range(30, 41)}
+    return SelectiveEncoder(video, WatermarkLsbFragile(), face_map)
+
+
+@pytest.mark.parametrize("x264_params", ["bframes=0", "bframes=3"])
+def test_splices_copied_and_reencoded_gops(tmp_path, make_video, x264_params):
+    source = make_video(x264_params)
+    encoder = _encoder(source)
+
+    output = encoder.run(str(tmp_path / "output.mp4"))
+
+    assert (encoder.gops_copied, encoder.gops_encoded) == (FRAMES // GOP - 1, 1)
+    original, result = _decode(source), _decode(output)
+    assert len(result) == FRAMES
+    # GOPs without faces are copied, so they decode bit-exact
+    assert all(np.array_equal(a, b) for a, b in zip(original[:30] + original[45:], result[:30] + result[45:]))
+
+
+def test_falls_back_to_full_reencode_when_runs_do_not_splice(tmp_path, make_video):
+    source = make_video("bframes=0")
+    encoder = _encoder(source)
+    encoder._splice_settings = lambda gops: {}      # default x264 settings: B-frames, own GOPs
+
+    output = encoder.run(str(tmp_path / "output.mp4"))
+
+    assert (encoder.gops_copied, encoder.gops_encoded) == (0, FRAMES // GOP)
+    assert encoder.frames_encoded == FRAMES
+    assert len(_decode(output)) == FRAMES
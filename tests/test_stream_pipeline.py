@@ -0,0 +1,39 @@
+import os
+import pytest
+
+from conftest import FRAMES
+from models.face import Face
+from models.face_map import FaceMap
+from models.face_map_codec import FaceMapReader
+from models.video_model import Video
+from models.stream_pipeline import StreamPipeline
+from models.watermark_lsb_fragile import WatermarkLsbFragile
+
+
+class BoxDetector:
+    """Reports the same face box in every frame."""
+    frames_skipped = 0
+
+    def detect_stream(self, frames):
+        for index, frame in frames:
+            yield index, frame, [Face(0, (40, 40, 64, 64), 1.0)]
+
+
+@pytest.mark.parametrize("name, sidecar", [("output.mp4", False), ("output.mkv", True)])
+def test_run_stores_the_face_map_with_any_container(tmp_path, make_video, name, sidecar):
+    video = Video()
+    video.set_video_path(make_video())
+    output = str(tmp_path / name)
+
+    StreamPipeline(video, BoxDetector(), WatermarkLsbFragile(), verify=False).run(output)
+
+    assert os.path.isfile(output + ".fmap") == sidecar
+    face_map = Video().load_face_map(output)
+    assert len(face_map) == FRAMES
+    assert face_map[0][0].bbox == (40, 40, 64, 64)
+    assert isinstance(face_map, FaceMap)
+
+    # the tag is FMAP-encoded and read lazily; the columnar sidecar is a FaceMap already
+    reader = Video().read_face_map(output)
+    assert isinstance(reader, FaceMap if sidecar else FaceMapReader)
+    assert len(reader) == FRAMES and reader.get(FRAMES - 1)[0].bbox == (40, 40, 64, 64)
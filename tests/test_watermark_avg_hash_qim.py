@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from models.watermark_avg_hash_qim import WatermarkAvgHashQim
+
+
+def _face(height: int, width: int) -> np.ndarray:
+    y, x = np.mgrid[0:height, 0:width]
+    return np.stack([(x * 3) % 256, (y * 2) % 256, (x + y) % 256], axis=-1).astype(np.uint8)
+
+
+def test_small_roi_gets_the_header_without_a_cut_off_payload():
+    watermark = WatermarkAvgHashQim.create(b"ABCDEFGH")
+    roi = _face(64, 80)        # 80 blocks: room for the 40 header bits, not for 40 + 96
+    watermark.embed_batch([roi], watermark.payload(7))
+
+    assert watermark.payloads_skipped == 1
+    assert watermark.verify(roi)
+    with pytest.raises(ValueError):
+        watermark.extract_payload(roi)
+
+
+def test_roi_smaller_than_the_header_is_not_marked():
+    watermark = WatermarkAvgHashQim()
+    roi = _face(32, 64)        # 32 blocks < 40 header bits
+    assert watermark.embed_batch([roi]) == [False]
+    with pytest.raises(ValueError):
+        watermark.embed(roi)
+
+
+def test_payload_round_trips_when_it_fits():
+    watermark = WatermarkAvgHashQim.create(b"ABCDEFGH")
+    roi = _face(128, 120)      # 240 blocks
+    watermark.embed_batch([roi], watermark.payload(1234))
+
+    assert watermark.payloads_skipped == 0
+    assert watermark.verify(roi)
+    assert watermark.parse_payload(watermark.extract_payload(roi)) == (b"ABCDEFGH", 1234)
+
+
+@pytest.mark.parametrize("level", [0, 255])
+def test_saturated_roi_verifies(level):
+    watermark = WatermarkAvgHashQim.create(b"ABCDEFGH")
+    roi = np.full((128, 120, 3), level, dtype=np.uint8)
+    watermark.embed_batch([roi], watermark.payload(1234))
+
+    assert watermark.verify(roi)
+    assert watermark.parse_payload(watermark.extract_payload(roi)) == (b"ABCDEFGH", 1234)
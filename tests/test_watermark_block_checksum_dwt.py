@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import pywt
+
+from models.watermark_block_checksum_dwt import WatermarkBlockChecksumDwt
+
+
+def _face(height: int, width: int) -> np.ndarray:
+    y, x = np.mgrid[0:height, 0:width]
+    return np.stack([(x * 3) % 256, (y * 2) % 256, (x + y) % 256], axis=-1).astype(np.uint8)
+
+
+@pytest.mark.parametrize("level", [0, 255])
+def test_saturated_roi_verifies(level):
+    watermark = WatermarkBlockChecksumDwt()
+    roi = np.full((64, 64, 3), level, dtype=np.uint8)
+    assert watermark.embed_batch([roi]) == [True]
+    assert watermark.verify(roi)
+
+
+def test_payload_round_trips_when_it_fits():
+    watermark = WatermarkBlockChecksumDwt.create(b"ABCDEFGH")
+    roi = _face(64, 64)                     # 1024 LH coefficients
+    assert watermark.embed_batch([roi], watermark.payload(1234)) == [True]
+
+    assert watermark.payloads_skipped == 0
+    assert watermark.verify(roi)
+    assert watermark.parse_payload(watermark.extract_payload(roi)) == (b"ABCDEFGH", 1234)
+
+
+def test_small_roi_gets_the_header_without_a_cut_off_payload():
+    watermark = WatermarkBlockChecksumDwt.create(b"ABCDEFGH")
+    roi = _face(20, 8)                      # 10 × 4 = 40 LH coefficients: the header only
+    assert watermark.embed_batch([roi], watermark.payload(7)) == [True]
+
+    assert watermark.payloads_skipped == 1
+    assert watermark.verify(roi)
+    with pytest.raises(ValueError):
+        watermark.extract_payload(roi)
+
+
+def test_roi_smaller_than_the_header_is_not_marked():
+    watermark = WatermarkBlockChecksumDwt()
+    roi = _face(8, 8)                       # 16 LH coefficients < 40 header bits
+    assert watermark.embed_batch([roi]) == [False]
+    assert not watermark.verify_batch([roi]).any()
+
+
+def test_mark_is_quantised_and_survives_small_luma_changes():
+    watermark = WatermarkBlockChecksumDwt()
+    roi = _face(64, 64)
+    watermark.embed_batch([roi])
+
+    # the marked coefficients sit on the quantiser levels (up to the uint8 rounding) ...
+    _, (LH, _, _) = pywt.dwt2(watermark._luma(roi), 'haar')
+    levels = LH.reshape(-1)[:len(watermark.header_bits)] / watermark.STEP
+    assert np.abs(levels - np.round(levels)).max() < 0.25
+    assert np.array_equal(np.round(levels) % 2, watermark.header_bits)
+
+    # ... so a ±1 change of every pixel, which flips raw parities, leaves the header readable
+    noise = np.random.default_rng(0).integers(-1, 2, roi.shape[:2])[..., None]
+    assert watermark.verify(np.clip(roi.astype(np.int16) + noise, 0, 255).astype(np.uint8))
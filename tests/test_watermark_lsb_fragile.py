@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from models.watermark_lsb_fragile import WatermarkLsbFragile
+
+
+def _face(height: int, width: int) -> np.ndarray:
+    y, x = np.mgrid[0:height, 0:width]
+    return np.stack([(x * 3) % 256, (y * 2) % 256, (x + y) % 256], axis=-1).astype(np.uint8)
+
+
+def test_payload_round_trips_when_it_fits():
+    watermark = WatermarkLsbFragile.create(b"ABCDEFGH")
+    rois = [_face(8, 8), _face(30, 20)]     # 192 samples >= 40 header + 96 payload bits
+    assert watermark.embed_batch(rois, watermark.payload(1234)) == [True, True]
+
+    assert watermark.payloads_skipped == 0
+    assert watermark.verify_batch(rois).all()
+    for roi in rois:
+        assert watermark.parse_payload(watermark.extract_payload(roi)) == (b"ABCDEFGH", 1234)
+
+
+def test_small_roi_gets_the_header_without_a_cut_off_payload():
+    watermark = WatermarkLsbFragile.create(b"ABCDEFGH")
+    roi = _face(4, 4)                       # 48 samples: the header, not the payload
+    original = roi.copy()
+    assert watermark.embed_batch([roi], watermark.payload(7)) == [True]
+
+    assert watermark.payloads_skipped == 1
+    assert watermark.verify(roi)
+    assert np.array_equal(roi.reshape(-1)[40:], original.reshape(-1)[40:])
+    with pytest.raises(ValueError):
+        watermark.extract_payload(roi)
+
+
+def test_roi_smaller_than_the_header_is_not_marked():
+    watermark = WatermarkLsbFragile()
+    roi = _face(2, 4)                       # 24 samples < 40 header bits
+    assert watermark.embed_batch([roi]) == [False]
+    assert not watermark.verify(roi)